@@ -12,7 +12,8 @@ from .services import (
 from utils.auth import token_required
 import bcrypt
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, decode_token
-from core.database import get_db_connection
+from core.database import get_db
+from services.users import get_user, invalidate_user
 import MySQLdb
 from functools import wraps
 import jwt
@@ -37,13 +38,8 @@ def token_required(f):
                 except ValueError:
                     print(f"Could not convert user_id to int, using as is: {user_id}")
             
-            # Get user details from database
-            conn = get_db_connection()
-            cursor = conn.cursor(MySQLdb.cursors.DictCursor)
-            cursor.execute('SELECT * FROM users WHERE id = %s', (user_id,))
-            current_user = cursor.fetchone()
-            cursor.close()
-            conn.close()
+            # Get user details, from the per-process cache when possible
+            current_user = get_user(user_id)
             
             if not current_user:
                 print(f"No user found for ID: {user_id}")
@@ -100,7 +96,7 @@ def login():
             }), 400
         
         # Get user from database
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
         cursor.execute(
@@ -110,7 +106,6 @@ def login():
         
         user = cursor.fetchone()
         cursor.close()
-        conn.close()
         
         # Check if user exists and password is correct
         if not user:
@@ -291,13 +286,8 @@ def check_auth():
                 'message': f'Token validation error: {str(e)}'
             }), 401
         
-        # Get user from database
-        conn = get_db_connection()
-        cursor = conn.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute('SELECT id, username, email, firstname, lastname, user_type FROM users WHERE id = %s', (user_id,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        # Get user, from the per-process cache when possible
+        user = get_user(user_id)
         
         if not user:
             print(f"User not found for ID: {user_id}")
@@ -310,7 +300,7 @@ def check_auth():
         # Return user data
         return jsonify({
             'status': 'success',
-            'user': user
+            'user': {field: user[field] for field in ('id', 'username', 'email', 'firstname', 'lastname', 'user_type')}
         })
     except Exception as e:
         import traceback
@@ -364,7 +354,7 @@ def register():
             }), 400
         
         # Check if username or email already exists
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
         cursor.execute(
@@ -376,7 +366,6 @@ def register():
         
         if existing_user:
             cursor.close()
-            conn.close()
             
             if existing_user['username'] == data['username']:
                 return jsonify({
@@ -416,7 +405,7 @@ def register():
         user_id = cursor.lastrowid
         
         cursor.close()
-        conn.close()
+        invalidate_user(user_id)
         
         # Create access token
         access_token = create_access_token(identity={
@@ -454,7 +443,7 @@ def get_profile():
         current_user = get_jwt_identity()
         
         # Get user from database
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
         cursor.execute(
@@ -464,7 +453,6 @@ def get_profile():
         
         user = cursor.fetchone()
         cursor.close()
-        conn.close()
         
         if not user:
             return jsonify({
@@ -519,12 +507,15 @@ def update_profile():
                 'message': 'No fields to update'
             }), 400
             
+        # Tokens from /login carry the id itself, tokens from /register a dict
+        user_id = current_user['id'] if isinstance(current_user, dict) else current_user
+        
         query += ", ".join(update_fields)
         query += " WHERE id = %s"
-        params.append(current_user['id'])
+        params.append(user_id)
         
         # Execute update
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor()
         
         cursor.execute(query, params)
@@ -532,7 +523,7 @@ def update_profile():
         
         affected_rows = cursor.rowcount
         cursor.close()
-        conn.close()
+        invalidate_user(user_id)
         
         if affected_rows == 0:
             return jsonify({
@@ -5,6 +5,7 @@ Implements the core authentication functionality.
 from flask import current_app
 from core.database import fetch_one, insert
 from utils.auth import generate_token, verify_password, hash_password
+from services.users import get_user, invalidate_user
 from datetime import datetime, timedelta
 
 def authenticate_user(username, password):
@@ -110,6 +111,7 @@ def register_user(user_data):
             VALUES (%s, %s, %s, %s, %s, %s)
         """
         user_id = insert(query, (firstname, lastname, username, hashed_password, email, user_type))
+        invalidate_user(user_id)
         
         return {
             'success': True,
@@ -140,10 +142,8 @@ def validate_user_token(token):
                 'message': 'Invalid or expired token'
             }
         
-        # Get user from database
-        user_id = payload.get('user_id')
-        query = "SELECT id, firstname, lastname, username, email, user_type FROM users WHERE id = %s"
-        user_data = fetch_one(query, (user_id,))
+        # Get user, from the per-process cache when possible
+        user_data = get_user(payload.get('user_id'))
         
         if not user_data:
             return {
@@ -153,12 +153,12 @@ def validate_user_token(token):
         
         # Create user object
         user = {
-            'id': user_data[0],
-            'firstname': user_data[1],
-            'lastname': user_data[2],
-            'username': user_data[3],
-            'email': user_data[4],
-            'user_type': user_data[5]
+            'id': user_data['id'],
+            'firstname': user_data['firstname'],
+            'lastname': user_data['lastname'],
+            'username': user_data['username'],
+            'email': user_data['email'],
+            'user_type': user_data['user_type']
         }
         
         return {
@@ -2,60 +2,237 @@
 Controllers for sensor data API endpoints.
 """
 
-from flask import request, jsonify
+from flask import request, jsonify, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from . import data_bp
-from core.database import get_db_connection
+from core.database import get_db, get_db_connection
+from services.readings import READ_COLUMNS, decode_batch, decode_reading, update_reading, delete_reading
+from services.ingest_buffer import RETRY_AFTER, BufferFull, write_readings
+from services import alerts, locations, stats, timeseries
+from services.downsample import downsample
+from services.window import current_window
+from services.pagination import PaginationError, fetch_page, parse_fields, parse_page_size
+from services.export import FORMATS as EXPORT_FORMATS, stream_export
+from services.users import get_user
+from services.response_cache import cached_response, global_tags, location_tags
+from services.live_feed import SSE_HEADERS, open_stream, parse_stream_args
+from models.schemas import BatchResponse, BatchRowResult, GraphDataQuery, SensorDataPage, SeriesQuery, parse_query
+from utils.responses import msgspec_response
 import MySQLdb
+import msgspec
+import numpy as np
 import random
 from datetime import datetime, timedelta
 
+# Largest number of readings accepted by /sensor-data/batch
+MAX_BATCH_SIZE = 10000
+
+# Columns of users that /all-data may return
+USER_COLUMNS = ('id', 'username', 'email', 'firstname', 'lastname', 'user_type', 'created_at')
+
+
+def _buffer_full(e):
+    response = jsonify({
+        'status': 'error',
+        'message': f'{str(e)}, retry shortly'
+    })
+    response.headers['Retry-After'] = str(RETRY_AFTER)
+    return response, 503
+
+def _parse_bound(value, name, end=False):
+    """Parse a start/end bound given as YYYY-MM-DD or YYYY-MM-DD HH:MM:SS."""
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            bound = datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+        # A bare end date includes the whole day
+        if end and fmt == '%Y-%m-%d':
+            bound += timedelta(days=1)
+        return bound
+    raise ValueError(f'Invalid {name}, expected YYYY-MM-DD or YYYY-MM-DD HH:MM:SS')
+
+def sensor_data_filters(query):
+    """
+    Build WHERE conditions and params for sensor_data from a SensorDataQuery:
+    location (any alias), date, and a start/end range on measured_at.
+    Raises ValueError for malformed bounds.
+    """
+    filters = []
+    params = []
+    
+    location = query.location
+    if location:
+        cursor = get_db().cursor()
+        try:
+            filters.append("location_id = %s")
+            params.append(locations.location_id(cursor, location))
+        finally:
+            cursor.close()
+        
+    date = query.date
+    if date:
+        filters.append("date = %s")
+        params.append(date)
+        
+    start = query.start
+    if start:
+        filters.append("measured_at >= %s")
+        params.append(_parse_bound(start, 'start'))
+        
+    end = query.end
+    if end:
+        filters.append("measured_at < %s")
+        params.append(_parse_bound(end, 'end', end=True))
+        
+    return filters, params
+
 @data_bp.route('/sensor-data', methods=['GET'])
 @jwt_required()
 def get_sensor_data():
     """Get all sensor data or filter by parameters."""
     try:
-        # Get query parameters
-        location = request.args.get('location')
-        date = request.args.get('date')
-        
-        # Build query
-        query = "SELECT * FROM sensor_data"
-        params = []
+        # Build filters from the query parameters
+        try:
+            query = parse_query(request.args)
+            filters, params = sensor_data_filters(query)
+            fields = parse_fields(query.fields, READ_COLUMNS)
+            page_size = parse_page_size(query.limit)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+            
+        # Fetch one page, newest first
+        conn = get_db()
+        cursor = conn.cursor(MySQLdb.cursors.DictCursor)
+        try:
+            data, next_cursor = fetch_page(
+                cursor, 'sensor_data', fields, filters, params,
+                after=query.cursor, page_size=page_size
+            )
+        except PaginationError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+        finally:
+            cursor.close()
+        
+        # Pages run to PAGE_SIZE_MAX rows; msgspec encodes them without jsonify's overhead
+        response = msgspec_response(SensorDataPage(
+            status='success',
+            count=len(data),
+            data=data,
+            next_cursor=next_cursor
+        ))
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
         
-        if location or date:
-            query += " WHERE"
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 500
+
+@data_bp.route('/sensor-data/export', methods=['GET'])
+@jwt_required()
+def export_sensor_data():
+    """Stream sensor data as NDJSON or CSV."""
+    try:
+        try:
+            query = parse_query(request.args)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
             
-            if location:
-                query += " location = %s"
-                params.append(location)
-                
-            if date:
-                if location:
-                    query += " AND"
-                query += " date = %s"
-                params.append(date)
+        fmt = query.format.lower()
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({
+                'status': 'error',
+                'message': f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+            }), 400
+            
+        try:
+            filters, params = sensor_data_filters(query)
+            fields = parse_fields(query.fields, READ_COLUMNS)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+            
+        sql = f"SELECT {', '.join(fields)} FROM sensor_data"
+        if filters:
+            sql += " WHERE " + " AND ".join(filters)
+        # Follow idx_measured_at when a range is given, otherwise the primary key
+        if query.start or query.end:
+            sql += " ORDER BY measured_at, id"
+        else:
+            sql += " ORDER BY id"
+            
+        # The unbuffered cursor holds its connection for the whole stream, so
+        # it gets its own instead of the request's shared one
+        stream = stream_export(get_db_connection(), sql, params, fields, fmt)
+        
+        # Run the query before committing to a 200 so failures still get a 500
+        first = next(stream, '')
+        
+        def generate():
+            try:
+                yield first
+                yield from stream
+            finally:
+                stream.close()
                 
-        query += " ORDER BY created_at DESC"
-        
-        # Execute query
-        conn = get_db_connection()
-        cursor = conn.cursor(MySQLdb.cursors.DictCursor)
-        cursor.execute(query, params)
-        data = cursor.fetchall()
-        cursor.close()
-        conn.close()
+        response = Response(
+            stream_with_context(generate()),
+            mimetype=EXPORT_FORMATS[fmt]
+        )
+        response.headers['Content-Disposition'] = f'attachment; filename=sensor_data.{fmt}'
+        return response
         
+    except Exception as e:
         return jsonify({
-            'status': 'success',
-            'count': len(data),
-            'data': data
-        }), 200
+            'status': 'error',
+            'message': f'Failed to export sensor data: {str(e)}'
+        }), 500
+
+@data_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_sensor_data():
+    """
+    Server-Sent Events feed of new readings.
+    EventSource cannot send headers, so the token may be passed as ?jwt=.
+    """
+    try:
+        try:
+            last_event_id, locations = parse_stream_args(request.args, request.headers)
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+            
+        stream = open_stream(last_event_id, locations)
+        if stream is None:
+            response = jsonify({
+                'status': 'error',
+                'message': 'Too many live feed clients, retry shortly'
+            })
+            response.headers['Retry-After'] = '5'
+            return response, 503
+            
+        return Response(stream, mimetype='text/event-stream', headers=SSE_HEADERS)
         
     except Exception as e:
         return jsonify({
             'status': 'error',
-            'message': str(e)
+            'message': f'Failed to open live feed: {str(e)}'
         }), 500
 
 @data_bp.route('/sensor-data', methods=['POST'])
@@ -66,67 +243,145 @@ def add_sensor_data():
         # Get current user
         current_user = get_jwt_identity()
         
-        # Get request data
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['ph_value', 'temperature', 'turbidity', 'location', 'time', 'date']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({
-                    'status': 'error',
-                    'message': f'Missing required field: {field}'
-                }), 400
-        
-        # Insert data
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        query = """
-        INSERT INTO sensor_data 
-        (ph_value, temperature, turbidity, location, time, date) 
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        
-        cursor.execute(query, (
-            data['ph_value'],
-            data['temperature'],
-            data['turbidity'],
-            data['location'],
-            data['time'],
-            data['date']
-        ))
+        # Decode and validate the body in one pass
+        row, error = decode_reading(request.get_data(cache=False))
+        if error:
+            return jsonify({
+                'status': 'error',
+                'message': error
+            }), 400
         
-        conn.commit()
-        new_id = cursor.lastrowid
-        cursor.close()
-        conn.close()
+        # Insert data, or queue it when the ingest buffer is on
+        ids, durable = write_readings(get_db, [row])
+        if not durable:
+            return jsonify({
+                'status': 'accepted',
+                'message': 'Sensor data queued for writing'
+            }), 202
         
         return jsonify({
             'status': 'success',
             'message': 'Sensor data added successfully',
-            'id': new_id
+            'id': ids[0]
         }), 201
         
+    except BufferFull as e:
+        return _buffer_full(e)
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': str(e)
         }), 500
 
+@data_bp.route('/sensor-data/batch', methods=['POST'])
+@jwt_required()
+def add_sensor_data_batch():
+    """
+    Add many sensor readings in one request.
+    ---
+    consumes:
+      - application/json
+      - application/x-ndjson
+    parameters:
+      - in: body
+        name: readings
+        description: JSON array of readings, an object with a "readings" array, or NDJSON
+    responses:
+      201:
+        description: All readings inserted
+      202:
+        description: All readings queued by the ingest buffer
+      207:
+        description: Some readings were rejected; see per-row results
+      400:
+        description: No valid readings in the request
+      503:
+        description: Ingest buffer full; retry after Retry-After seconds
+    """
+    try:
+        try:
+            entries = decode_batch(request.get_data(cache=False), request.content_type or '')
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': f'Invalid request body: {str(e)}'
+            }), 400
+        
+        if not entries:
+            return jsonify({
+                'status': 'error',
+                'message': 'No readings provided'
+            }), 400
+            
+        if len(entries) > MAX_BATCH_SIZE:
+            return jsonify({
+                'status': 'error',
+                'message': f'Batch too large: {len(entries)} readings (max {MAX_BATCH_SIZE})'
+            }), 413
+        
+        # Every reading was validated while decoding, before touching the database
+        results = []
+        rows = []
+        row_indexes = []
+        for index, (row, error) in enumerate(entries):
+            if error:
+                results.append(BatchRowResult(index=index, error=error))
+                continue
+            results.append(BatchRowResult(index=index))
+            rows.append(row)
+            row_indexes.append(index)
+            
+        if not rows:
+            return msgspec_response(BatchResponse(
+                status='error',
+                message='No valid readings in request',
+                inserted=0,
+                failed=len(results),
+                results=results
+            ), status=400)
+        
+        # Write all valid readings in a single transaction
+        ids, durable = write_readings(get_db, rows)
+        failed = len(results) - len(rows)
+        if not durable:
+            return msgspec_response(BatchResponse(
+                status='accepted' if not failed else 'partial',
+                inserted=0,
+                queued=len(rows),
+                failed=failed,
+                results=results
+            ), status=202 if not failed else 207)
+        
+        for index, new_id in zip(row_indexes, ids):
+            results[index].id = new_id
+            
+        return msgspec_response(BatchResponse(
+            status='success' if not failed else 'partial',
+            inserted=len(rows),
+            failed=failed,
+            results=results
+        ), status=201 if not failed else 207)
+        
+    except BufferFull as e:
+        return _buffer_full(e)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to add sensor data batch: {str(e)}'
+        }), 500
+
 @data_bp.route('/sensor-data/<int:data_id>', methods=['GET'])
 @jwt_required()
 def get_sensor_data_by_id(data_id):
     """Get sensor data by ID."""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
         cursor.execute("SELECT * FROM sensor_data WHERE id = %s", (data_id,))
         data = cursor.fetchone()
         
         cursor.close()
-        conn.close()
         
         if not data:
             return jsonify({
@@ -153,37 +408,20 @@ def update_sensor_data(data_id):
         # Get request data
         data = request.get_json()
         
-        # Build update query
-        query = "UPDATE sensor_data SET "
-        params = []
-        
-        # Add fields to update
-        update_fields = []
+        # Collect fields to update
+        changes = {}
         for field in ['ph_value', 'temperature', 'turbidity', 'location', 'time', 'date']:
             if field in data:
-                update_fields.append(f"{field} = %s")
-                params.append(data[field])
+                changes[field] = data[field]
                 
-        if not update_fields:
+        if not changes:
             return jsonify({
                 'status': 'error',
                 'message': 'No fields to update'
             }), 400
             
-        query += ", ".join(update_fields)
-        query += " WHERE id = %s"
-        params.append(data_id)
-        
-        # Execute update
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute(query, params)
-        conn.commit()
-        
-        affected_rows = cursor.rowcount
-        cursor.close()
-        conn.close()
+        # measured_at and the rollup buckets are kept in step by update_reading
+        affected_rows = update_reading(get_db(), data_id, changes)
         
         if affected_rows == 0:
             return jsonify({
@@ -207,15 +445,7 @@ def update_sensor_data(data_id):
 def delete_sensor_data(data_id):
     """Delete sensor data by ID."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM sensor_data WHERE id = %s", (data_id,))
-        conn.commit()
-        
-        affected_rows = cursor.rowcount
-        cursor.close()
-        conn.close()
+        affected_rows = delete_reading(get_db(), data_id)
         
         if affected_rows == 0:
             return jsonify({
@@ -239,95 +469,137 @@ def delete_sensor_data(data_id):
 def get_dashboard_stats():
     """Get statistics for dashboard."""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Get total readings in the last 24 hours
-        cursor.execute("""
-            SELECT COUNT(*) as total_readings_24h
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-        """)
-        total_readings = cursor.fetchone()['total_readings_24h']
-        
-        # Get highest pH value in the last 24 hours
-        cursor.execute("""
-            SELECT ph_value as value, location, CONCAT(date, ' ', time) as timestamp
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-            ORDER BY ph_value DESC
-            LIMIT 1
-        """)
-        highest_ph = cursor.fetchone()
+        # Served from the rolling window when enabled, otherwise one statement
+        window = current_window()
+        if window is not None:
+            return jsonify(stats.format_dashboard_stats(window.window_stats())), 200
+        return jsonify(stats.dashboard_stats(get_db())), 200
         
-        # Get highest temperature in the last 24 hours
-        cursor.execute("""
-            SELECT temperature as value, location, CONCAT(date, ' ', time) as timestamp
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-            ORDER BY temperature DESC
-            LIMIT 1
-        """)
-        highest_temp = cursor.fetchone()
-        
-        # Get highest turbidity in the last 24 hours
-        cursor.execute("""
-            SELECT turbidity as value, location, CONCAT(date, ' ', time) as timestamp
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-            ORDER BY turbidity DESC
-            LIMIT 1
-        """)
-        highest_turbidity = cursor.fetchone()
-        
-        # Get average values
-        cursor.execute("""
-            SELECT 
-                AVG(ph_value) as avg_ph,
-                AVG(temperature) as avg_temp,
-                AVG(turbidity) as avg_turbidity
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-        """)
-        averages = cursor.fetchone()
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to fetch dashboard stats: {str(e)}'
+        }), 500
+
+@data_bp.route('/window/consistency', methods=['GET'])
+@jwt_required()
+def get_window_consistency():
+    """Compare this worker's rolling window with the same aggregates in SQL."""
+    try:
+        window = current_window()
+        if window is None:
+            return jsonify({
+                'status': 'error',
+                'message': 'Rolling window is disabled or still seeding'
+            }), 404
+            
+        report = window.verify(get_db())
+        return jsonify({
+            'status': 'success' if report['consistent'] else 'inconsistent',
+            **report
+        }), 200
         
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to verify rolling window: {str(e)}'
+        }), 500
+
+@data_bp.route('/alerts', methods=['GET'])
+@jwt_required()
+def get_active_alerts():
+    """Currently open threshold alerts, oldest first."""
+    try:
+        cursor = get_db().cursor(MySQLdb.cursors.DictCursor)
+        active = alerts.active_alerts(cursor)
         cursor.close()
-        conn.close()
         
-        # Format the response
-        formatted_highest_ph = {
-            'value': float(highest_ph['value']) if highest_ph else 0,
-            'location': highest_ph['location'] if highest_ph else '',
-            'timestamp': highest_ph['timestamp'] if highest_ph else ''
-        } if highest_ph else None
+        for alert in active:
+            alert['opened_at'] = alert['opened_at'].strftime('%Y-%m-%d %H:%M:%S')
         
-        formatted_highest_temp = {
-            'value': float(highest_temp['value']) if highest_temp else 0,
-            'location': highest_temp['location'] if highest_temp else '',
-            'timestamp': highest_temp['timestamp'] if highest_temp else ''
-        } if highest_temp else None
-        
-        formatted_highest_turbidity = {
-            'value': float(highest_turbidity['value']) if highest_turbidity else 0,
-            'location': highest_turbidity['location'] if highest_turbidity else '',
-            'timestamp': highest_turbidity['timestamp'] if highest_turbidity else ''
-        } if highest_turbidity else None
+        return jsonify({
+            'status': 'success',
+            'data': active
+        }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to fetch alerts: {str(e)}'
+        }), 500
+
+@data_bp.route('/alert-thresholds', methods=['GET'])
+@jwt_required()
+def get_alert_thresholds():
+    """Safe range per parameter; null means unbounded on that side."""
+    try:
+        cursor = get_db().cursor()
+        thresholds = alerts.load_thresholds(cursor)
+        cursor.close()
         
         return jsonify({
             'status': 'success',
-            'total_readings_24h': total_readings,
-            'highest_ph': formatted_highest_ph,
-            'highest_temp': formatted_highest_temp,
-            'highest_turbidity': formatted_highest_turbidity,
-            'avg_ph': float(averages['avg_ph']) if averages['avg_ph'] else 0,
-            'avg_temp': float(averages['avg_temp']) if averages['avg_temp'] else 0,
-            'avg_turbidity': float(averages['avg_turbidity']) if averages['avg_turbidity'] else 0
+            'data': {
+                parameter: {'min_value': low, 'max_value': high}
+                for parameter, (low, high) in thresholds.items()
+            }
         }), 200
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to fetch alert thresholds: {str(e)}'
+        }), 500
+
+@data_bp.route('/alert-thresholds', methods=['PUT'])
+@jwt_required()
+def update_alert_thresholds():
+    """
+    Update thresholds (admin only). Body: {"ph_value": {"min_value": 6.5, "max_value": 8.5}, ...}
+    New thresholds apply to readings ingested afterwards.
+    """
+    try:
+        user = get_user(get_jwt_identity())
+        if not user:
+            return jsonify({
+                'status': 'error',
+                'message': 'User not found'
+            }), 401
+        if user['user_type'] != 'admin':
+            return jsonify({
+                'status': 'error',
+                'message': 'Unauthorized. Admin access required.'
+            }), 403
+        
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({
+                'status': 'error',
+                'message': 'Body must be an object of parameter thresholds'
+            }), 400
+        
+        changes = {}
+        try:
+            for parameter, bounds in data.items():
+                if not isinstance(bounds, dict):
+                    raise ValueError(f'Thresholds for {parameter} must be an object')
+                changes[parameter] = tuple(
+                    float(bounds[key]) if bounds.get(key) is not None else None
+                    for key in ('min_value', 'max_value')
+                )
+            alerts.update_thresholds(get_db(), changes)
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
         
+        return get_alert_thresholds()
+
     except Exception as e:
         return jsonify({
             'status': 'error',
-            'message': f'Failed to fetch dashboard stats: {str(e)}'
+            'message': f'Failed to update alert thresholds: {str(e)}'
         }), 500
 
 @data_bp.route('/all-data', methods=['GET'])
@@ -349,16 +621,8 @@ def get_all_data():
         current_user_id = get_jwt_identity()
         print(f"User ID from token: {current_user_id}")
         
-        # Get user from database
-        conn = get_db_connection()
-        cursor = conn.cursor(MySQLdb.cursors.DictCursor)
-        
-        # First check if user is an admin
-        cursor.execute(
-            "SELECT user_type FROM users WHERE id = %s", 
-            (current_user_id,)
-        )
-        user = cursor.fetchone()
+        # First check if user is an admin, from the per-process user cache
+        user = get_user(current_user_id)
         
         if not user:
             print(f"User not found: {current_user_id}")
@@ -376,6 +640,9 @@ def get_all_data():
         
         print(f"Admin access verified for user: {current_user_id}")
         
+        conn = get_db()
+        cursor = conn.cursor(MySQLdb.cursors.DictCursor)
+        
         # First, let's check the database schema to see what tables and columns are available
         cursor.execute("SHOW TABLES")
         tables = cursor.fetchall()
@@ -384,17 +651,20 @@ def get_all_data():
         # Instead of using a fixed query that might not match the schema,
         # let's use a more flexible approach based on the available tables
         
-        # If users table exists, we'll fetch users for the admin dashboard
-        cursor.execute("""
-            SELECT 
-                id, username, email, firstname, lastname, user_type, created_at
-            FROM 
-                users
-            ORDER BY 
-                id DESC
-        """)
-        
-        users_data = cursor.fetchall()
+        # Fetch one page of users for the admin dashboard, newest first
+        try:
+            fields = parse_fields(request.args.get('fields'), USER_COLUMNS)
+            users_data, next_cursor = fetch_page(
+                cursor, 'users', fields,
+                after=request.args.get('cursor'),
+                page_size=parse_page_size(request.args.get('limit'))
+            )
+        except PaginationError as e:
+            cursor.close()
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
         
         # Convert datetime objects to string for JSON serialization
         for item in users_data:
@@ -415,17 +685,20 @@ def get_all_data():
         ]
                 
         cursor.close()
-        conn.close()
         
         print(f"Fetched {len(users_data)} user records")
-        return jsonify({
+        response = jsonify({
             'status': 'success',
             'data': {
                 'users': users_data,
                 'sensor_data': mock_sensor_data
             },
-            'count': len(users_data)
+            'count': len(users_data),
+            'next_cursor': next_cursor
         })
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -437,6 +710,7 @@ def get_all_data():
 
 @data_bp.route('/compare-graph-data', methods=['GET'])
 @jwt_required()
+@cached_response(location_tags('locations'))
 def compare_graph_data():
     """Get comparative graph data for multiple locations."""
     try:
@@ -457,36 +731,19 @@ def compare_graph_data():
         # Split locations into a list
         location_list = locations.split(',')
 
-        # Execute query
-        conn = get_db_connection()
-        cursor = conn.cursor(MySQLdb.cursors.DictCursor)
-
-        # Query to get daily averages grouped by location and date
-        placeholders = ', '.join(['%s'] * len(location_list))
-        query = f"""
-            SELECT location, date, AVG({data_type}) AS value
-            FROM sensor_data
-            WHERE date >= %s AND date <= %s AND location IN ({placeholders})
-            GROUP BY location, date
-            ORDER BY date, location
-        """
-        params = [start_date, end_date] + location_list
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
+        # Daily averages grouped by location and date (served by the daily rollup)
+        conn = get_db()
+        cursor = conn.cursor()
+        rows = timeseries.daily_averages(cursor, data_type, location_list, start_date, end_date)
         cursor.close()
-        conn.close()
 
         # Convert data to JSON format
         data = {}
-        for row in rows:
-            location = row['location']
-            date_str = row['date'].strftime('%Y-%m-%d') if hasattr(row['date'], 'strftime') else str(row['date'])
-            value = float(row['value']) if row['value'] is not None else 0
-            
+        for location, date_str, value in rows:
             if location not in data:
                 data[location] = []
             
-            data[location].append({'date': date_str, 'value': value})
+            data[location].append({'date': date_str, 'value': value if value is not None else 0})
 
         return jsonify(data), 200
     except Exception as e:
@@ -494,12 +751,76 @@ def compare_graph_data():
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@data_bp.route('/series', methods=['GET'])
+@jwt_required()
+@cached_response(location_tags('locations'))
+def get_series():
+    """
+    Aggregate readings into time buckets for one or more locations.
+    Columnar output: per location, a 'time' array of bucket starts and one
+    array per '<metric>_<aggregate>'. The source (daily or hourly rollup, or
+    raw readings) is chosen by services.timeseries.plan unless forced.
+    """
+    try:
+        try:
+            query = parse_query(request.args, SeriesQuery)
+        except msgspec.ValidationError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+
+        location_list = [name for name in (query.locations or '').split(',') if name.strip()]
+        if not location_list or not query.start:
+            return jsonify({
+                'status': 'error',
+                'message': 'locations and start are required parameters'
+            }), 400
+
+        try:
+            width = timeseries.parse_bucket(query.bucket)
+            metrics = timeseries.parse_metrics(query.metrics)
+            aggregates = timeseries.parse_aggregates(query.aggregates)
+            start = _parse_bound(query.start, 'start')
+            # Open-ended ranges run to the next midnight, which keeps them rollup-aligned
+            end = (_parse_bound(query.end, 'end', end=True) if query.end
+                   else datetime.combine(datetime.now().date() + timedelta(days=1), datetime.min.time()))
+
+            conn = get_db()
+            cursor = conn.cursor()
+            try:
+                result = timeseries.query(cursor, location_list, metrics, aggregates, width, start, end,
+                                          source=query.source)
+            finally:
+                cursor.close()
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+
+        return msgspec_response({
+            'status': 'success',
+            'bucket': query.bucket,
+            'start': start.strftime(timeseries.TIME_FORMAT),
+            'end': end.strftime(timeseries.TIME_FORMAT),
+            'source': result['source'],
+            'series': result['series']
+        })
+
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Failed to fetch series: {str(e)}'
+        }), 500
+
 @data_bp.route('/recent-data', methods=['GET'])
 @jwt_required()
+@cached_response(global_tags)
 def get_recent_data():
     """Get recent sensor data (last 5 records)."""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
         # Get recent entries (last 5)
@@ -511,7 +832,6 @@ def get_recent_data():
         """)
         rows = cursor.fetchall()
         cursor.close()
-        conn.close()
 
         # Format the data
         data = []
@@ -546,24 +866,24 @@ def get_correlation_data():
         # Get location from query parameters
         location = request.args.get('location', 'US')  # Default location is 'US'
         
-        conn = get_db_connection()
-        cursor = conn.cursor(MySQLdb.cursors.DictCursor)
-        
-        # Calculate last 24 hours based on the server's timezone
-        now = datetime.now()
-        last_24h = now - timedelta(hours=24)
-        last_24h_str = last_24h.strftime('%Y-%m-%d %H:%M:%S')
-
-        # Query database for the last 24 hours and the specified location
-        query = """
-            SELECT temperature, turbidity, ph_value
-            FROM sensor_data
-            WHERE CONCAT(date, ' ', time) >= %s AND LOWER(location) = LOWER(%s)
-        """
-        cursor.execute(query, (last_24h_str, location))
-        rows = cursor.fetchall()
+        conn = get_db()
+        cursor = conn.cursor()
+        location_id = locations.location_id(cursor, location)
+        
+        window = current_window()
+        if window is not None:
+            rows = window.metric_values(location_id)
+        else:
+            # Query database for the trailing window and the specified location
+            query = """
+                SELECT temperature, turbidity, ph_value
+                FROM sensor_data
+                WHERE location_id = %s AND measured_at >= %s
+                ORDER BY measured_at, id
+            """
+            cursor.execute(query, (location_id, stats.window_cutoff()))
+            rows = cursor.fetchall()
         cursor.close()
-        conn.close()
 
         # Structure the data into arrays
         temperature_values = []
@@ -571,9 +891,9 @@ def get_correlation_data():
         ph_values = []
         
         for row in rows:
-            temperature_values.append(row['temperature'])
-            turbidity_values.append(row['turbidity'])
-            ph_values.append(row['ph_value'])
+            temperature_values.append(row[0])
+            turbidity_values.append(row[1])
+            ph_values.append(row[2])
 
         return jsonify({
             'status': 'success',
@@ -595,20 +915,12 @@ def get_correlation_data():
 def get_last_24_hours_data():
     """Get data from the last 24 hours."""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
-        # Get data from the last 24 hours
-        cursor.execute("""
-            SELECT *
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-            ORDER BY created_at DESC
-        """)
-        
-        data = cursor.fetchall()
+        # Readings measured in the trailing window, newest first
+        data = stats.recent_readings(cursor)
         cursor.close()
-        conn.close()
         
         return jsonify({
             'status': 'success',
@@ -623,10 +935,11 @@ def get_last_24_hours_data():
 
 @data_bp.route('/highest-values', methods=['GET'])
 @jwt_required()
+@cached_response(global_tags)
 def get_highest_values():
     """Get highest values for pH, temperature, and turbidity."""
     try:
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
         # Get highest pH value
@@ -657,7 +970,6 @@ def get_highest_values():
         highest_turbidity = cursor.fetchone()
         
         cursor.close()
-        conn.close()
         
         return jsonify({
             'status': 'success',
@@ -674,60 +986,100 @@ def get_highest_values():
 
 @data_bp.route('/graph-data', methods=['GET'])
 @jwt_required()
+@cached_response(location_tags('location', date_param='date'))
 def get_graph_data():
-    """Get graph data for a specific date and location."""
+    """
+    Get graph data for a location, for one date or a start/end range.
+    With max_points, each series is downsampled server-side (downsample=lttb
+    or minmax) so the payload stays bounded however often the sensor reports.
+    """
     try:
-        # Get query parameters
-        date = request.args.get('date')
-        location = request.args.get('location')
+        try:
+            query = parse_query(request.args, GraphDataQuery)
+        except msgspec.ValidationError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
         
         # Validate inputs
-        if not date or not location:
+        if not query.location or not (query.date or query.start):
             return jsonify({
                 'status': 'error',
-                'message': 'Date and location are required parameters'
+                'message': 'Location and either date or start are required parameters'
             }), 400
             
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
-        # Query to get data for the specified date and location
-        query = """
-            SELECT time, ph_value, temperature, turbidity
+        # A single date is served by (location_id, date, time), a range by (location_id, measured_at)
+        filters = ["location_id = %s"]
+        params = [locations.location_id(cursor, query.location)]
+        if query.date:
+            filters.append("date = %s")
+            params.append(query.date)
+            order = "time"
+        else:
+            try:
+                filters.append("measured_at >= %s")
+                params.append(_parse_bound(query.start, 'start'))
+                if query.end:
+                    filters.append("measured_at < %s")
+                    params.append(_parse_bound(query.end, 'end', end=True))
+            except ValueError as e:
+                cursor.close()
+                return jsonify({
+                    'status': 'error',
+                    'message': str(e)
+                }), 400
+            order = "measured_at"
+            
+        cursor.execute(f"""
+            SELECT time, measured_at, ph_value, temperature, turbidity
             FROM sensor_data
-            WHERE date = %s AND location = %s
-            ORDER BY time
-        """
-        cursor.execute(query, (date, location))
+            WHERE {' AND '.join(filters)}
+            ORDER BY {order}
+        """, params)
         rows = cursor.fetchall()
         cursor.close()
-        conn.close()
         
         if not rows:
             return jsonify({
                 'status': 'error',
-                'message': 'No data found for the specified date and location'
+                'message': 'No data found for the specified period and location'
             }), 404
             
         # Extract data for the chart
-        times = []
-        ph_values = []
-        temperature_values = []
-        turbidity_values = []
-        
-        for row in rows:
-            times.append(row['time'])
-            ph_values.append(float(row['ph_value']))
-            temperature_values.append(float(row['temperature']))
-            turbidity_values.append(float(row['turbidity']))
+        if query.date:
+            times = [row['time'] for row in rows]
+        else:
+            times = [row['measured_at'].strftime('%Y-%m-%d %H:%M:%S') for row in rows]
+        ph_values = np.fromiter((row['ph_value'] for row in rows), dtype=np.float64, count=len(rows))
+        temperature_values = np.fromiter((row['temperature'] for row in rows), dtype=np.float64, count=len(rows))
+        turbidity_values = np.fromiter((row['turbidity'] for row in rows), dtype=np.float64, count=len(rows))
+        
+        result = {'status': 'success'}
+        if query.max_points and len(rows) > query.max_points:
+            # Rows written before measured_at existed have no timestamp; fall back to their order
+            if all(row['measured_at'] is not None for row in rows):
+                axis = np.array([row['measured_at'] for row in rows], dtype='datetime64[s]').astype(np.int64)
+            else:
+                axis = np.arange(len(rows))
+            keep = downsample(axis, [ph_values, temperature_values, turbidity_values],
+                              query.max_points, query.downsample)
+            times = [times[index] for index in keep]
+            ph_values = ph_values[keep]
+            temperature_values = temperature_values[keep]
+            turbidity_values = turbidity_values[keep]
+            result['total_points'] = len(rows)
             
-        return jsonify({
-            'status': 'success',
+        result.update({
             'timestamps': times,
-            'ph_values': ph_values,
-            'temperature_values': temperature_values,
-            'turbidity_values': turbidity_values
-        }), 200
+            'ph_values': ph_values.tolist(),
+            'temperature_values': temperature_values.tolist(),
+            'turbidity_values': turbidity_values.tolist()
+        })
+        return jsonify(result), 200
         
     except Exception as e:
         return jsonify({
@@ -737,6 +1089,7 @@ def get_graph_data():
 
 @data_bp.route('/available-dates', methods=['GET'])
 @jwt_required()
+@cached_response(location_tags('location'))
 def get_available_dates():
     """Get available dates for a specific location."""
     try:
@@ -750,21 +1103,20 @@ def get_available_dates():
                 'message': 'Location is a required parameter'
             }), 400
             
-        conn = get_db_connection()
+        conn = get_db()
         cursor = conn.cursor(MySQLdb.cursors.DictCursor)
         
         # Query to get available dates for the specified location
         query = """
             SELECT DISTINCT date
             FROM sensor_data
-            WHERE location = %s
+            WHERE location_id = %s
             ORDER BY date DESC
             LIMIT 30
         """
-        cursor.execute(query, (location,))
+        cursor.execute(query, (locations.location_id(cursor, location),))
         rows = cursor.fetchall()
         cursor.close()
-        conn.close()
         
         if not rows:
             return jsonify({
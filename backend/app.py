@@ -19,8 +19,14 @@ print(f"MYSQL_HOST: {os.getenv('MYSQL_HOST')}")
 print(f"FRONTEND_URL: {os.getenv('FRONTEND_URL')}")
 
 # Import modules
-from core.database import init_db
+from core.database import init_db, get_pool_stats
+from core.cache import get_cache_stats
+from core.metrics import init_metrics
 from api import init_api
+from services.window import init_window
+from services.live_feed import init_live_feed, get_live_feed_stats
+from services.response_cache import init_response_cache, get_response_cache_stats
+from services.ingest_buffer import init_ingest_buffer, get_ingest_buffer_stats
 
 def create_app():
     """Create and configure the Flask application."""
@@ -32,7 +38,8 @@ def create_app():
          resources={r"/*": {"origins": [frontend_url, "http://localhost:3000"]}},
          supports_credentials=True,
          methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-         allow_headers=["Content-Type", "Authorization"])
+         allow_headers=["Content-Type", "Authorization"],
+         expose_headers=["X-Next-Cursor"])
     
     # Configure database
     app.config['MYSQL_HOST'] = os.getenv('MYSQL_HOST', 'localhost')
@@ -45,9 +52,24 @@ def create_app():
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = int(os.getenv('JWT_ACCESS_TOKEN_EXPIRES', 86400))  # 24 hours by default
     jwt = JWTManager(app)
     
+    # Request and SQL metrics on /metrics
+    init_metrics(app)
+    
     # Initialize database
     init_db(app)
     
+    # Seed the in-process rolling window of recent readings
+    init_window(app)
+    
+    # Cache read endpoints, invalidated by sensor_data writes
+    init_response_cache(app)
+    
+    # Publish new readings to Server-Sent Events subscribers
+    init_live_feed(app)
+    
+    # Group-commit ingested readings when INGEST_BUFFER_ENABLED is set
+    init_ingest_buffer(app)
+    
     # Initialize API routes
     init_api(app)
     
@@ -66,6 +88,27 @@ def create_app():
                 'message': str(e)
             }), 500
     
+    # Connection pool statistics
+    @app.route('/api/health/db', methods=['GET'])
+    def database_health():
+        """Connection pool statistics endpoint."""
+        return jsonify({
+            'status': 'healthy',
+            'pool': get_pool_stats()
+        }), 200
+    
+    # In-process cache statistics
+    @app.route('/api/health/caches', methods=['GET'])
+    def cache_health():
+        """Per-process cache statistics endpoint."""
+        return jsonify({
+            'status': 'healthy',
+            'caches': get_cache_stats(),
+            'responses': get_response_cache_stats(),
+            'live_feed': get_live_feed_stats(),
+            'ingest_buffer': get_ingest_buffer_stats()
+        }), 200
+    
     # Add a catch-all route for OPTIONS requests to handle CORS preflight
     @app.route('/', defaults={'path': ''}, methods=['OPTIONS'])
     @app.route('/<path:path>', methods=['OPTIONS'])
@@ -1,6 +1,6 @@
 # app/__init__.py
 
-from flask import Flask
+from flask import Flask, jsonify
 import os
 import sys
 
@@ -10,11 +10,14 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 # Now we can import get_config from the root config.py
 from config import get_config
 
-from flask_mysqldb import MySQL
 from flask_cors import CORS
-
-# Initialize MySQL
-mysql = MySQL()
+from core.cache import get_cache_stats
+from core.database import get_pool_stats, init_db
+from core.metrics import init_metrics
+from services.window import init_window
+from services.live_feed import init_live_feed, get_live_feed_stats
+from services.response_cache import init_response_cache, get_response_cache_stats
+from services.ingest_buffer import init_ingest_buffer, get_ingest_buffer_stats
 
 def create_app():
     app = Flask(__name__)
@@ -29,17 +32,52 @@ def create_app():
              "origins": app.config.get('CORS_ORIGIN', 'http://localhost:3000'),
              "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
              "allow_headers": ["Content-Type", "Authorization", "Access-Control-Allow-Credentials"],
+             "expose_headers": ["X-Next-Cursor"],
              "supports_credentials": True,
              "max_age": 86400  # 24 hours
          }},
          supports_credentials=True
     )
 
-    # Initialize MySQL
-    mysql.init_app(app)
+    # Request and SQL metrics on /metrics
+    init_metrics(app)
+
+    # Initialize the MySQL connection pool
+    init_db(app)
+
+    # Seed the in-process rolling window of recent readings
+    init_window(app)
+
+    # Cache read endpoints, invalidated by sensor_data writes
+    init_response_cache(app)
+
+    # Publish new readings to Server-Sent Events subscribers
+    init_live_feed(app)
+
+    # Group-commit ingested readings when INGEST_BUFFER_ENABLED is set
+    init_ingest_buffer(app)
 
     # Register Blueprints
     from routes import api
     app.register_blueprint(api)
 
+    # Connection pool statistics, as served by app.py
+    @app.route('/api/health/db', methods=['GET'])
+    def database_health():
+        return jsonify({
+            'status': 'healthy',
+            'pool': get_pool_stats()
+        }), 200
+
+    # In-process cache statistics, as served by app.py
+    @app.route('/api/health/caches', methods=['GET'])
+    def cache_health():
+        return jsonify({
+            'status': 'healthy',
+            'caches': get_cache_stats(),
+            'responses': get_response_cache_stats(),
+            'live_feed': get_live_feed_stats(),
+            'ingest_buffer': get_ingest_buffer_stats()
+        }), 200
+
     return app
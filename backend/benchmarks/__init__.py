@@ -0,0 +1,4 @@
+"""
+Database and API benchmarks.
+Run each module from the backend directory, e.g. `python -m benchmarks.measured_at`.
+"""
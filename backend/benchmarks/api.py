@@ -0,0 +1,439 @@
+"""
+Benchmark: every /api/data read and write endpoint, in-process and under gunicorn.
+
+Seeds sensor_data in a dedicated benchmark database with a reproducible
+synthetic dataset, then drives each endpoint through the Flask test client
+and/or a real gunicorn instance. Reports p50/p95/p99 latency, throughput and
+peak RSS per endpoint and writes the results as JSON; pass --compare with an
+earlier result file to print the change per endpoint.
+
+Point MYSQL_DB at a database used only for benchmarks: --seed truncates
+sensor_data, the rollups and the alert tables there.
+
+Usage:
+    MYSQL_DB=water360_bench python -m benchmarks.api --seed --rows 1000000 --locations 20
+    MYSQL_DB=water360_bench python -m benchmarks.api --mode both --requests 200 --concurrency 8
+    MYSQL_DB=water360_bench python -m benchmarks.api --mode gunicorn --compare benchmarks/results/api-....json
+"""
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.database import get_db_connection
+from benchmarks.common import DEFAULT_LOCATIONS, percentile, seed_table, summarize, write_results
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_FILE = os.path.join(BACKEND_DIR, 'database', 'schema', 'init.sql')
+
+BENCH_USER = ('Bench', 'User', 'bench_admin', '!', 'bench_admin@water360.local', 'admin')
+
+# Readings per request for the batch endpoint
+BATCH_SIZE = 100
+
+
+def create_bench_app():
+    """
+    The app.py application. Loaded by path because the legacy app/ package
+    shadows app.py on import; gunicorn calls this as benchmarks.api:create_bench_app().
+    """
+    spec = importlib.util.spec_from_file_location('water360_app', os.path.join(BACKEND_DIR, 'app.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.create_app()
+
+
+def location_names(count):
+    """The first `count` benchmark locations, stable between runs."""
+    names = list(DEFAULT_LOCATIONS[:count])
+    names.extend(f'site_{index:03d}' for index in range(len(names), count))
+    return names
+
+
+def create_schema(conn):
+    """Create any missing tables from init.sql and record the migrations."""
+    from migrations import apply_pending
+
+    with open(SCHEMA_FILE) as handle:
+        script = handle.read()
+    cursor = conn.cursor()
+    for statement in script.split(';\n'):
+        if statement.strip() and not all(line.startswith('--') for line in statement.strip().splitlines()):
+            cursor.execute(statement)
+    conn.commit()
+    cursor.close()
+    apply_pending(conn)
+
+
+def seed(rows, locations, days):
+    """Replace the benchmark dataset with `rows` readings over `locations` locations."""
+    from services import rollups
+
+    conn = get_db_connection()
+    try:
+        create_schema(conn)
+        cursor = conn.cursor()
+        for table in ('sensor_data', 'sensor_rollup_hourly', 'sensor_rollup_daily', 'sensor_alerts'):
+            cursor.execute(f"TRUNCATE TABLE {table}")
+        conn.commit()
+        cursor.close()
+        seed_table(conn, 'sensor_data', rows, locations=location_names(locations), days=days)
+        rollups.backfill(conn)
+    finally:
+        conn.close()
+
+
+def describe_dataset():
+    """Size and shape of the current dataset, recorded with every result."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), COUNT(DISTINCT location), MIN(measured_at), MAX(measured_at), MAX(id) FROM sensor_data")
+        rows, locations, first, last, max_id = cursor.fetchone()
+        cursor.execute("SELECT location FROM sensor_data WHERE id = %s", (max_id,))
+        location = cursor.fetchone()[0] if max_id else None
+        cursor.execute("SELECT DISTINCT location FROM sensor_data WHERE location <> %s LIMIT 1", (location,))
+        other = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+    if not rows:
+        raise SystemExit('sensor_data is empty; run with --seed first')
+    return {
+        'rows': rows,
+        'locations': locations,
+        'first_measured_at': first,
+        'last_measured_at': last,
+        'max_id': max_id,
+        'location': location,
+        'other_location': other[0] if other else location,
+    }
+
+
+def bench_user_id():
+    """Id of the admin user the benchmark authenticates as, creating it if needed."""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT IGNORE INTO users (firstname, lastname, username, password, email, user_type)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, BENCH_USER)
+        conn.commit()
+        cursor.execute("SELECT id FROM users WHERE username = %s", (BENCH_USER[2],))
+        user_id = cursor.fetchone()[0]
+        cursor.close()
+        return user_id
+    finally:
+        conn.close()
+
+
+def reading(offset=0, location=None):
+    now = datetime.now().replace(microsecond=0) - timedelta(seconds=offset)
+    return {
+        'ph_value': 7.1, 'temperature': 24.5, 'turbidity': 2.3,
+        'location': location or DEFAULT_LOCATIONS[0],
+        'date': now.strftime('%Y-%m-%d'), 'time': now.strftime('%H:%M:%S'),
+    }
+
+
+def endpoints(dataset):
+    """(name, method, path, body(i) or None) for every benchmarked endpoint."""
+    location = dataset['location']
+    last = dataset['last_measured_at']
+    day = last.strftime('%Y-%m-%d')
+    month_ago = (last - timedelta(days=30)).strftime('%Y-%m-%d')
+    pair = f"{location},{dataset['other_location']}"
+    return [
+        ('GET sensor-data', 'GET', '/api/data/sensor-data?limit=100', None),
+        ('GET sensor-data location', 'GET', f'/api/data/sensor-data?limit=100&location={location}', None),
+        ('GET sensor-data/<id>', 'GET', f"/api/data/sensor-data/{dataset['max_id']}", None),
+        ('GET sensor-data/export day', 'GET', f'/api/data/sensor-data/export?format=csv&location={location}&date={day}', None),
+        ('GET dashboard/stats', 'GET', '/api/data/dashboard/stats', None),
+        ('GET last-24-hours', 'GET', '/api/data/last-24-hours', None),
+        ('GET correlation-data', 'GET', f'/api/data/correlation-data?location={location}', None),
+        ('GET recent-data', 'GET', '/api/data/recent-data', None),
+        ('GET highest-values', 'GET', '/api/data/highest-values', None),
+        ('GET graph-data', 'GET', f'/api/data/graph-data?location={location}&date={day}', None),
+        ('GET compare-graph-data', 'GET',
+         f'/api/data/compare-graph-data?startDate={month_ago}&endDate={day}&locations={pair}&dataType=ph_value', None),
+        ('GET series 1h rollup', 'GET',
+         f'/api/data/series?locations={pair}&start={month_ago}&end={day}&bucket=1h&aggregates=avg,min,max', None),
+        ('GET series 15m p95', 'GET',
+         f'/api/data/series?locations={location}&start={day}&end={day}&bucket=15m&aggregates=avg,p95', None),
+        ('GET available-dates', 'GET', f'/api/data/available-dates?location={location}', None),
+        ('GET alerts', 'GET', '/api/data/alerts', None),
+        ('GET alert-thresholds', 'GET', '/api/data/alert-thresholds', None),
+        ('GET all-data', 'GET', '/api/data/all-data?limit=100', None),
+        ('POST sensor-data', 'POST', '/api/data/sensor-data', lambda i: reading(i)),
+        ('POST sensor-data/batch', 'POST', '/api/data/sensor-data/batch',
+         lambda i: [reading(i * BATCH_SIZE + n) for n in range(BATCH_SIZE)]),
+        ('PUT sensor-data/<id>', 'PUT', f"/api/data/sensor-data/{dataset['max_id']}",
+         lambda i: {'ph_value': 7.0 + (i % 10) / 10}),
+    ]
+
+
+class ClientDriver:
+    """Requests through the Flask test client, in this process."""
+
+    name = 'client'
+
+    def __init__(self, app, token):
+        self.app = app
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def pids(self):
+        return [os.getpid()]
+
+    def request(self, method, path, body=None):
+        response = self.app.test_client().open(path, method=method, headers=self.headers, json=body)
+        response.get_data()
+        return response.status_code
+
+    def close(self):
+        pass
+
+
+class GunicornDriver:
+    """Requests over HTTP keep-alive connections to a gunicorn started for the run."""
+
+    name = 'gunicorn'
+
+    def __init__(self, token, port, workers, threads):
+        self.port = port
+        self.headers = {'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'}
+        self._local = threading.local()
+        env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp(prefix='bench-metrics-'))
+        self.process = subprocess.Popen([
+            sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+            '--worker-class', 'gthread', '--threads', str(threads), 'benchmarks.api:create_bench_app()',
+        ], cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self._wait_ready()
+
+    def _wait_ready(self, timeout=120):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise SystemExit(f'gunicorn exited with status {self.process.returncode}')
+            try:
+                if self.request('GET', '/api/health') == 200:
+                    return
+            except OSError:
+                self._local.conn = None
+            time.sleep(0.5)
+        self.close()
+        raise SystemExit(f'gunicorn did not become ready within {timeout}s')
+
+    def pids(self):
+        """The master and its worker processes."""
+        master = self.process.pid
+        pids = [master]
+        for entry in os.listdir('/proc'):
+            if entry.isdigit():
+                try:
+                    with open(f'/proc/{entry}/stat') as handle:
+                        if int(handle.read().rsplit(')', 1)[1].split()[1]) == master:
+                            pids.append(int(entry))
+                except (OSError, IndexError, ValueError):
+                    continue
+        return pids
+
+    def request(self, method, path, body=None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        try:
+            conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=self.headers)
+            response = conn.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self._local.conn = None
+            conn.close()
+            raise
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class RssSampler:
+    """Samples the summed resident set size of a set of processes in the background."""
+
+    def __init__(self, pids, interval=0.05):
+        self.pids = pids
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _rss_kb(self):
+        total = 0
+        for pid in self.pids:
+            try:
+                with open(f'/proc/{pid}/status') as handle:
+                    for line in handle:
+                        if line.startswith('VmRSS:'):
+                            total += int(line.split()[1])
+                            break
+            except OSError:
+                continue
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self._rss_kb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, self._rss_kb())
+
+
+def measure(driver, endpoint, requests, concurrency, warmup):
+    """Run one endpoint `requests` times across `concurrency` threads."""
+    name, method, path, body = endpoint
+    for i in range(warmup):
+        driver.request(method, path, body(requests + i) if body else None)
+
+    def one(i):
+        started = time.perf_counter()
+        try:
+            status = driver.request(method, path, body(i) if body else None)
+        except Exception:
+            status = None
+        return (time.perf_counter() - started) * 1000, status
+
+    with RssSampler(driver.pids()) as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, range(requests)))
+        elapsed = time.perf_counter() - started
+
+    samples = [latency for latency, _ in outcomes]
+    errors = sum(1 for _, status in outcomes if status is None or status >= 400)
+    return {
+        **summarize(samples),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+        'peak_rss_mb': round(rss.peak_kb / 1024, 1),
+    }
+
+
+def run_suite(driver, dataset, args):
+    results = {}
+    for endpoint in endpoints(dataset):
+        if args.only and not any(part in endpoint[0] for part in args.only):
+            continue
+        stats = measure(driver, endpoint, args.requests, args.concurrency, args.warmup)
+        results[endpoint[0]] = stats
+        print(f"[{driver.name}] {endpoint[0]:<30} p50 {stats['p50_ms']:>8.1f} ms  p95 {stats['p95_ms']:>8.1f} ms  "
+              f"p99 {stats['p99_ms']:>8.1f} ms  {stats['throughput_rps']:>8.1f} req/s  "
+              f"rss {stats['peak_rss_mb']:>7.1f} MB  errors {stats['errors']}")
+    return results
+
+
+def compare(current, baseline_path):
+    """Print p95 and throughput changes against an earlier result file."""
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)
+    for mode, endpoints_now in current['modes'].items():
+        before = baseline.get('modes', {}).get(mode, {})
+        for name, now in endpoints_now.items():
+            if name not in before:
+                continue
+            p95 = (now['p95_ms'] / before[name]['p95_ms'] - 1) * 100 if before[name]['p95_ms'] else 0
+            rps = (now['throughput_rps'] / before[name]['throughput_rps'] - 1) * 100 if before[name]['throughput_rps'] else 0
+            print(f"[{mode}] {name:<30} p95 {p95:+7.1f}%  throughput {rps:+7.1f}%")
+
+
+def run(args):
+    from flask_jwt_extended import create_access_token
+
+    if args.seed:
+        database = os.getenv('MYSQL_DB', 'water360')
+        if 'bench' not in database and not args.force:
+            raise SystemExit(f"Refusing to truncate tables in '{database}'; set MYSQL_DB to a benchmark database or pass --force")
+        seed(args.rows, args.locations, args.days)
+
+    dataset = describe_dataset()
+    print(f"Dataset: {dataset['rows']} readings over {dataset['locations']} locations")
+
+    app = create_bench_app()
+    with app.app_context():
+        token = create_access_token(identity=str(bench_user_id()))
+
+    payload = {
+        'started_at': datetime.now(),
+        'dataset': dataset,
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'warmup': args.warmup,
+            'workers': args.workers,
+            'threads': args.threads,
+            'response_cache': os.getenv('RESPONSE_CACHE_BACKEND', 'memory'),
+            'rolling_window': os.getenv('ROLLING_WINDOW_ENABLED', 'false'),
+        },
+        'modes': {},
+    }
+
+    if args.mode in ('client', 'both'):
+        payload['modes']['client'] = run_suite(ClientDriver(app, token), dataset, args)
+
+    if args.mode in ('gunicorn', 'both'):
+        driver = GunicornDriver(token, args.port, args.workers, args.threads)
+        try:
+            payload['modes']['gunicorn'] = run_suite(driver, dataset, args)
+        finally:
+            driver.close()
+
+    print(f"Results written to {write_results('api', payload, args.out)}")
+    if args.compare:
+        compare(payload, args.compare)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seed', action='store_true', help='Replace the dataset before running')
+    parser.add_argument('--force', action='store_true', help='Allow --seed when MYSQL_DB does not look like a benchmark database')
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Readings to seed, e.g. 1000000, 10000000, 50000000')
+    parser.add_argument('--locations', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365, help='Span the seeded readings cover, ending now')
+    parser.add_argument('--mode', choices=['client', 'gunicorn', 'both'], default='both')
+    parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--only', nargs='*', help='Only endpoints whose name contains one of these strings')
+    parser.add_argument('--out', help='Result file; defaults to benchmarks/results/api-<timestamp>.json')
+    parser.add_argument('--compare', help='Earlier result file to compare against')
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
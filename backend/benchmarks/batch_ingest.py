@@ -0,0 +1,89 @@
+"""
+Benchmark: per-reading INSERT + COMMIT versus batched multi-row INSERT.
+
+Compares the old one-reading-per-request write pattern with the
+/sensor-data/batch write path (validate_reading + location lookup +
+insert_readings + one commit) against a scratch copy of sensor_data.
+
+Usage:
+    python -m benchmarks.batch_ingest --rows 50000 --batch-size 1000
+"""
+import argparse
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.database import get_db_connection
+from benchmarks.common import generate_readings, write_results
+from services.locations import resolve_rows
+from services.readings import insert_readings, validate_reading, REQUIRED_FIELDS
+
+TABLE = 'bench_ingest_sensor_data'
+
+
+def as_payloads(count):
+    """Build request-shaped reading dicts like a gateway would send."""
+    return [dict(zip(REQUIRED_FIELDS, row[:6])) for row in generate_readings(count, days=1)]
+
+
+def single_row(conn, payloads):
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    for payload in payloads:
+        row, _ = validate_reading(payload)
+        insert_readings(cursor, resolve_rows(conn, [row]), table=TABLE)
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    cursor.close()
+    return elapsed
+
+
+def batched(conn, payloads, batch_size):
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    for start in range(0, len(payloads), batch_size):
+        rows = [validate_reading(payload)[0] for payload in payloads[start:start + batch_size]]
+        insert_readings(cursor, resolve_rows(conn, rows), table=TABLE)
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    cursor.close()
+    return elapsed
+
+
+def run(rows, single_rows, batch_size):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} LIKE sensor_data")
+
+        single_elapsed = single_row(conn, as_payloads(single_rows))
+        batch_elapsed = batched(conn, as_payloads(rows), batch_size)
+
+        results = {
+            'single_row': {'rows': single_rows, 'seconds': round(single_elapsed, 3),
+                           'rows_per_second': round(single_rows / single_elapsed)},
+            'batched': {'rows': rows, 'batch_size': batch_size, 'seconds': round(batch_elapsed, 3),
+                        'rows_per_second': round(rows / batch_elapsed)},
+        }
+        for name, result in results.items():
+            print(f"{name}: {result['rows_per_second']} rows/s")
+        print(f"Results written to {write_results('batch_ingest', results)}")
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=50000, help='Rows written through the batch path')
+    parser.add_argument('--single-rows', type=int, default=2000, help='Rows written one commit at a time')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+    run(args.rows, args.single_rows, args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Helpers shared by the benchmark scripts.
+"""
+import json
+import math
+import os
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+DEFAULT_LOCATIONS = ['nuwara_wewa', 'thisa_wewa', 'kala_wewa', 'US', 'UK', 'LK', 'IN']
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    """Summarize latency samples in milliseconds."""
+    return {
+        'runs': len(samples_ms),
+        'min_ms': round(min(samples_ms), 3) if samples_ms else 0.0,
+        'median_ms': round(statistics.median(samples_ms), 3) if samples_ms else 0.0,
+        'p95_ms': round(percentile(samples_ms, 95), 3),
+        'p99_ms': round(percentile(samples_ms, 99), 3),
+        'max_ms': round(max(samples_ms), 3) if samples_ms else 0.0,
+    }
+
+
+def time_query(cursor, sql, params=None, repeat=5):
+    """Run a query repeat times and return (latency samples in ms, row count)."""
+    samples = []
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        rows = len(cursor.fetchall())
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, rows
+
+
+def explain(cursor, sql, params=None):
+    """Return the EXPLAIN rows for a query as a list of dicts."""
+    cursor.execute(f"EXPLAIN {sql}", params)
+    columns = [desc[0] for desc in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def generate_readings(count, locations=None, days=365, end=None, seed=42):
+    """Yield synthetic reading tuples spread evenly over the last `days` days."""
+    rng = random.Random(seed)
+    locations = locations or DEFAULT_LOCATIONS
+    end = end or datetime.now().replace(microsecond=0)
+    span = days * 24 * 3600
+    step = span / max(count, 1)
+    for i in range(count):
+        measured_at = end - timedelta(seconds=span - i * step)
+        yield (
+            round(rng.uniform(6.0, 9.0), 2),
+            round(rng.uniform(15.0, 35.0), 2),
+            round(rng.uniform(0.5, 25.0), 2),
+            rng.choice(locations),
+            measured_at.strftime('%H:%M:%S'),
+            measured_at.strftime('%Y-%m-%d'),
+            measured_at,
+        )
+
+
+def seed_table(conn, table, count, chunk_size=5000, log=print, **kwargs):
+    """
+    Bulk-load synthetic readings into table with multi-row inserts. Locations
+    are registered in the locations table so location_id filters match.
+    """
+    from services.locations import resolve
+
+    location_ids = {name: resolve(conn, name)[0] for name in kwargs.get('locations') or DEFAULT_LOCATIONS}
+    cursor = conn.cursor()
+    columns = '(ph_value, temperature, turbidity, location, time, date, measured_at, location_id)'
+    batch = []
+    inserted = 0
+    started = time.perf_counter()
+    for row in generate_readings(count, **kwargs):
+        batch.append(row + (location_ids[row[3]],))
+        if len(batch) >= chunk_size:
+            _insert_batch(cursor, table, columns, batch)
+            conn.commit()
+            inserted += len(batch)
+            batch = []
+            if inserted % (chunk_size * 100) == 0:
+                log(f"Seeded {inserted}/{count} rows into {table}")
+    if batch:
+        _insert_batch(cursor, table, columns, batch)
+        conn.commit()
+        inserted += len(batch)
+    cursor.close()
+    elapsed = time.perf_counter() - started
+    log(f"Seeded {inserted} rows into {table} in {elapsed:.1f}s ({inserted / elapsed:.0f} rows/s)")
+    return inserted
+
+
+def _insert_batch(cursor, table, columns, batch):
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s, %s, %s)'] * len(batch))
+    params = [value for row in batch for value in row]
+    cursor.execute(f"INSERT INTO {table} {columns} VALUES {placeholders}", params)
+
+
+def write_results(name, payload, out=None):
+    """Write benchmark results as JSON and return the file path."""
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        out = os.path.join(RESULTS_DIR, f'{name}-{stamp}.json')
+    with open(out, 'w') as handle:
+        json.dump(payload, handle, indent=2, default=str)
+    return out
@@ -0,0 +1,86 @@
+"""
+Benchmark: five-query dashboard stats versus the single-statement engine.
+
+Seeds a scratch copy of sensor_data with readings in the trailing 24 hours
+and compares round-trips and latency of the old /dashboard/stats query
+sequence with services.stats.
+
+Usage:
+    python -m benchmarks.dashboard_stats --rows 1000000 --repeat 20
+"""
+import argparse
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.database import get_db_connection
+from benchmarks.common import seed_table, summarize, write_results
+from services import stats
+
+TABLE = 'bench_stats_sensor_data'
+WINDOW = 'created_at >= NOW() - INTERVAL 24 HOUR'
+
+LEGACY_QUERIES = [
+    f"SELECT COUNT(*) FROM {TABLE} WHERE {WINDOW}",
+    f"SELECT ph_value, location, CONCAT(date, ' ', time) FROM {TABLE} WHERE {WINDOW} ORDER BY ph_value DESC LIMIT 1",
+    f"SELECT temperature, location, CONCAT(date, ' ', time) FROM {TABLE} WHERE {WINDOW} ORDER BY temperature DESC LIMIT 1",
+    f"SELECT turbidity, location, CONCAT(date, ' ', time) FROM {TABLE} WHERE {WINDOW} ORDER BY turbidity DESC LIMIT 1",
+    f"SELECT AVG(ph_value), AVG(temperature), AVG(turbidity) FROM {TABLE} WHERE {WINDOW}",
+]
+
+
+def legacy(conn):
+    cursor = conn.cursor()
+    for query in LEGACY_QUERIES:
+        cursor.execute(query)
+        cursor.fetchall()
+    cursor.close()
+    return len(LEGACY_QUERIES)
+
+
+def engine(conn):
+    query = stats.LAST_24_HOURS_QUERY.replace('FROM sensor_data', f'FROM {TABLE}')
+    stats.window_stats(conn, query)
+    return 1
+
+
+def measure(conn, fn, repeat):
+    samples = []
+    round_trips = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        round_trips = fn(conn)
+        samples.append((time.perf_counter() - started) * 1000)
+    return {**summarize(samples), 'round_trips': round_trips}
+
+
+def run(rows, repeat):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} LIKE sensor_data")
+        # Spread readings over the window so every row counts toward the stats
+        seed_table(conn, TABLE, rows, days=1)
+
+        results = {'rows': rows, 'legacy': measure(conn, legacy, repeat), 'engine': measure(conn, engine, repeat)}
+        for name in ('legacy', 'engine'):
+            print(f"{name}: {results[name]['round_trips']} round-trip(s), median {results[name]['median_ms']:.1f} ms")
+        print(f"Results written to {write_results('dashboard_stats', results)}")
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    run(args.rows, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
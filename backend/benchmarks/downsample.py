@@ -0,0 +1,100 @@
+"""
+Benchmark: /graph-data payload size and CPU time with server-side downsampling.
+
+Builds the three metric series for a long range of readings (one every
+--interval seconds) and compares returning every point with LTTB and
+min/max downsampling to --max-points. No database is needed:
+
+    payload    bytes of the JSON body the endpoint would return
+    cpu        process CPU time to pick the points and encode the body
+
+Usage:
+    python -m benchmarks.downsample --days 30 --interval 10 --max-points 1500
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from benchmarks.common import summarize, write_results
+from services.downsample import METHODS, downsample
+
+
+def sample_series(days, interval, seed=42):
+    """A day-cycling temperature, a noisy pH and a turbidity with occasional spikes."""
+    rng = np.random.default_rng(seed)
+    axis = np.arange(0, days * 86400, interval, dtype=np.int64)
+    ph = 7.2 + 0.3 * np.sin(axis / 43200 * np.pi) + rng.normal(0, 0.05, len(axis))
+    temperature = 24 + 4 * np.sin(axis / 86400 * 2 * np.pi) + rng.normal(0, 0.2, len(axis))
+    turbidity = 2 + rng.gamma(1.5, 0.5, len(axis))
+    spikes = rng.choice(len(axis), size=max(1, len(axis) // 20000), replace=False)
+    turbidity[spikes] += 40
+    return axis, [ph, temperature, turbidity]
+
+
+def body(axis, series, keep=None):
+    if keep is not None:
+        axis = axis[keep]
+        series = [values[keep] for values in series]
+    return json.dumps({
+        'status': 'success',
+        'timestamps': axis.tolist(),
+        'ph_values': series[0].tolist(),
+        'temperature_values': series[1].tolist(),
+        'turbidity_values': series[2].tolist(),
+    }).encode('utf-8')
+
+
+def cpu_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        fn()
+        samples.append((time.process_time() - started) * 1000)
+    return summarize(samples)
+
+
+def run(days, interval, max_points, repeat):
+    axis, series = sample_series(days, interval)
+    spike = int(series[2].argmax())
+
+    results = {'full': {
+        'points': len(axis),
+        'payload_bytes': len(body(axis, series)),
+        'cpu': cpu_ms(lambda: body(axis, series), repeat),
+    }}
+    for method in METHODS:
+        keep = downsample(axis, series, max_points, method)
+        results[method] = {
+            'points': len(keep),
+            'payload_bytes': len(body(axis, series, keep)),
+            'cpu': cpu_ms(lambda: body(axis, series, downsample(axis, series, max_points, method)), repeat),
+            'keeps_largest_spike': bool(spike in set(keep.tolist())),
+        }
+
+    for name, result in results.items():
+        print(f"{name}: {result['points']} points, {result['payload_bytes'] / 1024:.0f} KiB, "
+              f"{result['cpu']['median_ms']:.1f} ms CPU")
+    path = write_results('downsample', {
+        'days': days,
+        'interval': interval,
+        'max_points': max_points,
+        'repeat': repeat,
+        'results': results,
+    })
+    print(f"Results written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--interval', type=int, default=10, help='Seconds between readings')
+    parser.add_argument('--max-points', type=int, default=1500)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    run(args.days, args.interval, args.max_points, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
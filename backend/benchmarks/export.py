@@ -0,0 +1,93 @@
+"""
+Benchmark: streaming export versus fetchall() + one JSON document.
+
+Seeds a scratch copy of sensor_data, streams it through services.export as
+NDJSON and CSV, then loads it the way /all-data used to. Reports rows/s and
+peak RSS after each stage; peak RSS only grows, so the buffered run goes last.
+
+Usage:
+    python -m benchmarks.export --rows 2000000
+"""
+import argparse
+import json
+import resource
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.database import get_db_connection
+from benchmarks.common import seed_table, write_results
+from services.export import stream_export
+from services.readings import READ_COLUMNS
+
+TABLE = 'bench_export_sensor_data'
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def streamed(fmt):
+    query = f"SELECT {', '.join(READ_COLUMNS)} FROM {TABLE} ORDER BY id"
+    started = time.perf_counter()
+    size = 0
+    for chunk in stream_export(get_db_connection(), query, None, list(READ_COLUMNS), fmt):
+        size += len(chunk)
+    return started, size
+
+
+def buffered():
+    conn = get_db_connection()
+    started = time.perf_counter()
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT {', '.join(READ_COLUMNS)} FROM {TABLE} ORDER BY id")
+    rows = [dict(zip(READ_COLUMNS, row)) for row in cursor.fetchall()]
+    size = len(json.dumps(rows, default=str))
+    cursor.close()
+    conn.close()
+    return started, size
+
+
+def measure(rows, fn, *args):
+    started, size = fn(*args)
+    elapsed = time.perf_counter() - started
+    return {
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(rows / elapsed) if elapsed else 0,
+        'bytes': size,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run(rows):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} LIKE sensor_data")
+        seed_table(conn, TABLE, rows)
+
+        results = {'rows': rows, 'baseline_rss_mb': peak_rss_mb()}
+        results['ndjson'] = measure(rows, streamed, 'ndjson')
+        results['csv'] = measure(rows, streamed, 'csv')
+        results['fetchall_json'] = measure(rows, buffered)
+        for name in ('ndjson', 'csv', 'fetchall_json'):
+            print(f"{name}: {results[name]['rows_per_second']:,} rows/s, peak RSS {results[name]['peak_rss_mb']} MB")
+        print(f"Results written to {write_results('export', results)}")
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    args = parser.parse_args()
+    run(args.rows)
+
+
+if __name__ == '__main__':
+    main()
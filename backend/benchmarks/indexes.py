@@ -0,0 +1,146 @@
+"""
+Benchmark: sensor_data queries before and after the v0004 composite indexes.
+
+Seeds a scratch copy of sensor_data (1M rows by default) with the old
+single-column location index, times the location-scoped queries and records
+their EXPLAIN plans, then applies the migration's indexes to the copy and
+measures again. A query counts as fixed when its new plan neither scans the
+table nor needs a filesort or temporary table.
+
+Usage:
+    python -m benchmarks.indexes --rows 1000000 --repeat 5
+"""
+import argparse
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.database import get_db_connection
+from core.profiler import examined_rows
+from benchmarks.common import explain, seed_table, summarize, time_query, write_results
+from migrations import index_exists
+from migrations.versions import v0004_composite_indexes as composite
+
+TABLE = 'bench_index_sensor_data'
+
+LOCATION = 'US'
+
+QUERIES = {
+    'graph_data': (
+        "SELECT time, ph_value, temperature, turbidity FROM {table} "
+        "WHERE date = %s AND location = %s ORDER BY time",
+        lambda day, since: [day, LOCATION],
+    ),
+    'available_dates': (
+        "SELECT DISTINCT date FROM {table} WHERE location = %s ORDER BY date DESC LIMIT 30",
+        lambda day, since: [LOCATION],
+    ),
+    'sensor_data_page': (
+        "SELECT id, ph_value, temperature, turbidity, location, time, date, created_at FROM {table} "
+        "WHERE location = %s ORDER BY created_at DESC, id DESC LIMIT 100",
+        lambda day, since: [LOCATION],
+    ),
+    'correlation': (
+        "SELECT temperature, turbidity, ph_value FROM {table} WHERE location = %s AND measured_at >= %s",
+        lambda day, since: [LOCATION, since],
+    ),
+}
+
+
+def _plan_summary(plan):
+    return [{key: step.get(key) for key in ('type', 'key', 'rows', 'filtered', 'Extra')} for step in plan]
+
+
+def _is_clean(plan):
+    """No full scan, filesort or temporary table in any step."""
+    for step in plan:
+        extra = step.get('Extra') or ''
+        if step.get('type') == 'ALL' or 'filesort' in extra or 'temporary' in extra:
+            return False
+    return True
+
+
+def _reset(cursor):
+    """Put the scratch table in its pre-migration state."""
+    for name, _ in composite.ADD_INDEXES:
+        if index_exists(cursor, TABLE, name):
+            cursor.execute(f"ALTER TABLE {TABLE} DROP INDEX {name}")
+    if not index_exists(cursor, TABLE, 'idx_location'):
+        cursor.execute(f"ALTER TABLE {TABLE} ADD INDEX idx_location (location)")
+
+
+def _measure(cursor, repeat, day, since):
+    cursor.execute(f"ANALYZE TABLE {TABLE}")
+    cursor.fetchall()
+    results = {}
+    for name, (template, make_params) in QUERIES.items():
+        sql = template.format(table=TABLE)
+        params = make_params(day, since)
+        samples, row_count = time_query(cursor, sql, params, repeat=repeat)
+        plan = explain(cursor, sql, params)
+        results[name] = {
+            **summarize(samples),
+            'rows_returned': row_count,
+            'rows_examined': examined_rows(plan),
+            'clean': _is_clean(plan),
+            'plan': _plan_summary(plan),
+        }
+    return results
+
+
+def run(rows, repeat, keep):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} LIKE sensor_data")
+        _reset(cursor)
+        seed_table(conn, TABLE, rows)
+
+        since = datetime.now() - timedelta(hours=24)
+        day = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+
+        before = _measure(cursor, repeat, day, since)
+        composite.apply(cursor, TABLE)
+        after = _measure(cursor, repeat, day, since)
+
+        results = {}
+        for name in QUERIES:
+            old, new = before[name], after[name]
+            results[name] = {
+                'before': old,
+                'after': new,
+                'speedup': round(old['median_ms'] / new['median_ms'], 1) if new['median_ms'] else None,
+                'verified': new['clean'],
+            }
+            print(f"{name}: {old['median_ms']:.1f} ms -> {new['median_ms']:.1f} ms "
+                  f"({results[name]['speedup']}x), rows examined {old['rows_examined']} -> "
+                  f"{new['rows_examined']}, {'ok' if new['clean'] else 'still scans or sorts'}")
+
+        path = write_results('indexes', {
+            'rows': rows,
+            'repeat': repeat,
+            'indexes': [name for name, _ in composite.ADD_INDEXES],
+            'dropped': composite.DROP_INDEXES,
+            'results': results,
+        })
+        print(f"Results written to {path}")
+    finally:
+        if not keep:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help=f'Keep the {TABLE} table afterwards')
+    args = parser.parse_args()
+    run(args.rows, args.repeat, args.keep)
+
+
+if __name__ == '__main__':
+    main()
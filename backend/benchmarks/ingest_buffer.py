@@ -0,0 +1,132 @@
+"""
+Benchmark: one commit per reading versus the write-behind ingest buffer.
+
+Concurrent clients each write single readings, as the single-reading
+endpoints do. `direct` borrows a pooled connection and commits each reading; `buffered` submits them to an IngestBuffer and waits for the
+group commit (durable acks), against a scratch copy of sensor_data. Both
+report throughput and per-reading ack latency.
+
+Usage:
+    python -m benchmarks.ingest_buffer --clients 32 --per-client 200 --flush-rows 500 --flush-ms 50
+"""
+import argparse
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.database import get_db_connection
+from benchmarks.common import generate_readings, summarize, write_results
+from services.ingest_buffer import IngestBuffer
+from services.locations import resolve_rows
+from services.readings import insert_readings
+
+TABLE = 'bench_buffer_sensor_data'
+
+
+class BenchBuffer(IngestBuffer):
+    """Writes groups to the scratch table instead of going through save_readings."""
+
+    def _write(self, rows):
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            ids = insert_readings(cursor, resolve_rows(conn, rows), table=TABLE)
+            conn.commit()
+            return ids
+        finally:
+            cursor.close()
+            conn.close()
+
+
+def direct_client(rows, latencies):
+    # Like a request: borrow a pooled connection, insert, commit, release
+    for row in rows:
+        started = time.perf_counter()
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            insert_readings(cursor, resolve_rows(conn, [row]), table=TABLE)
+            conn.commit()
+        finally:
+            cursor.close()
+            conn.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+def buffered_client(buffer, rows, latencies):
+    for row in rows:
+        started = time.perf_counter()
+        ticket = buffer.submit([row])
+        ticket.wait()
+        ticket.result()
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+def run_clients(target, clients, per_client, *args):
+    readings = [row + (None,) for row in generate_readings(clients * per_client, days=1)]
+    latencies = []
+    threads = [
+        threading.Thread(target=target, args=args + (readings[i::clients], latencies))
+        for i in range(clients)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': len(readings),
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(len(readings) / elapsed),
+        'ack_latency': summarize(latencies),
+    }
+
+
+def run(clients, per_client, flush_rows, flush_ms):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} LIKE sensor_data")
+
+        results = {'direct': run_clients(direct_client, clients, per_client)}
+
+        buffer = BenchBuffer(capacity=clients * per_client, flush_rows=flush_rows, flush_ms=flush_ms)
+        try:
+            results['buffered'] = run_clients(buffered_client, clients, per_client, buffer)
+        finally:
+            buffer.close()
+        results['buffered']['flushes'] = buffer.stats()['flushes']
+
+        for name, result in results.items():
+            print(f"{name}: {result['rows_per_second']} rows/s, "
+                  f"ack p50 {result['ack_latency']['median_ms']} ms, p95 {result['ack_latency']['p95_ms']} ms")
+        path = write_results('ingest_buffer', {
+            'clients': clients,
+            'per_client': per_client,
+            'flush_rows': flush_rows,
+            'flush_ms': flush_ms,
+            'results': results,
+        })
+        print(f"Results written to {path}")
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent writers (gunicorn threads)')
+    parser.add_argument('--per-client', type=int, default=200, help='Readings written by each client')
+    parser.add_argument('--flush-rows', type=int, default=500)
+    parser.add_argument('--flush-ms', type=float, default=50)
+    args = parser.parse_args()
+    run(args.clients, args.per_client, args.flush_rows, args.flush_ms)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Benchmark: CONCAT(date, ' ', time) filters versus the indexed measured_at column.
+
+Seeds a scratch copy of sensor_data (10M rows by default), then times the
+trailing-window queries used by /correlation-data, /summary-insights and
+/warnings both ways and records their EXPLAIN plans.
+
+Usage:
+    python -m benchmarks.measured_at --rows 10000000 --repeat 5
+"""
+import argparse
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from core.database import get_db_connection
+from benchmarks.common import explain, seed_table, summarize, time_query, write_results
+
+TABLE = 'bench_sensor_data'
+
+QUERIES = {
+    'correlation': (
+        "SELECT temperature, turbidity, ph_value FROM {table} WHERE {predicate} AND location = %s",
+        lambda since: [since, 'US'],
+    ),
+    'warnings': (
+        "SELECT DISTINCT location FROM {table} WHERE {predicate} AND (ph_value < %s OR ph_value > %s)",
+        lambda since: [since, 6.5, 8.5],
+    ),
+    'summary_max': (
+        "SELECT ph_value, location FROM {table} WHERE {predicate} "
+        "AND ph_value = (SELECT MAX(ph_value) FROM {table} WHERE {predicate})",
+        lambda since: [since, since],
+    ),
+}
+
+PREDICATES = {
+    'concat': "CONCAT(date, ' ', time) >= %s",
+    'measured_at': "measured_at >= %s",
+}
+
+
+def run(rows, repeat, keep, window_hours):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.execute(f"CREATE TABLE {TABLE} LIKE sensor_data")
+        seed_table(conn, TABLE, rows)
+        cursor.execute(f"ANALYZE TABLE {TABLE}")
+        cursor.fetchall()
+
+        since = datetime.now() - timedelta(hours=window_hours)
+        since_str = since.strftime('%Y-%m-%d %H:%M:%S')
+        results = {}
+        for name, (template, make_params) in QUERIES.items():
+            results[name] = {}
+            for variant, predicate in PREDICATES.items():
+                sql = template.format(table=TABLE, predicate=predicate)
+                params = make_params(since_str if variant == 'concat' else since)
+                samples, row_count = time_query(cursor, sql, params, repeat=repeat)
+                plan = explain(cursor, sql, params)
+                results[name][variant] = {
+                    **summarize(samples),
+                    'rows_returned': row_count,
+                    'plan': [{key: step.get(key) for key in ('type', 'key', 'rows', 'Extra')} for step in plan],
+                }
+            concat_ms = results[name]['concat']['median_ms']
+            indexed_ms = results[name]['measured_at']['median_ms']
+            results[name]['speedup'] = round(concat_ms / indexed_ms, 1) if indexed_ms else None
+            print(f"{name}: concat {concat_ms:.1f} ms -> measured_at {indexed_ms:.1f} ms "
+                  f"({results[name]['speedup']}x)")
+
+        path = write_results('measured_at', {
+            'rows': rows,
+            'window_hours': window_hours,
+            'repeat': repeat,
+            'results': results,
+        })
+        print(f"Results written to {path}")
+    finally:
+        if not keep:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cursor.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--window-hours', type=int, default=24)
+    parser.add_argument('--keep', action='store_true', help=f'Keep the {TABLE} table afterwards')
+    args = parser.parse_args()
+    run(args.rows, args.repeat, args.keep, args.window_hours)
+
+
+if __name__ == '__main__':
+    main()
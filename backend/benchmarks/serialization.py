@@ -0,0 +1,133 @@
+"""
+Benchmark: msgspec versus json/jsonify for the largest payloads.
+
+Measures process CPU time, so no database is needed:
+
+    all_data       encoding a full page of sensor_data rows (as DictCursor
+                   returns them) with Flask's jsonify versus msgspec
+    batch_ingest   decoding and validating a /sensor-data/batch body the old
+                   way (json.loads, then per-field checks on each dict)
+                   versus one typed msgspec decode
+
+Usage:
+    python -m benchmarks.serialization --rows 1000 --batch-size 1000 --repeat 50
+"""
+import argparse
+import json
+import math
+import time
+from datetime import datetime
+
+from flask import Flask, jsonify
+
+from benchmarks.common import generate_readings, summarize, write_results
+from services.readings import READ_COLUMNS, REQUIRED_FIELDS, decode_batch, parse_measured_at
+from utils.responses import msgspec_response
+
+
+def sample_rows(count):
+    """Rows shaped like a DictCursor page of READ_COLUMNS."""
+    now = datetime.now().replace(microsecond=0)
+    return [
+        dict(zip(READ_COLUMNS, (index + 1,) + row + (None, index % 7 + 1, now, now)))
+        for index, row in enumerate(generate_readings(count, days=1))
+    ]
+
+
+def sample_body(count):
+    payloads = [dict(zip(REQUIRED_FIELDS, row[:6])) for row in generate_readings(count, days=1)]
+    return json.dumps(payloads).encode('utf-8')
+
+
+def legacy_validate(data):
+    """The hand-written per-dict validation batch ingest used before msgspec."""
+    if not isinstance(data, dict):
+        return None, 'Reading must be a JSON object'
+    for field in REQUIRED_FIELDS:
+        if data.get(field) is None or data.get(field) == '':
+            return None, f'Missing required field: {field}'
+    values = []
+    for field in ('ph_value', 'temperature', 'turbidity'):
+        try:
+            value = float(data[field])
+        except (TypeError, ValueError):
+            return None, f'Invalid numeric value for {field}'
+        if math.isnan(value) or math.isinf(value):
+            return None, f'Invalid numeric value for {field}'
+        values.append(value)
+    location = str(data['location']).strip()
+    if not location or len(location) > 255:
+        return None, 'Location must be between 1 and 255 characters'
+    date = str(data['date']).strip()
+    time_ = str(data['time']).strip()
+    measured_at = parse_measured_at(date, time_)
+    if measured_at is None:
+        return None, 'Invalid date or time'
+    return (values[0], values[1], values[2], location, time_, date, measured_at), None
+
+
+def legacy_decode(body):
+    return [legacy_validate(item) for item in json.loads(body)]
+
+
+def cpu_ms(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        fn()
+        samples.append((time.process_time() - started) * 1000)
+    return summarize(samples)
+
+
+def compare(name, old, new, repeat):
+    result = {'old': cpu_ms(old, repeat), 'new': cpu_ms(new, repeat)}
+    old_ms, new_ms = result['old']['median_ms'], result['new']['median_ms']
+    result['cpu_saved_pct'] = round(100 * (old_ms - new_ms) / old_ms, 1) if old_ms else None
+    print(f"{name}: {old_ms:.2f} ms -> {new_ms:.2f} ms CPU ({result['cpu_saved_pct']}% saved)")
+    return result
+
+
+def run(rows, batch_size, repeat):
+    app = Flask(__name__)
+    page = sample_rows(rows)
+    body = sample_body(batch_size)
+
+    # The new path must accept everything the old one did (it also returns the reading_key)
+    assert [row[:7] for row, _ in decode_batch(body)] == [row for row, _ in legacy_decode(body)]
+
+    with app.app_context():
+        results = {
+            'all_data': compare(
+                f'all_data ({rows} rows)',
+                lambda: jsonify(page).get_data(),
+                lambda: msgspec_response(page).get_data(),
+                repeat,
+            ),
+            'batch_ingest': compare(
+                f'batch_ingest ({batch_size} readings)',
+                lambda: legacy_decode(body),
+                lambda: decode_batch(body),
+                repeat,
+            ),
+        }
+
+    path = write_results('serialization', {
+        'rows': rows,
+        'batch_size': batch_size,
+        'repeat': repeat,
+        'results': results,
+    })
+    print(f"Results written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000, help='Rows per /all-data page (PAGE_SIZE_MAX)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    run(args.rows, args.batch_size, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,55 +1,426 @@
 """
 Database connection module.
-Provides functions for connecting to the MySQL database.
+Provides a bounded connection pool and helpers for querying the MySQL database.
 """
 
 import os
+import threading
+import time
+from collections import deque
 import MySQLdb
-from flask import current_app, g
+from flask import g
 import logging
+from core import metrics, profiler
 
 # Configure logger
 logger = logging.getLogger('database')
 
-def get_db_connection():
-    """Get a connection to the MySQL database."""
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection becomes available before the checkout timeout."""
+
+
+class InstrumentedCursor:
+    """
+    Cursor wrapper that times every statement, records it in core.metrics
+    under its query template and passes it to the slow-query log in
+    core.profiler. Everything else is delegated to the real cursor.
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        # Unbuffered cursors do not know the row count until the result is read
+        self._unbuffered = isinstance(cursor, MySQLdb.cursors.CursorUseResultMixIn)
+
+    def _timed(self, method, query, args):
+        started = time.perf_counter()
+        try:
+            result = method(query, args)
+        except Exception:
+            metrics.observe_query(query, time.perf_counter() - started, failed=True)
+            raise
+        elapsed = time.perf_counter() - started
+        rows = None if self._unbuffered else self._cursor.rowcount
+        metrics.observe_query(query, elapsed, rows)
+        profiler.record(query, args, elapsed, rows)
+        return result
+
+    def execute(self, query, args=None):
+        return self._timed(self._cursor.execute, query, args)
+
+    def executemany(self, query, args):
+        return self._timed(self._cursor.executemany, query, args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cursor.close()
+
+
+class PooledConnection:
+    """
+    Wrapper around a raw MySQLdb connection borrowed from a pool.
+    Calling close() returns the connection to the pool instead of closing it.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.closed = False
+
+    def close(self):
+        """Return the connection to its pool. Safe to call more than once."""
+        if self.closed:
+            return
+        self.closed = True
+        self._pool.release(self)
+
+    def cursor(self, *args, **kwargs):
+        """Open a cursor on the underlying connection, instrumented for metrics and the slow-query log."""
+        if self.closed:
+            raise MySQLdb.InterfaceError(0, 'Connection has been returned to the pool')
+        cursor = self._raw.cursor(*args, **kwargs)
+        return InstrumentedCursor(cursor) if metrics.ENABLED or profiler.ENABLED else cursor
+
+    def invalidate(self):
+        """Close the underlying connection instead of returning it to the pool."""
+        if self.closed:
+            return
+        self.closed = True
+        self._pool.invalidate(self)
+
+    def __getattr__(self, name):
+        if self.__dict__.get('closed'):
+            raise MySQLdb.InterfaceError(0, 'Connection has been returned to the pool')
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe MySQL connection pool.
+
+    Connections are health-checked on checkout when they have been idle longer
+    than ``ping_interval``, evicted once idle longer than ``idle_timeout`` (while
+    keeping ``min_size`` warm) and recycled after ``max_lifetime`` seconds.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=10.0,
+                 idle_timeout=300.0, max_lifetime=3600.0, ping_interval=30.0):
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.ping_interval = ping_interval
+
+        self._lock = threading.Condition(threading.Lock())
+        self._idle = deque()
+        self._size = 0
+        self._waiting = 0
+        self._pid = os.getpid()
+        self._stats = {
+            'connections_opened': 0,
+            'connections_closed': 0,
+            'checkouts': 0,
+            'checkout_timeouts': 0,
+            'health_check_failures': 0,
+            'recycled': 0,
+            'evicted_idle': 0,
+            'invalidated': 0,
+        }
+
+    # -- internals -----------------------------------------------------------
+
+    def _open(self):
+        raw = self._connect()
+        with self._lock:
+            self._stats['connections_opened'] += 1
+        metrics.connection_opened()
+        return PooledConnection(self, raw)
+
+    def _discard(self, conn, reason=None):
+        """Close a raw connection and free its slot. Caller must hold the lock."""
+        try:
+            conn._raw.close()
+        except Exception:
+            pass
+        self._size -= 1
+        self._stats['connections_closed'] += 1
+        if reason:
+            self._stats[reason] += 1
+        metrics.connection_closed(reason)
+        self._lock.notify()
+
+    def _expired(self, conn, now):
+        return self.max_lifetime and now - conn.created_at >= self.max_lifetime
+
+    def _check_fork(self):
+        """Drop connections inherited from a parent process (e.g. gunicorn --preload)."""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._size = 0
+
+    def _evict_idle(self, now):
+        """Close idle connections beyond min_size. Caller must hold the lock."""
+        if not self.idle_timeout:
+            return
+        while len(self._idle) and self._size > self.min_size:
+            oldest = self._idle[0]
+            if now - oldest.last_used < self.idle_timeout:
+                break
+            self._idle.popleft()
+            self._discard(oldest, 'evicted_idle')
+
+    # -- public API ----------------------------------------------------------
+
+    def warm_up(self):
+        """Open connections until min_size connections exist."""
+        while True:
+            with self._lock:
+                self._check_fork()
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._open()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                raise
+            conn.closed = True
+            with self._lock:
+                self._idle.append(conn)
+
+    def acquire(self, timeout=None):
+        """Borrow a healthy connection, opening a new one if below max_size."""
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                self._check_fork()
+                conn = None
+                while conn is None:
+                    now = time.monotonic()
+                    self._evict_idle(now)
+                    if self._idle:
+                        conn = self._idle.pop()
+                        if self._expired(conn, now):
+                            self._discard(conn, 'recycled')
+                            conn = None
+                        continue
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        self._stats['checkout_timeouts'] += 1
+                        raise PoolExhaustedError(
+                            f'No database connection available within {timeout}s '
+                            f'(max_size={self.max_size})'
+                        )
+                    self._waiting += 1
+                    try:
+                        self._lock.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+            elif self.ping_interval is not None and time.monotonic() - conn.last_used >= self.ping_interval:
+                try:
+                    conn._raw.ping()
+                except Exception as e:
+                    logger.warning(f"Discarding unhealthy pooled connection: {str(e)}")
+                    with self._lock:
+                        self._discard(conn, 'health_check_failures')
+                    continue
+
+            conn.closed = False
+            conn.last_used = time.monotonic()
+            with self._lock:
+                self._stats['checkouts'] += 1
+            return conn
+
+    def release(self, conn):
+        """Return a borrowed connection, rolling back any open transaction."""
+        if os.getpid() != self._pid:
+            # Borrowed before a fork; the socket belongs to the parent process
+            return
+
+        healthy = True
+        try:
+            conn._raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._lock:
+            now = time.monotonic()
+            conn.last_used = now
+            if not healthy:
+                self._discard(conn, 'health_check_failures')
+            elif self._expired(conn, now):
+                self._discard(conn, 'recycled')
+            else:
+                self._idle.append(conn)
+                self._lock.notify()
+            self._evict_idle(now)
+
+    def invalidate(self, conn):
+        """
+        Close a borrowed connection and free its slot. Used when the session
+        is in an unknown state, e.g. an unbuffered result abandoned mid-stream.
+        """
+        if os.getpid() != self._pid:
+            return
+        with self._lock:
+            self._discard(conn, 'invalidated')
+
+    def close_all(self):
+        """Close every idle connection. Borrowed connections close on release."""
+        with self._lock:
+            while self._idle:
+                self._discard(self._idle.pop())
+
+    def stats(self):
+        """Return a snapshot of pool statistics."""
+        with self._lock:
+            idle = len(self._idle)
+            return {
+                'size': self._size,
+                'idle': idle,
+                'in_use': self._size - idle,
+                'waiting': self._waiting,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                **self._stats,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _connect(**options):
+    """Open a raw connection to the MySQL database; options are passed to MySQLdb.connect."""
     try:
-        connection = MySQLdb.connect(
+        return MySQLdb.connect(
             host=os.getenv('MYSQL_HOST', 'localhost'),
             user=os.getenv('MYSQL_USER', 'root'),
             passwd=os.getenv('MYSQL_PASSWORD', ''),
             db=os.getenv('MYSQL_DB', 'water360'),
-            charset='utf8mb4'
+            charset='utf8mb4',
+            **options
         )
-        return connection
     except Exception as e:
         logger.error(f"Failed to connect to MySQL database: {str(e)}")
         raise
 
+
+def default_pool_size():
+    """
+    One connection per request thread under gunicorn (GUNICORN_THREADS, set by
+    gunicorn.conf.py), less the quarter the live feed may hold with streams
+    that only borrow a connection briefly, plus a few for background threads.
+    10 otherwise.
+    """
+    threads = int(os.getenv('GUNICORN_THREADS', 0))
+    if threads <= 0:
+        return 10
+    return threads - threads // 4 + 4
+
+
+def get_pool():
+    """Get the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    min_size=int(os.getenv('MYSQL_POOL_MIN_SIZE', 1)),
+                    max_size=int(os.getenv('MYSQL_POOL_MAX_SIZE', default_pool_size())),
+                    timeout=float(os.getenv('MYSQL_POOL_TIMEOUT', 10)),
+                    idle_timeout=float(os.getenv('MYSQL_POOL_IDLE_TIMEOUT', 300)),
+                    max_lifetime=float(os.getenv('MYSQL_POOL_MAX_LIFETIME', 3600)),
+                    ping_interval=float(os.getenv('MYSQL_POOL_PING_INTERVAL', 30)),
+                )
+    return _pool
+
+
+def get_pool_stats():
+    """Return statistics for the process-wide connection pool."""
+    return get_pool().stats()
+
+
+def open_connection(**options):
+    """
+    Open an unpooled, uninstrumented connection with extra MySQLdb options,
+    e.g. local_infile=1 for LOAD DATA LOCAL. For maintenance jobs; the
+    caller must close it.
+    """
+    return _connect(**options)
+
+
+def get_db_connection():
+    """
+    Borrow a connection from the pool.
+    The caller must call close() on it to return it to the pool.
+    """
+    return get_pool().acquire()
+
 def get_db():
-    """Get database connection from Flask application context."""
-    if 'db' not in g:
+    """Get the pooled connection bound to the Flask application context."""
+    db = g.get('db')
+    if db is None or db.closed:
         g.db = get_db_connection()
     return g.db
 
 def close_db(e=None):
-    """Close database connection."""
+    """Return the application context's connection to the pool."""
     db = g.pop('db', None)
     if db is not None:
         db.close()
 
 def init_db(app):
-    """Initialize database connection."""
+    """Initialize the connection pool and register the teardown handler."""
     app.teardown_appcontext(close_db)
-    
+
     # Test connection
     try:
-        conn = get_db_connection()
+        pool = get_pool()
+        pool.warm_up()
+        conn = pool.acquire()
         cursor = conn.cursor()
         cursor.execute('SELECT 1')
         cursor.close()
         conn.close()
-        app.logger.info("Database connection successful")
+        app.logger.info(f"Database connection successful (pool: {pool.stats()})")
     except Exception as e:
         app.logger.error(f"Database connection failed: {str(e)}")
         raise
@@ -58,7 +429,7 @@ def execute_query(query, params=None, commit=False):
     """Execute a database query and optionally commit changes."""
     conn = get_db()
     cursor = conn.cursor()
-    
+
     try:
         cursor.execute(query, params)
         if commit:
@@ -101,4 +472,4 @@ def delete(query, params=None):
     cursor = execute_query(query, params, commit=True)
     affected_rows = cursor.rowcount
     cursor.close()
-    return affected_rows 
\ No newline at end of file
+    return affected_rows
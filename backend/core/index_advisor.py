@@ -0,0 +1,297 @@
+"""
+Index advisor.
+
+Extracts the SQL statements embedded in the application source (string and
+f-string literals that contain SELECT ... FROM), optionally adds templates from
+the slow-query log, and proposes composite indexes per table:
+
+    equality columns, then GROUP BY / DISTINCT or ORDER BY columns, then one
+    range column, then the selected columns when that makes the index covering.
+
+Equality columns shared by many queries go first so proposals share prefixes.
+Queries whose key columns already lead an existing index are left on it, and
+proposals that are a prefix of another proposal are merged into it; existing
+indexes that are a prefix of a proposal are reported as redundant. Predicates wrapped in functions (LOWER(location), CONCAT(date, ...))
+cannot use an index and are reported instead.
+
+The advisor only proposes. Chosen indexes are applied by a migration and
+checked with `python -m benchmarks.indexes`.
+"""
+import ast
+import os
+import re
+from collections import Counter
+
+from core.metrics import query_template
+
+# Keep covering indexes to a reasonable width
+MAX_INDEX_COLUMNS = 5
+
+# Placeholder for f-string expressions such as {param} or {', '.join(fields)}
+HOLE = '__expr__'
+
+_QUERY = re.compile(
+    r'^\s*SELECT\s+(?P<distinct>DISTINCT\s+)?(?P<select>.+?)\s+FROM\s+(?P<table>\w+)(?P<rest>.*)$',
+    re.IGNORECASE | re.DOTALL
+)
+_CLAUSES = re.compile(r'\b(WHERE|GROUP BY|ORDER BY|LIMIT|HAVING)\b', re.IGNORECASE)
+_SUBQUERY = re.compile(r'\(\s*SELECT\b[^()]*(?:\([^()]*\)[^()]*)*\)', re.IGNORECASE)
+_PREDICATE = re.compile(
+    r'^\s*(?P<left>.+?)\s*(?P<op>=|<=>|>=|<=|<>|!=|>|<|\bBETWEEN\b|\bIN\b|\bLIKE\b|\bIS\b)', re.IGNORECASE
+)
+_BETWEEN = re.compile(r'\bBETWEEN\s+(\S+)\s+AND\s+(\S+)', re.IGNORECASE)
+_COLUMN = re.compile(r'^`?(\w+)`?$')
+_ALIAS = re.compile(r'\s+(?:AS\s+)?\w+$', re.IGNORECASE)
+_KEYWORDS = {'AS', 'DISTINCT', 'CASE', 'WHEN', 'THEN', 'ELSE', 'END', 'NULL', 'SEPARATOR', 'ASC', 'DESC',
+             'ORDER', 'BY', 'INTERVAL', 'HOUR', 'DAY', 'AND', 'OR', 'NOT', 'IS'}
+_INIT_INDEX = re.compile(r'^\s*(?:UNIQUE\s+)?(?:INDEX|KEY)\s+(\w+)\s*\(([^)]+)\)', re.IGNORECASE | re.MULTILINE)
+_INIT_TABLE = re.compile(r'CREATE TABLE(?: IF NOT EXISTS)?\s+(\w+)\s*\((.*?)\)\s*ENGINE', re.IGNORECASE | re.DOTALL)
+
+
+def _literal_text(node):
+    """Text of a str or f-string node, with expressions replaced by HOLE."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        parts = []
+        for value in node.values:
+            if isinstance(value, ast.Constant):
+                parts.append(value.value)
+            else:
+                parts.append(HOLE)
+        return ''.join(parts)
+    return None
+
+
+def extract_queries(paths):
+    """Yield (source location, SQL) for every SELECT literal in the given Python files."""
+    for path in paths:
+        with open(path, encoding='utf-8') as handle:
+            tree = ast.parse(handle.read(), filename=path)
+        for node in ast.walk(tree):
+            text = _literal_text(node)
+            if text and re.search(r'\bSELECT\b', text, re.IGNORECASE) and re.search(r'\bFROM\b', text, re.IGNORECASE):
+                yield f'{os.path.relpath(path)}:{node.lineno}', text
+
+
+def source_files(root):
+    """The controllers, legacy routes and services that issue queries."""
+    paths = [os.path.join(root, 'api', 'data', 'controllers.py'), os.path.join(root, 'routes', '__init__.py')]
+    services = os.path.join(root, 'services')
+    paths.extend(os.path.join(services, name) for name in sorted(os.listdir(services)) if name.endswith('.py'))
+    return [path for path in paths if os.path.exists(path)]
+
+
+def _split_top_level(text, separator):
+    """Split on a keyword (AND) or comma outside parentheses."""
+    parts, depth, current = [], 0, ''
+    tokens = re.split(rf'(\(|\)|{separator})', text, flags=re.IGNORECASE)
+    for token in tokens:
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        if depth == 0 and re.fullmatch(separator, token or '', re.IGNORECASE):
+            parts.append(current)
+            current = ''
+        else:
+            current += token or ''
+    parts.append(current)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def _column(expression):
+    match = _COLUMN.match(expression.strip())
+    return match.group(1).lower() if match and HOLE not in expression else None
+
+
+def parse_query(sql):
+    """
+    Return the indexable shape of a single-table SELECT, or None when the
+    statement is not one: {'table', 'eq', 'range', 'order', 'group', 'select',
+    'notes'}. Columns hidden behind f-string expressions are skipped.
+    """
+    match = _QUERY.match(_SUBQUERY.sub('?', sql))
+    if not match or match.group('table') == HOLE or re.search(r'\bJOIN\b|\bUNION\b', match.group('rest'), re.IGNORECASE):
+        return None
+
+    clauses = {}
+    pieces = _CLAUSES.split(match.group('rest'))
+    for keyword, body in zip(pieces[1::2], pieces[2::2]):
+        clauses[keyword.upper()] = body.strip()
+
+    shape = {'table': match.group('table').lower(), 'eq': [], 'range': [], 'order': [], 'group': [],
+             'select': [], 'notes': []}
+
+    # Keep the AND of BETWEEN x AND y out of the predicate split
+    where = _BETWEEN.sub(r'BETWEEN \1 \2', clauses.get('WHERE', ''))
+    if re.search(r'\bOR\b', where, re.IGNORECASE):
+        shape['notes'].append('OR in WHERE: only AND-ed predicates are considered')
+    for predicate in _split_top_level(where, r'\bAND\b') if where else []:
+        found = _PREDICATE.match(predicate)
+        if not found:
+            continue
+        column = _column(found.group('left'))
+        op = found.group('op').upper()
+        if column is None:
+            if HOLE not in found.group('left'):
+                shape['notes'].append(f'not sargable: {predicate.strip()}')
+            continue
+        if op in ('=', '<=>', 'IN', 'IS'):
+            shape['eq'].append(column)
+        elif op in ('>', '<', '>=', '<=', 'BETWEEN') or (op == 'LIKE' and not predicate.rstrip().endswith("'%")):
+            shape['range'].append(column)
+
+    for expression in _split_top_level(clauses.get('GROUP BY', ''), ','):
+        column = _column(expression)
+        if column:
+            shape['group'].append(column)
+    if match.group('distinct'):
+        shape['group'] = [column for column in map(_column, _split_top_level(match.group('select'), ',')) if column]
+
+    for expression in _split_top_level(clauses.get('ORDER BY', ''), ','):
+        column = _column(re.sub(r'\s+(ASC|DESC)$', '', expression, flags=re.IGNORECASE))
+        if column is None:
+            shape['order'] = []
+            shape['notes'].append(f'ORDER BY expression cannot use an index: {expression}')
+            break
+        shape['order'].append(column)
+
+    select = match.group('select')
+    # GROUP BY / ORDER BY on a computed alias (bucket, day) cannot use an index
+    aliases = {alias.lower() for alias in re.findall(r'\bAS\s+(\w+)', select, re.IGNORECASE)}
+    for key in ('group', 'order'):
+        computed = [column for column in shape[key] if column in aliases]
+        if computed:
+            shape['notes'].append(f"{'GROUP BY' if key == 'group' else 'ORDER BY'} on computed {computed[0]}")
+            shape[key] = shape[key][:shape[key].index(computed[0])]
+
+    if select.strip() == '*' or HOLE in select:
+        shape['select'] = None
+    else:
+        columns = set()
+        for expression in _split_top_level(select, ','):
+            expression = _ALIAS.sub('', re.sub(r"'[^']*'", '', expression)) if ' ' in expression.strip() else expression
+            for name in re.findall(r'\b([A-Za-z_]\w*)\b(?!\s*\()', expression):
+                if name.upper() not in _KEYWORDS:
+                    columns.add(name.lower())
+        shape['select'] = sorted(columns)
+    return shape
+
+
+def propose(shape, eq_rank):
+    """
+    (key columns, covering columns) for one parsed query, or None when no index
+    would help. The id primary key is left out: InnoDB appends it to every
+    secondary index.
+    """
+    columns = sorted(dict.fromkeys(shape['eq']), key=lambda column: (-eq_rank[column], shape['eq'].index(column)))
+    tail = shape['group'] or shape['order']
+    for column in tail:
+        if column not in columns:
+            columns.append(column)
+    if not tail and shape['range']:
+        columns.append(shape['range'][0])
+    elif shape['range'] and tail and shape['range'][0] != tail[0]:
+        shape['notes'].append(f"range on {shape['range'][0]} and ordering on {tail[0]}: one of them will filesort or scan")
+
+    columns = [column for column in columns if column != 'id']
+    if not columns:
+        return None
+    extra = ()
+    if shape['select'] is not None:
+        extra = tuple(column for column in shape['select'] if column not in columns and column != 'id')
+        if len(columns) + len(extra) > MAX_INDEX_COLUMNS:
+            extra = ()
+    return tuple(columns[:MAX_INDEX_COLUMNS]), extra
+
+
+def _is_prefix(short, long):
+    return len(short) <= len(long) and tuple(long[:len(short)]) == tuple(short)
+
+
+def existing_indexes_from_schema(schema_path):
+    """{table: {index name: (columns...)}} from init.sql, including PRIMARY KEY."""
+    with open(schema_path, encoding='utf-8') as handle:
+        script = handle.read()
+    tables = {}
+    for name, body in _INIT_TABLE.findall(script):
+        indexes = {}
+        for index, columns in _INIT_INDEX.findall(body):
+            indexes[index] = tuple(column.strip().strip('`').lower() for column in columns.split(','))
+        primary = re.search(r'PRIMARY KEY\s*\(([^)]+)\)', body, re.IGNORECASE)
+        if primary:
+            indexes['PRIMARY'] = tuple(column.strip().lower() for column in primary.group(1).split(','))
+        elif re.search(r'^\s*id\b.*PRIMARY KEY', body, re.IGNORECASE | re.MULTILINE):
+            indexes['PRIMARY'] = ('id',)
+        tables[name.lower()] = indexes
+    return tables
+
+
+def existing_indexes_from_db(cursor):
+    """{table: {index name: (columns...)}} from information_schema."""
+    cursor.execute("""
+        SELECT table_name, index_name, column_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() ORDER BY table_name, index_name, seq_in_index
+    """)
+    tables = {}
+    for table, index, column in cursor.fetchall():
+        indexes = tables.setdefault(table.lower(), {})
+        indexes[index] = indexes.get(index, ()) + (column.lower(),)
+    return tables
+
+
+def advise(queries, existing):
+    """
+    queries: iterable of (source, sql). existing: {table: {index: columns}}.
+    Returns {'queries': [...], 'proposals': {table: [(columns, [sources])]},
+    'redundant': {table: [index names]}}.
+    """
+    parsed = []
+    eq_rank = Counter()
+    for source, sql in queries:
+        shape = parse_query(sql)
+        if shape is None:
+            continue
+        parsed.append((source, query_template(sql.replace(HOLE, '?')), shape))
+        eq_rank.update(set(shape['eq']))
+
+    wanted = {}
+    report = []
+    for source, template, shape in parsed:
+        proposal = propose(shape, eq_rank)
+        indexes = existing.get(shape['table'], {})
+        columns = served_by = None
+        if proposal:
+            # An existing index on the key columns wins over a new covering one
+            key, covering = proposal
+            served_by = next((name for name, existing_columns in indexes.items() if _is_prefix(key, existing_columns)), None)
+            if served_by is None:
+                columns = key + covering
+                wanted.setdefault(shape['table'], {}).setdefault(columns, []).append(source)
+            else:
+                columns = key
+        report.append({'source': source, 'template': template, 'table': shape['table'], 'index': columns,
+                       'served_by': served_by, 'notes': shape['notes']})
+
+    proposals = {}
+    redundant = {}
+    for table, candidates in wanted.items():
+        kept = []
+        for columns, sources in candidates.items():
+            longer = [other for other in candidates if other != columns and _is_prefix(columns, other)]
+            if longer:
+                candidates[max(longer, key=len)].extend(sources)
+                continue
+            kept.append(columns)
+        proposals[table] = [(columns, sorted(set(candidates[columns]))) for columns in kept]
+        redundant[table] = sorted(
+            name for name, columns in existing.get(table, {}).items()
+            if name != 'PRIMARY' and any(_is_prefix(columns, proposal) for proposal in kept)
+        )
+    return {'queries': report, 'proposals': proposals, 'redundant': redundant}
+
+
+def index_name(columns):
+    """Name used for a proposed index, idx_<col>_<col>."""
+    return 'idx_' + '_'.join(columns)
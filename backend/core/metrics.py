@@ -0,0 +1,191 @@
+"""
+Prometheus metrics for HTTP requests and SQL queries.
+
+Request metrics are recorded by the hooks in core.middleware, query and
+connection metrics by core.database. Everything is exposed on /metrics in the
+Prometheus text format.
+
+Under gunicorn each worker is a separate process. When PROMETHEUS_MULTIPROC_DIR
+is set (gunicorn.conf.py sets it and clears it on startup) prometheus_client
+writes samples to memory-mapped files in that directory and /metrics merges
+every worker's files, so any worker can answer a scrape with the totals.
+"""
+import functools
+import os
+import re
+import threading
+
+from flask import Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+)
+
+ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Distinct query templates tracked per process; the rest are labelled 'other'
+MAX_QUERY_TEMPLATES = int(os.getenv('METRICS_MAX_QUERY_TEMPLATES', 500))
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route and status',
+    ['method', 'route', 'status']
+)
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time until the response is returned to the server (first byte for streams)',
+    ['method', 'route']
+)
+HTTP_IN_FLIGHT = Gauge(
+    'http_requests_in_progress', 'Requests currently being served, including open streams',
+    ['method', 'route'], multiprocess_mode='livesum'
+)
+DB_QUERY_LATENCY = Histogram(
+    'db_query_duration_seconds', 'SQL statement execution time by query template',
+    ['template'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+DB_QUERY_ROWS = Histogram(
+    'db_query_rows', 'Rows returned (SELECT) or affected (DML) by query template',
+    ['template'],
+    buckets=(0, 1, 10, 100, 1000, 10000, 100000)
+)
+DB_QUERY_ERRORS = Counter(
+    'db_query_errors_total', 'SQL statements that raised, by query template',
+    ['template']
+)
+DB_CONNECTIONS_OPENED = Counter(
+    'db_connections_opened_total', 'MySQL connections opened by the pool'
+)
+DB_CONNECTIONS_CLOSED = Counter(
+    'db_connections_closed_total', 'MySQL connections closed by the pool, by reason',
+    ['reason']
+)
+INGEST_QUEUED = Gauge(
+    'ingest_buffer_readings', 'Readings waiting in the write-behind ingest buffer',
+    multiprocess_mode='livesum'
+)
+INGEST_FLUSH_ROWS = Histogram(
+    'ingest_flush_rows', 'Readings written per ingest buffer group commit',
+    buckets=(1, 10, 50, 100, 250, 500, 1000, 5000)
+)
+INGEST_FLUSH_LATENCY = Histogram(
+    'ingest_flush_duration_seconds', 'Time to write and commit one ingest buffer group'
+)
+INGEST_REJECTED = Counter(
+    'ingest_rejected_total', 'Readings rejected because the ingest buffer was full'
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBER_LITERAL = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?![\w.])')
+_PLACEHOLDER = re.compile(r'%s|%\(\w+\)s')
+_VALUE_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_REPEATED_LIST = re.compile(r'\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+')
+_WHITESPACE = re.compile(r'\s+')
+
+_templates = set()
+_templates_lock = threading.Lock()
+
+
+@functools.lru_cache(maxsize=2048)
+def query_template(query):
+    """
+    Reduce a SQL statement to its shape: literals and placeholders become ?,
+    IN lists and multi-row VALUES collapse to (...), whitespace is squeezed.
+    """
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    template = _STRING_LITERAL.sub('?', query)
+    template = _PLACEHOLDER.sub('?', template)
+    template = _NUMBER_LITERAL.sub('?', template)
+    template = _VALUE_LIST.sub('(...)', template)
+    template = _REPEATED_LIST.sub('(...)', template)
+    return _WHITESPACE.sub(' ', template).strip()[:300]
+
+
+def _template_label(query):
+    template = query_template(query)
+    with _templates_lock:
+        if template in _templates:
+            return template
+        if len(_templates) >= MAX_QUERY_TEMPLATES:
+            return 'other'
+        _templates.add(template)
+        return template
+
+
+def observe_query(query, elapsed, rows=None, failed=False):
+    """Record one statement; rows is None when the count is unknown (unbuffered cursors)."""
+    if not ENABLED:
+        return
+    template = _template_label(query)
+    DB_QUERY_LATENCY.labels(template).observe(elapsed)
+    if failed:
+        DB_QUERY_ERRORS.labels(template).inc()
+    elif rows is not None and rows >= 0:
+        DB_QUERY_ROWS.labels(template).observe(rows)
+
+
+def connection_opened():
+    if ENABLED:
+        DB_CONNECTIONS_OPENED.inc()
+
+
+def connection_closed(reason=None):
+    if ENABLED:
+        DB_CONNECTIONS_CLOSED.labels(reason or 'closed').inc()
+
+
+def ingest_queued(count):
+    """count readings entered (positive) or left (negative) the ingest buffer."""
+    if ENABLED:
+        INGEST_QUEUED.inc(count)
+
+
+def ingest_flushed(rows, elapsed):
+    if ENABLED:
+        INGEST_FLUSH_ROWS.observe(rows)
+        INGEST_FLUSH_LATENCY.observe(elapsed)
+
+
+def ingest_rejected(count):
+    if ENABLED:
+        INGEST_REJECTED.inc(count)
+
+
+def request_started(method, route):
+    HTTP_IN_FLIGHT.labels(method, route).inc()
+
+
+def request_finished(method, route):
+    HTTP_IN_FLIGHT.labels(method, route).dec()
+
+
+def observe_request(method, route, status, elapsed):
+    HTTP_REQUESTS.labels(method, route, str(status)).inc()
+    HTTP_LATENCY.labels(method, route).observe(elapsed)
+
+
+def render():
+    """Return (body, content type) for a scrape, merged across workers in multiprocess mode."""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def init_metrics(app):
+    """Register the request hooks and the /metrics endpoint."""
+    if not ENABLED:
+        return
+
+    from core.middleware import register_metrics_hooks
+    register_metrics_hooks(app)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus scrape endpoint."""
+        body, content_type = render()
+        return Response(body, headers={'Content-Type': content_type})
+
+    mode = 'multiprocess' if os.getenv('PROMETHEUS_MULTIPROC_DIR') else 'single process'
+    app.logger.info(f"Prometheus metrics enabled on /metrics ({mode})")
@@ -2,8 +2,10 @@
 Middleware components for the application.
 Contains CORS configuration, error handlers, and other middleware.
 """
-from flask import Flask, jsonify, request
+import time
+from flask import Flask, g, jsonify, request
 from flask_cors import CORS
+from core import metrics
 
 def init_middleware(app: Flask) -> None:
     """Initialize middleware components."""
@@ -84,6 +86,9 @@ def register_error_handlers(app: Flask) -> None:
 def register_request_hooks(app: Flask) -> None:
     """Register request hooks."""
     
+    # Record request metrics
+    register_metrics_hooks(app)
+    
     @app.before_request
     def log_request_info():
         """Log request information."""
@@ -99,4 +104,40 @@ def register_request_hooks(app: Flask) -> None:
             response.headers['X-Content-Type-Options'] = 'nosniff'
             response.headers['X-Frame-Options'] = 'SAMEORIGIN'
             response.headers['X-XSS-Protection'] = '1; mode=block'
-        return response 
\ No newline at end of file
+        return response 
+
+def register_metrics_hooks(app: Flask) -> None:
+    """Record latency, status and in-flight metrics per route. Safe to call twice."""
+    if app.extensions.get('metrics_hooks') or not metrics.ENABLED:
+        return
+    app.extensions['metrics_hooks'] = True
+    
+    @app.before_request
+    def start_request_metrics():
+        """Start timing and count the request as in flight."""
+        # Label by URL rule, not path, to keep the number of series bounded
+        g.metrics_route = request.url_rule.rule if request.url_rule else 'unmatched'
+        g.metrics_started = time.perf_counter()
+        metrics.request_started(request.method, g.metrics_route)
+    
+    @app.after_request
+    def record_request_metrics(response):
+        """Record status and latency once the response is ready."""
+        started = g.get('metrics_started')
+        if started is not None:
+            metrics.observe_request(
+                request.method, g.metrics_route, response.status_code, time.perf_counter() - started
+            )
+        if response.is_streamed and 'metrics_route' in g:
+            # Teardown runs as soon as the view returns, before a generator body is
+            # sent; leave the in-flight gauge when the server closes the response instead
+            method, route = request.method, g.pop('metrics_route')
+            response.call_on_close(lambda: metrics.request_finished(method, route))
+        return response
+    
+    @app.teardown_request
+    def finish_request_metrics(error=None):
+        """Leave the in-flight gauge, unless a streamed response took it over."""
+        route = g.pop('metrics_route', None)
+        if route is not None:
+            metrics.request_finished(request.method, route)
@@ -0,0 +1,227 @@
+"""
+Slow-query log.
+
+Every statement run through a pooled connection is timed by
+core.database.InstrumentedCursor. Statements slower than SLOW_QUERY_MS are
+appended to a JSON-lines log with their parameter types (never the values)
+and the request path. The first time a template is logged in a process, its
+EXPLAIN plan is captured too, by a background thread on its own pooled
+connection so the slow request does not wait for it.
+`python manage.py slow-queries` ranks the logged templates by total time, p95
+and estimated rows examined.
+"""
+import json
+import logging
+import math
+import os
+import queue
+import threading
+import time
+
+from flask import has_request_context, request
+
+from core.metrics import query_template
+
+logger = logging.getLogger('slow_queries')
+
+ENABLED = os.getenv('SLOW_QUERY_ENABLED', 'true').lower() == 'true'
+THRESHOLD_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+EXPLAIN_ENABLED = os.getenv('SLOW_QUERY_EXPLAIN', 'true').lower() == 'true'
+LOG_PATH = os.getenv(
+    'SLOW_QUERY_LOG',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs', 'slow_queries.jsonl')
+)
+
+# Parameters kept per logged statement; multi-row inserts carry thousands
+MAX_LOGGED_PARAMS = 50
+
+# Statements MySQL can EXPLAIN without side effects worth capturing
+_EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE')
+
+# Pending EXPLAINs; further templates are skipped while the worker catches up
+_EXPLAIN_QUEUE_SIZE = 100
+
+_explained = set()
+_explain_queue = queue.Queue(maxsize=_EXPLAIN_QUEUE_SIZE)
+_explain_thread = None
+_thread_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+
+def _params(args):
+    """Parameter types in the shape of args; values may hold personal data."""
+    if args is None:
+        return None
+    if isinstance(args, dict):
+        return {key: type(args[key]).__name__ for key in list(args)[:MAX_LOGGED_PARAMS]}
+    args = list(args)
+    types = [type(arg).__name__ for arg in args[:MAX_LOGGED_PARAMS]]
+    if len(args) > MAX_LOGGED_PARAMS:
+        types.append(f'... {len(args) - MAX_LOGGED_PARAMS} more')
+    return types
+
+
+def _write(record):
+    line = json.dumps(record, default=str, separators=(',', ':'))
+    with _write_lock:
+        directory = os.path.dirname(LOG_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(LOG_PATH, 'a', encoding='utf-8') as log:
+            log.write(line + '\n')
+
+
+def _explain(query, args):
+    """Run EXPLAIN on a pooled connection; returns a list of plan rows."""
+    # core.database imports this module
+    from core.database import get_db_connection
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"EXPLAIN {query}", args)
+            columns = [desc[0] for desc in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+    finally:
+        conn.close()
+
+
+def _explain_loop():
+    while True:
+        ts, template, query, args = _explain_queue.get()
+        try:
+            plan = _explain(query, args)
+            _write({
+                'type': 'explain',
+                'ts': ts,
+                'template': template,
+                'rows_examined': examined_rows(plan),
+                'plan': plan,
+            })
+        except Exception as e:
+            logger.warning(f"EXPLAIN failed for {template}: {e}")
+
+
+def _queue_explain(ts, template, query, args):
+    global _explain_thread
+    with _thread_lock:
+        # Also restarts the worker in a process forked after it started
+        if _explain_thread is None or not _explain_thread.is_alive():
+            _explain_thread = threading.Thread(target=_explain_loop, name='slow-query-explain', daemon=True)
+            _explain_thread.start()
+    try:
+        _explain_queue.put_nowait((ts, template, query, args))
+    except queue.Full:
+        # Try again the next time the template is slow
+        _explained.discard(template)
+
+
+def examined_rows(plan):
+    """
+    Estimated rows examined from an EXPLAIN plan. Each table is read once per
+    row that survives the tables before it (rows x filtered %).
+    """
+    if not plan:
+        return None
+    examined = 0.0
+    prefix = 1.0
+    for step in plan:
+        rows = float(step.get('rows') or 1)
+        examined += prefix * rows
+        prefix *= rows * float(step.get('filtered') or 100) / 100
+    return int(examined)
+
+
+def record(query, args, elapsed, rows=None):
+    """Log the statement if it exceeded the threshold. Never raises."""
+    elapsed_ms = elapsed * 1000
+    if not ENABLED or elapsed_ms < THRESHOLD_MS:
+        return
+    try:
+        if isinstance(query, bytes):
+            query = query.decode('utf-8', 'replace')
+        template = query_template(query)
+        entry = {
+            'type': 'query',
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'pid': os.getpid(),
+            'template': template,
+            'ms': round(elapsed_ms, 3),
+            'rows': rows,
+            'params': _params(args),
+            'path': request.path if has_request_context() else None,
+        }
+        _write(entry)
+        logger.warning(f"Slow query ({elapsed_ms:.1f} ms): {template}")
+
+        verb = template.split(' ', 1)[0].upper()
+        if EXPLAIN_ENABLED and verb in _EXPLAINABLE and template not in _explained:
+            _explained.add(template)
+            _queue_explain(entry['ts'], template, query, args)
+    except Exception as e:
+        logger.warning(f"Slow query logging failed: {e}")
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def load_log(path=None):
+    """Read the slow-query log, skipping lines that do not parse."""
+    records = []
+    with open(path or LOG_PATH, encoding='utf-8') as log:
+        for line in log:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def report(records, sort='total', since=None):
+    """
+    Aggregate log records per template. Returns dicts with count, total_ms,
+    p50_ms, p95_ms, max_ms, avg_rows, rows_examined and the latest plan,
+    sorted by 'total', 'p95' or 'rows' (rows examined), largest first.
+    """
+    templates = {}
+    plans = {}
+    for entry in records:
+        # Plans are captured once per process, so keep them regardless of since
+        if entry.get('type') == 'explain':
+            plans[entry['template']] = entry
+            continue
+        if since and entry.get('ts', '') < since:
+            continue
+        stats = templates.setdefault(entry['template'], {'samples': [], 'rows': [], 'paths': set()})
+        stats['samples'].append(entry['ms'])
+        if entry.get('rows') is not None:
+            stats['rows'].append(entry['rows'])
+        if entry.get('path'):
+            stats['paths'].add(entry['path'])
+
+    result = []
+    for template, stats in templates.items():
+        samples = stats['samples']
+        plan = plans.get(template)
+        result.append({
+            'template': template,
+            'count': len(samples),
+            'total_ms': round(sum(samples), 3),
+            'p50_ms': _percentile(samples, 50),
+            'p95_ms': _percentile(samples, 95),
+            'max_ms': max(samples),
+            'avg_rows': round(sum(stats['rows']) / len(stats['rows']), 1) if stats['rows'] else None,
+            'rows_examined': plan['rows_examined'] if plan else None,
+            'plan': plan['plan'] if plan else None,
+            'paths': sorted(stats['paths']),
+        })
+
+    keys = {'total': 'total_ms', 'p95': 'p95_ms', 'rows': 'rows_examined'}
+    result.sort(key=lambda row: row[keys[sort]] or 0, reverse=True)
+    return result
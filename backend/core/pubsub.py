@@ -0,0 +1,121 @@
+"""
+In-process publish/subscribe.
+A Broker fans published events out to subscriber queues and keeps a ring
+buffer of recent events so reconnecting clients can resume. Queues are
+bounded: a subscriber that falls too far behind is dropped rather than
+allowed to grow without limit or slow down publishers.
+"""
+import queue
+import threading
+from collections import deque
+
+
+class Subscription:
+    """
+    One subscriber's bounded queue of (event_id, topic, payload) tuples.
+    Topics are any hashable values, compared as they are.
+    """
+
+    def __init__(self, broker, topics=None, maxsize=256):
+        self._broker = broker
+        self.topics = set(topics) if topics else None
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+        self.closed = False
+
+    def matches(self, topic):
+        return self.topics is None or topic in self.topics
+
+    def offer(self, event):
+        """Queue an event without blocking; on overflow mark the subscriber dropped."""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+            self.close()
+
+    def get(self, timeout=None):
+        """Return the next event, or None on timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self._broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class Broker:
+    """Thread-safe fan-out of events to subscribers, with a replay ring buffer."""
+
+    def __init__(self, history=1000, max_subscribers=100, queue_size=256):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._stats = {'published': 0, 'delivered': 0, 'dropped_subscribers': 0, 'rejected_subscribers': 0}
+
+    def publish(self, event_id, topic, payload):
+        """Record an event and offer it to every matching subscriber."""
+        event = (event_id, topic, payload)
+        with self._lock:
+            self._history.append(event)
+            subscribers = [sub for sub in self._subscribers if sub.matches(topic)]
+            self._stats['published'] += 1
+        for subscriber in subscribers:
+            subscriber.offer(event)
+            if subscriber.overflowed:
+                with self._lock:
+                    self._stats['dropped_subscribers'] += 1
+            else:
+                with self._lock:
+                    self._stats['delivered'] += 1
+
+    def subscribe(self, topics=None):
+        """Return a new Subscription, or None when at max_subscribers."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self._stats['rejected_subscribers'] += 1
+                return None
+            subscription = Subscription(self, topics, self.queue_size)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def replay(self, after_id, topics=None):
+        """
+        Return buffered events with id > after_id for the topics, or None when
+        the buffer no longer reaches back to after_id and the caller must fall
+        back to its own source.
+        """
+        wanted = set(topics) if topics else None
+        with self._lock:
+            history = list(self._history)
+        if not history or history[0][0] > after_id:
+            return None
+        return [event for event in history
+                if event[0] > after_id and (wanted is None or event[1] in wanted)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'history': len(self._history),
+                'history_size': self._history.maxlen,
+                **self._stats,
+            }
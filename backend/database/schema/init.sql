@@ -8,15 +8,136 @@ CREATE TABLE IF NOT EXISTS sensor_data (
     temperature FLOAT NOT NULL,
     turbidity FLOAT NOT NULL,
     location VARCHAR(255) NOT NULL,
+    location_id SMALLINT UNSIGNED NULL,
     time VARCHAR(50) NOT NULL,
     date VARCHAR(50) NOT NULL,
+    measured_at DATETIME NULL,
+    reading_key VARCHAR(64) CHARACTER SET ascii COLLATE ascii_bin NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-    INDEX idx_location (location),
+    UNIQUE KEY uk_reading_key (reading_key, measured_at),
+    INDEX idx_location_id_date_time (location_id, date, time),
+    INDEX idx_location_id_created_at (location_id, created_at),
+    INDEX idx_location_id_measured_at (location_id, measured_at),
     INDEX idx_date (date),
+    INDEX idx_measured_at (measured_at),
     INDEX idx_created_at (created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- Create location dimension (canonical names; aliases are normalized spellings)
+CREATE TABLE IF NOT EXISTS locations (
+    id SMALLINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uk_name (name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS location_aliases (
+    alias VARCHAR(255) NOT NULL PRIMARY KEY,
+    location_id SMALLINT UNSIGNED NOT NULL,
+    INDEX idx_location_id (location_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Create rollup tables (maintained on insert; rebuild with manage.py rollups-backfill)
+CREATE TABLE IF NOT EXISTS sensor_rollup_hourly (
+    location VARCHAR(255) NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    reading_count INT UNSIGNED NOT NULL DEFAULT 0,
+    ph_value_sum DOUBLE NOT NULL DEFAULT 0,
+    ph_value_min FLOAT NULL,
+    ph_value_max FLOAT NULL,
+    ph_value_sumsq DOUBLE NOT NULL DEFAULT 0,
+    temperature_sum DOUBLE NOT NULL DEFAULT 0,
+    temperature_min FLOAT NULL,
+    temperature_max FLOAT NULL,
+    temperature_sumsq DOUBLE NOT NULL DEFAULT 0,
+    turbidity_sum DOUBLE NOT NULL DEFAULT 0,
+    turbidity_min FLOAT NULL,
+    turbidity_max FLOAT NULL,
+    turbidity_sumsq DOUBLE NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (location, bucket_start),
+    INDEX idx_bucket_start (bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS sensor_rollup_daily (
+    location VARCHAR(255) NOT NULL,
+    bucket_start DATETIME NOT NULL,
+    reading_count INT UNSIGNED NOT NULL DEFAULT 0,
+    ph_value_sum DOUBLE NOT NULL DEFAULT 0,
+    ph_value_min FLOAT NULL,
+    ph_value_max FLOAT NULL,
+    ph_value_sumsq DOUBLE NOT NULL DEFAULT 0,
+    temperature_sum DOUBLE NOT NULL DEFAULT 0,
+    temperature_min FLOAT NULL,
+    temperature_max FLOAT NULL,
+    temperature_sumsq DOUBLE NOT NULL DEFAULT 0,
+    turbidity_sum DOUBLE NOT NULL DEFAULT 0,
+    turbidity_min FLOAT NULL,
+    turbidity_max FLOAT NULL,
+    turbidity_sumsq DOUBLE NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (location, bucket_start),
+    INDEX idx_bucket_start (bucket_start)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Create alert tables (evaluated on insert, see services/alerts.py)
+CREATE TABLE IF NOT EXISTS alert_thresholds (
+    parameter VARCHAR(32) NOT NULL PRIMARY KEY,
+    min_value FLOAT NULL,
+    max_value FLOAT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+INSERT IGNORE INTO alert_thresholds (parameter, min_value, max_value) VALUES
+    ('ph_value', 6.5, 8.5),
+    ('temperature', 0, 33),
+    ('turbidity', 1, 5);
+
+-- is_active is 1 while open and NULL once closed: one open alert per location and parameter
+CREATE TABLE IF NOT EXISTS sensor_alerts (
+    id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    location VARCHAR(255) NOT NULL,
+    parameter VARCHAR(32) NOT NULL,
+    is_active TINYINT NULL DEFAULT 1,
+    opened_at DATETIME NOT NULL,
+    closed_at DATETIME NULL,
+    opening_reading_id INT NULL,
+    closing_reading_id INT NULL,
+    last_reading_id INT NULL,
+    last_value FLOAT NOT NULL,
+    min_value FLOAT NULL,
+    max_value FLOAT NULL,
+    reading_count INT UNSIGNED NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_active_alert (location, parameter, is_active),
+    INDEX idx_is_active (is_active),
+    INDEX idx_opened_at (opened_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Checkpoints of manage.py bulk-load, one per source file
+CREATE TABLE IF NOT EXISTS bulk_loads (
+    source VARCHAR(255) NOT NULL PRIMARY KEY,
+    bytes_done BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    lines_done INT UNSIGNED NOT NULL DEFAULT 0,
+    rows_loaded INT UNSIGNED NOT NULL DEFAULT 0,
+    rows_duplicate INT UNSIGNED NOT NULL DEFAULT 0,
+    rows_rejected INT UNSIGNED NOT NULL DEFAULT 0,
+    min_measured_at DATETIME NULL,
+    max_measured_at DATETIME NULL,
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at DATETIME NULL
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Secondary indexes dropped by bulk-load --drop-indexes until they are rebuilt
+CREATE TABLE IF NOT EXISTS bulk_load_dropped_indexes (
+    table_name VARCHAR(64) NOT NULL,
+    index_name VARCHAR(64) NOT NULL,
+    columns VARCHAR(1024) NOT NULL,
+    dropped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (table_name, index_name)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
 -- Create users table
 CREATE TABLE IF NOT EXISTS users (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -41,8 +162,37 @@ SELECT 'Admin', 'User', 'admin',
 FROM dual
 WHERE NOT EXISTS (SELECT * FROM users WHERE username = 'admin' OR email = 'admin@water360.com');
 
--- Add sample sensor data if the table is empty
-INSERT INTO sensor_data (ph_value, temperature, turbidity, location, time, date)
-SELECT 7.2, 25.5, 3.7, 'US', '10:30:00', '2023-03-01'
+-- Add sample sensor data if the table is empty, with its location registered
+-- (reads filter on location_id, see services/locations.py)
+INSERT IGNORE INTO locations (name)
+SELECT 'US'
 FROM dual
-WHERE NOT EXISTS (SELECT 1 FROM sensor_data LIMIT 1); 
\ No newline at end of file
+WHERE NOT EXISTS (SELECT 1 FROM sensor_data LIMIT 1);
+
+INSERT IGNORE INTO location_aliases (alias, location_id)
+SELECT 'us', id FROM locations WHERE name = 'US';
+
+INSERT INTO sensor_data (ph_value, temperature, turbidity, location, time, date, measured_at, location_id)
+SELECT 7.2, 25.5, 3.7, 'US', '10:30:00', '2023-03-01', '2023-03-01 10:30:00', l.id
+FROM locations l
+WHERE l.name = 'US'
+AND NOT EXISTS (SELECT 1 FROM sensor_data LIMIT 1);
+
+-- Build rollups for the sample data
+INSERT IGNORE INTO sensor_rollup_hourly
+SELECT location, DATE_FORMAT(measured_at, '%Y-%m-%d %H:00:00'), COUNT(*),
+       SUM(ph_value), MIN(ph_value), MAX(ph_value), SUM(ph_value * ph_value),
+       SUM(temperature), MIN(temperature), MAX(temperature), SUM(temperature * temperature),
+       SUM(turbidity), MIN(turbidity), MAX(turbidity), SUM(turbidity * turbidity),
+       CURRENT_TIMESTAMP
+FROM sensor_data WHERE measured_at IS NOT NULL
+GROUP BY location, DATE_FORMAT(measured_at, '%Y-%m-%d %H:00:00');
+
+INSERT IGNORE INTO sensor_rollup_daily
+SELECT location, DATE(measured_at), COUNT(*),
+       SUM(ph_value), MIN(ph_value), MAX(ph_value), SUM(ph_value * ph_value),
+       SUM(temperature), MIN(temperature), MAX(temperature), SUM(temperature * temperature),
+       SUM(turbidity), MIN(turbidity), MAX(turbidity), SUM(turbidity * turbidity),
+       CURRENT_TIMESTAMP
+FROM sensor_data WHERE measured_at IS NOT NULL
+GROUP BY location, DATE(measured_at);
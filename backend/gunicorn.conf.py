@@ -0,0 +1,41 @@
+"""
+Gunicorn configuration, loaded by start.sh with -c.
+
+Sets up prometheus_client multiprocess mode: every worker writes its metrics to
+PROMETHEUS_MULTIPROC_DIR and /metrics merges them. The directory is cleared
+when the master starts, and a worker's live gauges are discarded when it exits.
+
+The master exports its --threads and --workers settings as GUNICORN_THREADS
+and GUNICORN_WORKERS so workers can size per-thread limits and pick
+process-shared backends. Workers also drain their write-behind ingest buffer (services.ingest_buffer)
+before exiting, so keep graceful_timeout above INGEST_BUFFER_DRAIN_TIMEOUT.
+"""
+import os
+import shutil
+import tempfile
+
+# Must be in the environment before any worker imports prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'water360-metrics'))
+
+
+def on_starting(server):
+    """Drop samples left over from a previous run and tell workers their thread and worker counts."""
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    # The live feed sizes its stream limit from this (services.live_feed.MAX_CLIENTS)
+    os.environ['GUNICORN_THREADS'] = str(server.cfg.threads)
+    # Several workers need the shared response cache (services.response_cache)
+    os.environ['GUNICORN_WORKERS'] = str(server.cfg.workers)
+
+
+def child_exit(server, worker):
+    """Remove the exited worker's in-flight gauge files."""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def worker_exit(server, worker):
+    """Flush readings still queued in this worker's ingest buffer."""
+    from services.ingest_buffer import shutdown
+    shutdown()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Water360 Management Commands
+----------------------------
+Database maintenance tasks that run outside the request cycle.
+
+Usage:
+    python manage.py migrate
+    python manage.py backfill-measured-at --chunk-size 5000
+    python manage.py rollups-backfill --since 2024-01-01
+    python manage.py locations-backfill --chunk-size 5000
+    python manage.py location-alias "nuwara wewa" nuwara_wewa
+    python manage.py slow-queries --sort p95 --limit 10
+    python manage.py index-advisor --db --log logs/slow_queries.jsonl
+    python manage.py partitions maintain --retention-months 24
+    python manage.py bulk-load dumps/*.csv.gz --location nuwara_wewa --drop-indexes
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+from core.database import get_db_connection
+
+
+def cmd_migrate(args):
+    """Apply pending schema migrations."""
+    from migrations import apply_pending, pending
+
+    conn = get_db_connection()
+    try:
+        if args.dry_run:
+            for module in pending(conn):
+                print(f"Pending {module.VERSION}: {module.DESCRIPTION}")
+            return 0
+
+        applied = apply_pending(conn, target=args.target)
+        print(f"Applied {len(applied)} migration(s): {', '.join(applied) or 'none'}")
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_backfill_measured_at(args):
+    """Fill sensor_data.measured_at for rows written before the column existed."""
+    from services.readings import backfill_measured_at
+
+    conn = get_db_connection()
+    try:
+        updated, unparseable = backfill_measured_at(conn, chunk_size=args.chunk_size)
+        print(f"Backfill complete: {updated} rows updated, {unparseable} rows with unparseable date/time")
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_rollups_backfill(args):
+    """Rebuild hourly and daily rollups from sensor_data."""
+    from services import rollups
+
+    since = datetime.strptime(args.since, '%Y-%m-%d') if args.since else None
+    until = datetime.strptime(args.until, '%Y-%m-%d') if args.until else None
+
+    conn = get_db_connection()
+    try:
+        rollups.backfill(conn, since=since, until=until)
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_locations_backfill(args):
+    """Register location names and fill sensor_data.location_id."""
+    from services import locations
+
+    conn = get_db_connection()
+    try:
+        updated = locations.backfill(conn, chunk_size=args.chunk_size)
+        print(f"Backfill complete: {updated} rows updated")
+        return 0
+    finally:
+        conn.close()
+
+
+def cmd_location_alias(args):
+    """Point an alias at a canonical location, merging locations if needed."""
+    from services import locations
+
+    conn = get_db_connection()
+    try:
+        moved = locations.add_alias(conn, args.alias, args.name)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+    print(f"{args.alias!r} now resolves to {args.name!r}")
+    if moved:
+        print(f"Merged {moved} readings with their alerts and rollups")
+    return 0
+
+
+def cmd_slow_queries(args):
+    """Rank query templates from the slow-query log."""
+    from core import profiler
+
+    try:
+        records = profiler.load_log(args.log)
+    except FileNotFoundError:
+        print(f"No slow-query log at {args.log or profiler.LOG_PATH}")
+        return 1
+
+    rows = profiler.report(records, sort=args.sort, since=args.since)[:args.limit]
+    if not rows:
+        print("No slow queries logged")
+        return 0
+
+    print(f"{'count':>7} {'total ms':>12} {'p50 ms':>10} {'p95 ms':>10} {'max ms':>10} {'rows':>9} {'examined':>10}  template")
+    for row in rows:
+        avg_rows = '-' if row['avg_rows'] is None else f"{row['avg_rows']:.0f}"
+        examined = '-' if row['rows_examined'] is None else str(row['rows_examined'])
+        print(f"{row['count']:>7} {row['total_ms']:>12.1f} {row['p50_ms']:>10.1f} {row['p95_ms']:>10.1f} "
+              f"{row['max_ms']:>10.1f} {avg_rows:>9} {examined:>10}  {row['template']}")
+        if args.plans and row['plan']:
+            for step in row['plan']:
+                print(f"{'':>10}{step.get('table')}: type={step.get('type')} key={step.get('key')} "
+                      f"rows={step.get('rows')} extra={step.get('Extra')}")
+    return 0
+
+
+def cmd_index_advisor(args):
+    """Propose composite indexes for the queries the application issues."""
+    from core import index_advisor, profiler
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    queries = list(index_advisor.extract_queries(index_advisor.source_files(root)))
+    if args.log:
+        templates = {entry['template'] for entry in profiler.load_log(args.log) if entry.get('type') == 'query'}
+        queries.extend(('slow-query log', template) for template in sorted(templates))
+
+    if args.db:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            existing = index_advisor.existing_indexes_from_db(cursor)
+            cursor.close()
+        finally:
+            conn.close()
+    else:
+        existing = index_advisor.existing_indexes_from_schema(
+            os.path.join(root, 'database', 'schema', 'init.sql')
+        )
+
+    result = index_advisor.advise(queries, existing)
+    for query in result['queries']:
+        if query['index'] is None and not query['notes']:
+            continue
+        status = f"uses {query['served_by']}" if query['served_by'] else (
+            f"wants ({', '.join(query['index'])})" if query['index'] else 'no index helps')
+        print(f"{query['source']}: {status}")
+        print(f"    {query['template']}")
+        for note in query['notes']:
+            print(f"    note: {note}")
+
+    print()
+    for table, proposals in result['proposals'].items():
+        for columns, sources in proposals:
+            print(f"CREATE INDEX {index_advisor.index_name(columns)} ON {table} ({', '.join(columns)});"
+                  f"  -- {len(sources)} quer{'y' if len(sources) == 1 else 'ies'}")
+    for table, names in result['redundant'].items():
+        for name in names:
+            print(f"-- {table}.{name} is a prefix of a proposed index and can be dropped after it exists")
+    return 0
+
+
+def cmd_partitions(args):
+    """Enable, inspect or maintain monthly partitions of sensor_data."""
+    from services import partitions
+
+    conn = get_db_connection()
+    try:
+        if args.action == 'status':
+            cursor = conn.cursor()
+            rows = partitions.list_partitions(cursor)
+            cursor.close()
+            if not rows:
+                print(f"{partitions.TABLE} is not partitioned")
+            for name, count in rows:
+                print(f"{name:>10} {count:>12}")
+        elif args.action == 'enable':
+            partitions.enable(conn, months_ahead=args.months_ahead)
+        else:
+            created, removed = partitions.maintain(
+                conn, months_ahead=args.months_ahead, retention_months=args.retention_months,
+                archive=args.archive
+            )
+            print(f"Created {len(created)} partition(s), removed {len(removed)}")
+        return 0
+    except partitions.LockBusy as e:
+        # Another pod is running the job; nothing for this one to do
+        print(f"Skipped: {e}")
+        return 0
+    except partitions.PartitionError as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+
+def cmd_bulk_load(args):
+    """Load historical readings from CSV or NDJSON files."""
+    from core.database import open_connection
+    from services import bulk_load
+
+    # LOAD DATA LOCAL must be enabled on the client connection (and on the server)
+    conn = open_connection(local_infile=1) if args.method == 'load-data' else get_db_connection()
+    try:
+        results = bulk_load.load(
+            conn, args.paths, fmt=args.format, method=args.method, chunk_rows=args.chunk_rows,
+            default_location=args.location, restart=args.restart,
+            drop_secondary_indexes=args.drop_indexes, update_rollups=args.rollups
+        )
+    except bulk_load.LoadBusy as e:
+        print(f"Error: {e}")
+        return 1
+    except (bulk_load.BulkLoadError, OSError) as e:
+        print(f"Error: {e}")
+        return 1
+    finally:
+        conn.close()
+
+    loaded = sum(state['rows_loaded'] for state in results.values())
+    rejected = sum(state['rows_rejected'] for state in results.values())
+    print(f"Bulk load complete: {loaded} rows loaded, {rejected} rejected from {len(results)} file(s)")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Water360 management commands')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate = subparsers.add_parser('migrate', help='Apply pending schema migrations')
+    migrate.add_argument('--target', help='Stop after this migration version')
+    migrate.add_argument('--dry-run', action='store_true', help='List pending migrations only')
+    migrate.set_defaults(func=cmd_migrate)
+
+    backfill = subparsers.add_parser('backfill-measured-at', help='Populate sensor_data.measured_at')
+    backfill.add_argument('--chunk-size', type=int, default=5000)
+    backfill.set_defaults(func=cmd_backfill_measured_at)
+
+    rollup = subparsers.add_parser('rollups-backfill', help='Rebuild hourly and daily rollup tables')
+    rollup.add_argument('--since', help='First day to rebuild (YYYY-MM-DD); defaults to the oldest reading')
+    rollup.add_argument('--until', help='Day to stop before (YYYY-MM-DD); defaults to after the newest reading')
+    rollup.set_defaults(func=cmd_rollups_backfill)
+
+    location_backfill = subparsers.add_parser('locations-backfill',
+                                              help='Register locations and fill sensor_data.location_id')
+    location_backfill.add_argument('--chunk-size', type=int, default=5000)
+    location_backfill.set_defaults(func=cmd_locations_backfill)
+
+    alias = subparsers.add_parser('location-alias', help='Make a spelling resolve to an existing location')
+    alias.add_argument('alias')
+    alias.add_argument('name', help='Canonical name (or any alias) of the target location')
+    alias.set_defaults(func=cmd_location_alias)
+
+    slow = subparsers.add_parser('slow-queries', help='Rank templates in the slow-query log')
+    slow.add_argument('--log', help='Log file; defaults to SLOW_QUERY_LOG')
+    slow.add_argument('--sort', choices=['total', 'p95', 'rows'], default='total',
+                      help='Order by total time, p95 latency or estimated rows examined')
+    slow.add_argument('--since', help='Only entries at or after this time (YYYY-MM-DD[THH:MM:SS])')
+    slow.add_argument('--limit', type=int, default=20)
+    slow.add_argument('--plans', action='store_true', help='Print the captured EXPLAIN plan under each template')
+    slow.set_defaults(func=cmd_slow_queries)
+
+    advisor = subparsers.add_parser('index-advisor', help='Propose composite indexes from the query set')
+    advisor.add_argument('--db', action='store_true',
+                         help='Compare against the live database indexes instead of database/schema/init.sql')
+    advisor.add_argument('--log', help='Also include templates from this slow-query log')
+    advisor.set_defaults(func=cmd_index_advisor)
+
+    from services import bulk_load, partitions
+    partition = subparsers.add_parser('partitions', help='Monthly partitioning and retention for sensor_data')
+    partition.add_argument('action', choices=['status', 'enable', 'maintain'])
+    partition.add_argument('--months-ahead', type=int, default=partitions.MONTHS_AHEAD,
+                           help='Future monthly partitions to keep ready (PARTITION_MONTHS_AHEAD)')
+    partition.add_argument('--retention-months', type=int, default=partitions.RETENTION_MONTHS,
+                           help='Remove months older than this; 0 keeps everything (PARTITION_RETENTION_MONTHS)')
+    partition.add_argument('--archive', action=argparse.BooleanOptionalAction, default=partitions.ARCHIVE,
+                           help='Exchange expired months into sensor_data_archive_YYYYMM instead of dropping them')
+    partition.set_defaults(func=cmd_partitions)
+
+    bulk = subparsers.add_parser('bulk-load', help='Load historical readings from CSV or NDJSON files')
+    bulk.add_argument('paths', nargs='+', help='Files to load, optionally gzipped')
+    bulk.add_argument('--format', choices=bulk_load.FORMATS, help='Defaults to the file extension')
+    bulk.add_argument('--method', choices=bulk_load.METHODS, default='insert',
+                      help='Multi-row INSERTs, or LOAD DATA LOCAL INFILE (needs local_infile on the server)')
+    bulk.add_argument('--chunk-rows', type=int, default=bulk_load.CHUNK_ROWS,
+                      help='Lines validated and committed per checkpoint (BULK_LOAD_CHUNK_ROWS)')
+    bulk.add_argument('--location', help='Location for readings that do not name one')
+    bulk.add_argument('--restart', action='store_true', help='Ignore existing checkpoints and read files from the start')
+    bulk.add_argument('--drop-indexes', action='store_true',
+                      help='Drop secondary indexes of sensor_data during the load and rebuild them after')
+    bulk.add_argument('--rollups', action=argparse.BooleanOptionalAction, default=True,
+                      help='Rebuild hourly and daily rollups for the loaded date range')
+    bulk.set_defaults(func=cmd_bulk_load)
+
+    return parser
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Versioned schema migrations.
+
+Each module in migrations/versions defines VERSION, DESCRIPTION and
+upgrade(conn). Applied versions are recorded in the schema_migrations table,
+and upgrades check the live schema first so they are safe to run against a
+database created from database/schema/init.sql.
+"""
+import importlib
+import logging
+import pkgutil
+
+logger = logging.getLogger('migrations')
+
+CREATE_MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(32) NOT NULL PRIMARY KEY,
+        description VARCHAR(255) NOT NULL,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+
+def column_exists(cursor, table, column):
+    """Check whether a column exists in the current database."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+def index_exists(cursor, table, index):
+    """Check whether an index exists in the current database."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def table_exists(cursor, table):
+    """Check whether a table exists in the current database."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    return cursor.fetchone() is not None
+
+
+def discover():
+    """Return all migration modules sorted by version."""
+    from . import versions
+
+    modules = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        modules.append(importlib.import_module(f'{versions.__name__}.{info.name}'))
+    return sorted(modules, key=lambda module: module.VERSION)
+
+
+def applied_versions(conn):
+    """Return the set of versions already recorded in schema_migrations."""
+    cursor = conn.cursor()
+    cursor.execute(CREATE_MIGRATIONS_TABLE)
+    cursor.execute("SELECT version FROM schema_migrations")
+    versions = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return versions
+
+
+def pending(conn):
+    """Return migration modules that have not been applied yet."""
+    done = applied_versions(conn)
+    return [module for module in discover() if module.VERSION not in done]
+
+
+def apply_pending(conn, target=None):
+    """Apply pending migrations in order, up to and including target."""
+    applied = []
+    for module in pending(conn):
+        if target and module.VERSION > target:
+            break
+
+        logger.info(f"Applying migration {module.VERSION}: {module.DESCRIPTION}")
+        module.upgrade(conn)
+
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+            (module.VERSION, module.DESCRIPTION)
+        )
+        conn.commit()
+        cursor.close()
+        applied.append(module.VERSION)
+    return applied
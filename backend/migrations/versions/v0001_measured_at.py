@@ -0,0 +1,27 @@
+"""
+Add an indexed measured_at DATETIME to sensor_data.
+
+The column is added nullable so the ALTER is online; existing rows are filled
+by `python manage.py backfill-measured-at`, which works in primary-key chunks.
+"""
+from migrations import column_exists, index_exists
+
+VERSION = '0001'
+DESCRIPTION = 'Add sensor_data.measured_at with idx_measured_at'
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    if not column_exists(cursor, 'sensor_data', 'measured_at'):
+        cursor.execute("""
+            ALTER TABLE sensor_data
+            ADD COLUMN measured_at DATETIME NULL AFTER date,
+            ALGORITHM=INPLACE, LOCK=NONE
+        """)
+    if not index_exists(cursor, 'sensor_data', 'idx_measured_at'):
+        cursor.execute("""
+            ALTER TABLE sensor_data
+            ADD INDEX idx_measured_at (measured_at),
+            ALGORITHM=INPLACE, LOCK=NONE
+        """)
+    cursor.close()
@@ -0,0 +1,45 @@
+"""
+Add hourly and daily rollup tables for sensor_data.
+
+Each row holds count, sum, min, max and sum of squares per metric for one
+location and bucket. Populate existing history with
+`python manage.py rollups-backfill`.
+"""
+from migrations import table_exists
+
+VERSION = '0002'
+DESCRIPTION = 'Add sensor_rollup_hourly and sensor_rollup_daily'
+
+METRIC_COLUMNS = """
+        ph_value_sum DOUBLE NOT NULL DEFAULT 0,
+        ph_value_min FLOAT NULL,
+        ph_value_max FLOAT NULL,
+        ph_value_sumsq DOUBLE NOT NULL DEFAULT 0,
+        temperature_sum DOUBLE NOT NULL DEFAULT 0,
+        temperature_min FLOAT NULL,
+        temperature_max FLOAT NULL,
+        temperature_sumsq DOUBLE NOT NULL DEFAULT 0,
+        turbidity_sum DOUBLE NOT NULL DEFAULT 0,
+        turbidity_min FLOAT NULL,
+        turbidity_max FLOAT NULL,
+        turbidity_sumsq DOUBLE NOT NULL DEFAULT 0,
+"""
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    for table in ('sensor_rollup_hourly', 'sensor_rollup_daily'):
+        if table_exists(cursor, table):
+            continue
+        cursor.execute(f"""
+            CREATE TABLE {table} (
+                location VARCHAR(255) NOT NULL,
+                bucket_start DATETIME NOT NULL,
+                reading_count INT UNSIGNED NOT NULL DEFAULT 0,
+                {METRIC_COLUMNS}
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                PRIMARY KEY (location, bucket_start),
+                INDEX idx_bucket_start (bucket_start)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+    cursor.close()
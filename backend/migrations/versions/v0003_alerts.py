@@ -0,0 +1,58 @@
+"""
+Add alert_thresholds and sensor_alerts for the ingest-time alert engine.
+
+is_active is 1 for an open alert and NULL once closed, so the unique key
+allows one open alert per location and parameter alongside any number of
+closed ones.
+"""
+from migrations import table_exists
+
+VERSION = '0003'
+DESCRIPTION = 'Add alert_thresholds and sensor_alerts'
+
+DEFAULT_THRESHOLDS = [
+    ('ph_value', 6.5, 8.5),
+    ('temperature', 0, 33),
+    ('turbidity', 1, 5),
+]
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    if not table_exists(cursor, 'alert_thresholds'):
+        cursor.execute("""
+            CREATE TABLE alert_thresholds (
+                parameter VARCHAR(32) NOT NULL PRIMARY KEY,
+                min_value FLOAT NULL,
+                max_value FLOAT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+    cursor.executemany(
+        "INSERT IGNORE INTO alert_thresholds (parameter, min_value, max_value) VALUES (%s, %s, %s)",
+        DEFAULT_THRESHOLDS
+    )
+
+    if not table_exists(cursor, 'sensor_alerts'):
+        cursor.execute("""
+            CREATE TABLE sensor_alerts (
+                id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                location VARCHAR(255) NOT NULL,
+                parameter VARCHAR(32) NOT NULL,
+                is_active TINYINT NULL DEFAULT 1,
+                opened_at DATETIME NOT NULL,
+                closed_at DATETIME NULL,
+                opening_reading_id INT NULL,
+                closing_reading_id INT NULL,
+                last_reading_id INT NULL,
+                last_value FLOAT NOT NULL,
+                min_value FLOAT NULL,
+                max_value FLOAT NULL,
+                reading_count INT UNSIGNED NOT NULL DEFAULT 1,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                UNIQUE KEY uq_active_alert (location, parameter, is_active),
+                INDEX idx_is_active (is_active),
+                INDEX idx_opened_at (opened_at)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+    cursor.close()
@@ -0,0 +1,54 @@
+"""
+Replace the single-column location index on sensor_data with composites.
+
+Chosen from `python manage.py index-advisor`:
+
+    idx_location_date_time      graph-data (date = ? AND location = ? ORDER BY
+                                time) and available-dates (DISTINCT date by
+                                location, newest first) without a filesort
+    idx_location_created_at     sensor-data pages filtered by location, which
+                                order by created_at DESC, id DESC
+    idx_location_measured_at    the 24-hour correlation window per location
+
+idx_location is a prefix of all three and is dropped once they exist. The
+covering indexes the advisor proposes for highest-values are not added: they
+would cost three extra index writes per reading for responses that are
+already cached. `python -m benchmarks.indexes` checks the plans before and
+after.
+"""
+from migrations import index_exists
+
+VERSION = '0004'
+DESCRIPTION = 'Composite location indexes on sensor_data'
+
+ADD_INDEXES = [
+    ('idx_location_date_time', '(location, date, time)'),
+    ('idx_location_created_at', '(location, created_at)'),
+    ('idx_location_measured_at', '(location, measured_at)'),
+]
+
+DROP_INDEXES = ['idx_location']
+
+
+def apply(cursor, table='sensor_data'):
+    """Add the composites, then drop the indexes they make redundant."""
+    for name, columns in ADD_INDEXES:
+        if not index_exists(cursor, table, name):
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                ADD INDEX {name} {columns},
+                ALGORITHM=INPLACE, LOCK=NONE
+            """)
+    for name in DROP_INDEXES:
+        if index_exists(cursor, table, name):
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                DROP INDEX {name},
+                ALGORITHM=INPLACE, LOCK=NONE
+            """)
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    apply(cursor)
+    cursor.close()
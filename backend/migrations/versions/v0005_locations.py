@@ -0,0 +1,63 @@
+"""
+Add the locations dimension and sensor_data.location_id.
+
+locations holds one canonical name per place and location_aliases maps every
+normalized spelling to it. sensor_data keeps its location name for display
+and gains a SMALLINT location_id, which replaces location in the composite
+indexes from 0004. Fill it for existing rows with
+`python manage.py locations-backfill` before deploying code that filters on it.
+"""
+from migrations import column_exists, index_exists, table_exists
+
+VERSION = '0005'
+DESCRIPTION = 'Add locations, location_aliases and sensor_data.location_id'
+
+ADD_INDEXES = [
+    ('idx_location_id_date_time', '(location_id, date, time)'),
+    ('idx_location_id_created_at', '(location_id, created_at)'),
+    ('idx_location_id_measured_at', '(location_id, measured_at)'),
+]
+
+DROP_INDEXES = ['idx_location_date_time', 'idx_location_created_at', 'idx_location_measured_at']
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    if not table_exists(cursor, 'locations'):
+        cursor.execute("""
+            CREATE TABLE locations (
+                id SMALLINT UNSIGNED NOT NULL AUTO_INCREMENT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE KEY uk_name (name)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+    if not table_exists(cursor, 'location_aliases'):
+        cursor.execute("""
+            CREATE TABLE location_aliases (
+                alias VARCHAR(255) NOT NULL PRIMARY KEY,
+                location_id SMALLINT UNSIGNED NOT NULL,
+                INDEX idx_location_id (location_id)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+    if not column_exists(cursor, 'sensor_data', 'location_id'):
+        cursor.execute("""
+            ALTER TABLE sensor_data
+            ADD COLUMN location_id SMALLINT UNSIGNED NULL AFTER location,
+            ALGORITHM=INPLACE, LOCK=NONE
+        """)
+    for name, columns in ADD_INDEXES:
+        if not index_exists(cursor, 'sensor_data', name):
+            cursor.execute(f"""
+                ALTER TABLE sensor_data
+                ADD INDEX {name} {columns},
+                ALGORITHM=INPLACE, LOCK=NONE
+            """)
+    for name in DROP_INDEXES:
+        if index_exists(cursor, 'sensor_data', name):
+            cursor.execute(f"""
+                ALTER TABLE sensor_data
+                DROP INDEX {name},
+                ALGORITHM=INPLACE, LOCK=NONE
+            """)
+    cursor.close()
@@ -0,0 +1,30 @@
+"""
+Add sensor_data.reading_key for idempotent ingestion.
+
+Readings posted with a reading_key (or device_id and seq) are stored once per
+(reading_key, measured_at); see services/idempotency.py. The unique key
+includes measured_at so it stays valid when sensor_data is partitioned by
+month. Existing rows keep a NULL key, which the unique index does not
+constrain.
+"""
+from migrations import column_exists, index_exists
+
+VERSION = '0006'
+DESCRIPTION = 'Add sensor_data.reading_key with a unique (reading_key, measured_at) index'
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    if not column_exists(cursor, 'sensor_data', 'reading_key'):
+        cursor.execute("""
+            ALTER TABLE sensor_data
+            ADD COLUMN reading_key VARCHAR(64) CHARACTER SET ascii COLLATE ascii_bin NULL AFTER measured_at,
+            ALGORITHM=INPLACE, LOCK=NONE
+        """)
+    if not index_exists(cursor, 'sensor_data', 'uk_reading_key'):
+        cursor.execute("""
+            ALTER TABLE sensor_data
+            ADD UNIQUE INDEX uk_reading_key (reading_key, measured_at),
+            ALGORITHM=INPLACE, LOCK=NONE
+        """)
+    cursor.close()
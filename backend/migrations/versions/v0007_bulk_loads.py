@@ -0,0 +1,42 @@
+"""
+Add bookkeeping tables for `manage.py bulk-load`.
+
+bulk_loads holds one checkpoint per source file, updated in the same
+transaction as each loaded chunk, so an interrupted load resumes without
+loading a row twice. bulk_load_dropped_indexes remembers the secondary
+indexes a load with --drop-indexes removed until they are rebuilt.
+"""
+from migrations import table_exists
+
+VERSION = '0007'
+DESCRIPTION = 'Add bulk_loads and bulk_load_dropped_indexes'
+
+
+def upgrade(conn):
+    cursor = conn.cursor()
+    if not table_exists(cursor, 'bulk_loads'):
+        cursor.execute("""
+            CREATE TABLE bulk_loads (
+                source VARCHAR(255) NOT NULL PRIMARY KEY,
+                bytes_done BIGINT UNSIGNED NOT NULL DEFAULT 0,
+                lines_done INT UNSIGNED NOT NULL DEFAULT 0,
+                rows_loaded INT UNSIGNED NOT NULL DEFAULT 0,
+                rows_duplicate INT UNSIGNED NOT NULL DEFAULT 0,
+                rows_rejected INT UNSIGNED NOT NULL DEFAULT 0,
+                min_measured_at DATETIME NULL,
+                max_measured_at DATETIME NULL,
+                started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at DATETIME NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+    if not table_exists(cursor, 'bulk_load_dropped_indexes'):
+        cursor.execute("""
+            CREATE TABLE bulk_load_dropped_indexes (
+                table_name VARCHAR(64) NOT NULL,
+                index_name VARCHAR(64) NOT NULL,
+                columns VARCHAR(1024) NOT NULL,
+                dropped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (table_name, index_name)
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """)
+    cursor.close()
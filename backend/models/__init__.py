@@ -1,2 +1,6 @@
 # models/__init__.py
 from .models import User
+from .schemas import (
+    BatchResponse, BatchRowResult, GraphDataQuery, Reading, ReadingBatch, SensorDataPage, SensorDataQuery,
+    SeriesQuery, parse_query
+)
@@ -0,0 +1,125 @@
+# schemas.py
+"""
+msgspec Structs for the sensor data API.
+
+Request bodies are decoded straight from bytes into these types, so parsing
+and validation happen in one pass without building intermediate dicts.
+Decoding is lax: numbers sent as strings ("7.2") are accepted, as they were
+by the hand-written validation. Responses are encoded with
+msgspec.json.encode, which also handles the DictCursor rows and datetimes
+directly (datetimes are written as ISO 8601).
+"""
+import math
+from typing import Any, Dict, List, Optional, Union
+
+import msgspec
+
+from services.downsample import METHODS as DOWNSAMPLE_METHODS, MIN_POINTS
+
+
+class Reading(msgspec.Struct):
+    """
+    One sensor reading as posted by a gateway. reading_key, or device_id
+    plus seq, make retries idempotent (see services.idempotency).
+    """
+    ph_value: float
+    temperature: float
+    turbidity: float
+    location: str
+    time: str
+    date: str
+    reading_key: Optional[str] = None
+    device_id: Optional[Union[str, int]] = None
+    seq: Optional[int] = None
+
+    def __post_init__(self):
+        for field in ('ph_value', 'temperature', 'turbidity'):
+            if not math.isfinite(getattr(self, field)):
+                raise ValueError(f'Invalid numeric value for {field}')
+        self.location = self.location.strip()
+        if not self.location or len(self.location) > 255:
+            raise ValueError('Location must be between 1 and 255 characters')
+        self.time = self.time.strip()
+        self.date = self.date.strip()
+        if not self.time or not self.date:
+            raise ValueError('Invalid date or time, expected YYYY-MM-DD and HH:MM[:SS]')
+
+
+class ReadingBatch(msgspec.Struct):
+    """The {"readings": [...]} form of a batch body."""
+    readings: List[Reading]
+
+
+class SensorDataQuery(msgspec.Struct):
+    """Query parameters of GET /sensor-data and /sensor-data/export."""
+    location: Optional[str] = None
+    date: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    fields: Optional[str] = None
+    limit: Optional[int] = None
+    cursor: Optional[str] = None
+    format: str = 'ndjson'
+
+
+class GraphDataQuery(msgspec.Struct):
+    """Query parameters of GET /graph-data: one day, or a start/end range."""
+    location: Optional[str] = None
+    date: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    max_points: Optional[int] = None
+    downsample: str = 'lttb'
+
+    def __post_init__(self):
+        # Checked before the query runs, not only once rows exceed max_points
+        if self.downsample not in DOWNSAMPLE_METHODS:
+            raise ValueError(f"downsample must be one of {', '.join(DOWNSAMPLE_METHODS)}")
+        # Each of the three series gets an equal share of the points
+        if self.max_points is not None and self.max_points < MIN_POINTS * 3:
+            raise ValueError(f'max_points must be at least {MIN_POINTS * 3}')
+
+
+class SeriesQuery(msgspec.Struct):
+    """Query parameters of GET /series (see services.timeseries)."""
+    locations: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    bucket: str = '1h'
+    metrics: Optional[str] = None
+    aggregates: str = 'avg'
+    source: str = 'auto'
+
+
+class SensorDataPage(msgspec.Struct):
+    """One page of GET /sensor-data."""
+    status: str
+    count: int
+    data: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+
+
+class BatchRowResult(msgspec.Struct, omit_defaults=True):
+    """Outcome of one reading in a batch; id on success, error otherwise."""
+    index: int
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BatchResponse(msgspec.Struct, omit_defaults=True):
+    """Response of POST /sensor-data/batch."""
+    status: str
+    inserted: int
+    failed: int
+    results: List[BatchRowResult]
+    # Readings accepted by the ingest buffer but not yet committed
+    queued: int = 0
+    message: Optional[str] = None
+
+
+def parse_query(args, query_type=SensorDataQuery):
+    """
+    Convert request.args into query_type. Unknown parameters are ignored.
+    Raises msgspec.ValidationError for values of the wrong type.
+    """
+    return msgspec.convert(args.to_dict(), query_type, strict=False)
@@ -1,12 +1,21 @@
 # routes/__init__.py
 
-from flask import Blueprint, request, jsonify, current_app as app
+from flask import Blueprint, Response, request, jsonify, current_app as app
 import jwt
 from datetime import datetime, timedelta
 from functools import wraps
 from werkzeug.security import generate_password_hash, check_password_hash
-from app import mysql
 from models import User
+from core.database import get_db
+from services.readings import READ_COLUMNS, parse_measured_at, update_reading, delete_reading
+from services.ingest_buffer import RETRY_AFTER, BufferFull, write_readings
+from services import alerts, locations, stats, timeseries
+from services.window import current_window
+from services.pagination import PaginationError, fetch_page, parse_fields, parse_page_size
+from services.users import get_user, invalidate_user
+from services.response_cache import cached_response, global_tags, location_tags
+from services.live_feed import SSE_HEADERS, open_stream, parse_stream_args
+from utils.responses import msgspec_response
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 api = Blueprint('api', __name__)
@@ -26,23 +35,20 @@ def token_required(f):
                 except ValueError:
                     return jsonify({'message': 'Invalid user ID in token'}), 401
             
-            # Fetch the user from the database
-            cur = mysql.connection.cursor()
-            cur.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-            user_data = cur.fetchone()
-            cur.close()
+            # Fetch the user, from the per-process cache when possible
+            user_data = get_user(user_id)
             
             if not user_data:
                 return jsonify({'message': 'User not found'}), 401
                 
             current_user = User(
-                id=user_data[0],
-                firstname=user_data[1],
-                lastname=user_data[2],
-                username=user_data[3],
-                password=user_data[4],
-                email=user_data[5],
-                user_type=user_data[6]
+                id=user_data['id'],
+                firstname=user_data['firstname'],
+                lastname=user_data['lastname'],
+                username=user_data['username'],
+                password=user_data['password'],
+                email=user_data['email'],
+                user_type=user_data['user_type']
             )
             
             return f(current_user, *args, **kwargs)
@@ -87,7 +93,7 @@ def login():
         return jsonify({'error': 'Please provide both username and password'}), 400
 
     try:
-        cur = mysql.connection.cursor()
+        cur = get_db().cursor()
         cur.execute("SELECT * FROM users WHERE username = %s", (username,))
         user_data = cur.fetchone()
         cur.close()
@@ -134,7 +140,7 @@ def signup():
         return jsonify({'error': 'Invalid user type.'}), 400
 
     try:
-        cur = mysql.connection.cursor()
+        cur = get_db().cursor()
         cur.execute("SELECT * FROM users WHERE username = %s OR email = %s", (username, email))
         existing_user = cur.fetchone()
         if existing_user:
@@ -146,7 +152,8 @@ def signup():
             INSERT INTO users (firstname, lastname, username, password, email, user_type)
             VALUES (%s, %s, %s, %s, %s, %s)
         """, (firstname, lastname, username, hashed_password, email, user_type))
-        mysql.connection.commit()
+        get_db().commit()
+        invalidate_user(cur.lastrowid)
         cur.close()
 
         return jsonify({'message': 'User registered successfully.'}), 201
@@ -159,29 +166,38 @@ def signup():
 @token_required
 def summary_insights(current_user):
     try:
-        cur = mysql.connection.cursor()
-        now = datetime.now()
-        last_24h = now - timedelta(hours=24)
-        last_24h_str = last_24h.strftime('%Y-%m-%d %H:%M:%S')
-
         parameters = ['ph_value', 'temperature', 'turbidity']
         summary = {}
 
+        window = current_window()
+        if window is not None:
+            for param in parameters:
+                summary[param] = {
+                    'highest': [{'value': value, 'location': location}
+                                for value, location in window.extremes(param, 'max')],
+                    'lowest': [{'value': value, 'location': location}
+                               for value, location in window.extremes(param, 'min')]
+                }
+            return jsonify(summary), 200
+
+        cur = get_db().cursor()
+        last_24h = stats.window_cutoff()
+
         for param in parameters:
             cur.execute(f"""
                 SELECT {param}, location
                 FROM sensor_data
-                WHERE CONCAT(date, ' ', time) >= %s
-                AND {param} = (SELECT MAX({param}) FROM sensor_data WHERE CONCAT(date, ' ', time) >= %s)
-            """, (last_24h_str, last_24h_str))
+                WHERE measured_at >= %s
+                AND {param} = (SELECT MAX({param}) FROM sensor_data WHERE measured_at >= %s)
+            """, (last_24h, last_24h))
             highest = cur.fetchall()
 
             cur.execute(f"""
                 SELECT {param}, location
                 FROM sensor_data
-                WHERE CONCAT(date, ' ', time) >= %s
-                AND {param} = (SELECT MIN({param}) FROM sensor_data WHERE CONCAT(date, ' ', time) >= %s)
-            """, (last_24h_str, last_24h_str))
+                WHERE measured_at >= %s
+                AND {param} = (SELECT MIN({param}) FROM sensor_data WHERE measured_at >= %s)
+            """, (last_24h, last_24h))
             lowest = cur.fetchall()
 
             summary[param] = {
@@ -202,34 +218,8 @@ def summary_insights(current_user):
 @token_required
 def get_warnings(current_user):
     try:
-        cur = mysql.connection.cursor()
-        now = datetime.now()
-        last_24h = now - timedelta(hours=24)
-        last_24h_str = last_24h.strftime('%Y-%m-%d %H:%M:%S')
-
-        thresholds = {
-            'ph_value': (6.5, 8.5),
-            'temperature': (0, 33),
-            'turbidity': (1, 5)
-        }
-
-        warnings = []
-
-        for param, (min_val, max_val) in thresholds.items():
-            cur.execute(f"""
-                SELECT DISTINCT location
-                FROM sensor_data
-                WHERE CONCAT(date, ' ', time) >= %s
-                AND ({param} < %s OR {param} > %s)
-            """, (last_24h_str, min_val, max_val))
-            locations = [row[0] for row in cur.fetchall()]
-            if locations:
-                warnings.append({
-                    'parameter': param,
-                    'locations': locations,
-                    'message': f"{param.replace('_', ' ').title()} out of safe limits in: {', '.join(locations)}"
-                })
-
+        cur = get_db().cursor()
+        warnings = alerts.warnings(cur)
         cur.close()
         return jsonify(warnings), 200
     except Exception as e:
@@ -290,21 +280,23 @@ def correlation_data_route():
         # Get location from query parameters
         location = request.args.get('location', 'US')  # Default location is 'US'
         
-        # Now fetch the correlation data
-        cur = mysql.connection.cursor()
-        # Calculate last 24 hours based on the server's timezone
-        now = datetime.now()
-        last_24h = now - timedelta(hours=24)
-        last_24h_str = last_24h.strftime('%Y-%m-%d %H:%M:%S')
+        cur = get_db().cursor()
+        location_id = locations.location_id(cur, location)
 
-        # Query database for the last 24 hours and the specified location
-        query = """
-            SELECT temperature, turbidity, ph_value
-            FROM sensor_data
-            WHERE CONCAT(date, ' ', time) >= %s AND LOWER(location) = LOWER(%s)
-        """
-        cur.execute(query, (last_24h_str, location))
-        rows = cur.fetchall()
+        # Now fetch the correlation data, from the rolling window when enabled
+        window = current_window()
+        if window is not None:
+            rows = window.metric_values(location_id)
+        else:
+            # Query database for the trailing window and the specified location
+            query = """
+                SELECT temperature, turbidity, ph_value
+                FROM sensor_data
+                WHERE location_id = %s AND measured_at >= %s
+                ORDER BY measured_at, id
+            """
+            cur.execute(query, (location_id, stats.window_cutoff()))
+            rows = cur.fetchall()
         cur.close()
 
         # Structure the data into arrays
@@ -336,13 +328,14 @@ def correlation_data_route():
 # for Homepage.js
 @api.route('/recent-data', methods=['GET'])
 @jwt_required()
+@cached_response(global_tags)
 def recent_data_route():
     try:
         # Get user ID from JWT token
         user_id = get_jwt_identity()
         
         # Now fetch the recent data
-        cur = mysql.connection.cursor()
+        cur = get_db().cursor()
         # Get recent entries (last 5)
         cur.execute("""
             SELECT id, location, ph_value, temperature, turbidity, date, time, created_at
@@ -385,14 +378,15 @@ def recent_data_route():
 @api.route('/data', methods=['GET'])
 @token_required
 def get_data(current_user):
-    from app import mysql  # Import here to avoid circular import
 
     date_filter = request.args.get('date')
     location_filter = request.args.get('location')
 
     try:
-        cur = mysql.connection.cursor()
-        query = "SELECT * FROM sensor_data"
+        fields = parse_fields(request.args.get('fields'), READ_COLUMNS)
+        page_size = parse_page_size(request.args.get('limit'))
+        after = request.args.get('cursor')
+
         filters = []
         params = []
 
@@ -400,43 +394,58 @@ def get_data(current_user):
         if date_filter:
             filters.append("date = %s")
             params.append(date_filter)
-        if location_filter:
-            filters.append("location = %s")
-            params.append(location_filter)
-
-        # Append filters to the query if any
-        if filters:
-            query += " WHERE " + " AND ".join(filters)
-
-        # Add ORDER BY clause to sort by id in descending order
-        query += " ORDER BY id DESC"
 
-        cur.execute(query, params)
-        rows = cur.fetchall()
+        # One page newest first; X-Next-Cursor continues from the last row
+        cur = get_db().cursor()
+        try:
+            if location_filter:
+                filters.append("location_id = %s")
+                params.append(locations.location_id(cur, location_filter))
+            data, next_cursor = fetch_page(cur, 'sensor_data', fields, filters, params,
+                                           after=after, page_size=page_size)
+        finally:
+            cur.close()
 
         # Handle cases where no rows are returned
-        if not rows:
+        if not data and not after:
             return jsonify({'message': 'No data found'}), 404
 
-        # Ensure cur.description is not None
-        if cur.description:
-            columns = [desc[0] for desc in cur.description]
-            data = [dict(zip(columns, row)) for row in rows]
-        else:
-            data = []
-
-        cur.close()
-        return jsonify(data), 200
+        response = jsonify(data)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response, 200
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"Error retrieving data: {e}")
         return jsonify({'error': 'Internal Server Error'}), 500
 
 
+# live-update page: push new readings instead of polling /data
+@api.route('/data/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def data_stream():
+    try:
+        last_event_id, locations = parse_stream_args(request.args, request.headers)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        stream = open_stream(last_event_id, locations)
+        if stream is None:
+            return jsonify({'error': 'Too many live feed clients'}), 503, {'Retry-After': '5'}
+
+        return Response(stream, mimetype='text/event-stream', headers=SSE_HEADERS)
+    except Exception as e:
+        app.logger.error(f"Error opening live feed: {e}", exc_info=True)
+        return jsonify({'error': 'Internal Server Error'}), 500
+
+
 #from the graph  from NAV 
 @api.route('/graph-data', methods=['GET'])
 @token_required
+@cached_response(location_tags('location'))
 def get_graph_data(current_user):
-    from app import mysql  # Import here to avoid circular import
 
     # Get query parameters
     start_date = request.args.get('startDate')
@@ -453,22 +462,14 @@ def get_graph_data(current_user):
         return jsonify({'error': 'Invalid dataType. Must be "ph_value" or "temperature" or "turbidity"'}), 400
 
     try:
-        cur = mysql.connection.cursor()
+        cur = get_db().cursor()
 
-        # Dynamically use the selected dataType column in the query
-        query = f"""
-            SELECT date, AVG({data_type}) AS value
-            FROM sensor_data
-            WHERE date >= %s AND date <= %s AND location = %s
-            GROUP BY date
-            ORDER BY date
-        """
-        cur.execute(query, (start_date, end_date, location))
-        rows = cur.fetchall()
+        # Daily averages for the selected dataType (served by the daily rollup)
+        rows = timeseries.daily_averages(cur, data_type, [location], start_date, end_date)
         cur.close()
 
         # Convert data to JSON format
-        data = [{'date': row[0], 'value': row[1]} for row in rows]
+        data = [{'date': date, 'value': value} for _, date, value in rows]
 
         return jsonify(data), 200
     except Exception as e:
@@ -479,8 +480,8 @@ def get_graph_data(current_user):
 # compare_graph NAV
 @api.route('/compare-graph-data', methods=['GET'])
 @token_required
+@cached_response(location_tags('locations'))
 def compare_graph_data(current_user):
-    from app import mysql  # Import here to avoid circular import
 
     # Get query parameters
     start_date = request.args.get('startDate')
@@ -500,25 +501,15 @@ def compare_graph_data(current_user):
         # Split locations into a list
         location_list = locations.split(',')
 
-        cur = mysql.connection.cursor()
+        cur = get_db().cursor()
 
-        # Query to get daily averages grouped by location and date
-        query = f"""
-            SELECT location, date, AVG({data_type}) AS value
-            FROM sensor_data
-            WHERE date >= %s AND date <= %s AND location IN ({','.join(['%s'] * len(location_list))})
-            GROUP BY location, date
-            ORDER BY date, location
-        """
-        params = [start_date, end_date] + location_list
-        cur.execute(query, params)
-        rows = cur.fetchall()
+        # Daily averages grouped by location and date (served by the daily rollup)
+        rows = timeseries.daily_averages(cur, data_type, location_list, start_date, end_date)
         cur.close()
 
         # Convert data to JSON format
         data = {}
-        for row in rows:
-            location, date, value = row
+        for location, date, value in rows:
             if location not in data:
                 data[location] = []
             data[location].append({'date': date, 'value': value})
@@ -534,19 +525,24 @@ def compare_graph_data(current_user):
 @token_required
 def all_data(current_user):
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("""
-            SELECT id, location, ph_value, temperature, turbidity, date, time
-            FROM sensor_data
-            ORDER BY date DESC, time DESC
-        """)
-        rows = cur.fetchall()
-        cur.close()
-
         columns = ['id', 'location', 'ph_value', 'temperature', 'turbidity', 'date', 'time']
-        data = [dict(zip(columns, row)) for row in rows]
+        fields = parse_fields(request.args.get('fields'), READ_COLUMNS, default=columns)
 
-        return jsonify(data), 200
+        cur = get_db().cursor()
+        try:
+            data, next_cursor = fetch_page(cur, 'sensor_data', fields,
+                                           after=request.args.get('cursor'),
+                                           page_size=parse_page_size(request.args.get('limit')))
+        finally:
+            cur.close()
+
+        # Encoded with msgspec: pages run to PAGE_SIZE_MAX rows
+        response = msgspec_response(data)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = next_cursor
+        return response
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"Error retrieving all data: {e}", exc_info=True)
         return jsonify({'error': 'Internal Server Error'}), 500
@@ -555,7 +551,6 @@ def all_data(current_user):
 @api.route('/create-data', methods=['POST'])
 @token_required
 def create_data(current_user):
-    from app import mysql
     from datetime import datetime
 
     try:
@@ -572,15 +567,14 @@ def create_data(current_user):
         date = now.strftime('%Y-%m-%d')
         time = now.strftime('%H:%M:%S')
 
-        cur = mysql.connection.cursor()
-        cur.execute("""
-            INSERT INTO sensor_data (location, ph_value, temperature, turbidity, date, time)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (location, ph_value, temperature, turbidity, date, time))
-        mysql.connection.commit()
-        cur.close()
+        _, durable = write_readings(get_db, [
+            (ph_value, temperature, turbidity, location, time, date, now.replace(microsecond=0), None)
+        ])
 
-        return jsonify({'message': 'Record created successfully'}), 201
+        # 202 when the ingest buffer has queued the reading but not committed it yet
+        return jsonify({'message': 'Record created successfully'}), 201 if durable else 202
+    except BufferFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(RETRY_AFTER)}
     except Exception as e:
         app.logger.error(f"Error creating new record: {e}", exc_info=True)
         return jsonify({'error': 'Internal Server Error'}), 500
@@ -591,11 +585,7 @@ def create_data(current_user):
 @token_required
 def delete_data(current_user, id):
     try:
-        cur = mysql.connection.cursor()
-        cur.execute("DELETE FROM sensor_data WHERE id = %s", (id,))
-        mysql.connection.commit()
-        affected_rows = cur.rowcount
-        cur.close()
+        affected_rows = delete_reading(get_db(), id)
 
         if affected_rows == 0:
             return jsonify({'message': 'No record found with that ID'}), 404
@@ -618,15 +608,12 @@ def update_data(current_user, id):
         if not all([location, ph_value, temperature, turbidity]):
             return jsonify({'error': 'All fields are required'}), 400
 
-        cur = mysql.connection.cursor()
-        cur.execute("""
-            UPDATE sensor_data
-            SET location = %s, ph_value = %s, temperature = %s, turbidity = %s
-            WHERE id = %s
-        """, (location, ph_value, temperature, turbidity, id))
-        mysql.connection.commit()
-        affected_rows = cur.rowcount
-        cur.close()
+        affected_rows = update_reading(get_db(), id, {
+            'location': location,
+            'ph_value': ph_value,
+            'temperature': temperature,
+            'turbidity': turbidity
+        })
 
         if affected_rows == 0:
             return jsonify({'message': 'No record found with that ID or no changes made'}), 404
@@ -642,7 +629,6 @@ def update_data(current_user, id):
 
 @api.route('/test-create-data', methods=['POST'])
 def test_create_data():
-    from app import mysql
     from datetime import datetime
 
     try:
@@ -663,15 +649,13 @@ def test_create_data():
         time = now.strftime('%H:%M:%S')
 
         # Insert data into the database
-        cur = mysql.connection.cursor()
-        cur.execute("""
-            INSERT INTO sensor_data (location, ph_value, temperature, turbidity, date, time)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (location, ph_value, temperature, turbidity, date, time))
-        mysql.connection.commit()
-        cur.close()
+        _, durable = write_readings(get_db, [
+            (ph_value, temperature, turbidity, location, time, date, now.replace(microsecond=0), None)
+        ])
 
-        return jsonify({'message': 'Record added successfully for testing'}), 201
+        return jsonify({'message': 'Record added successfully for testing'}), 201 if durable else 202
+    except BufferFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(RETRY_AFTER)}
     except Exception as e:
         app.logger.error(f"Error creating test record: {e}", exc_info=True)
         return jsonify({'error': 'Internal Server Error'}), 500
@@ -681,7 +665,6 @@ def test_create_data():
 
 @api.route('/test-create-data-url', methods=['GET'])
 def test_create_data_url():
-    from app import mysql
     from datetime import datetime
 
     try:
@@ -701,15 +684,13 @@ def test_create_data_url():
         time = now.strftime('%H:%M:%S')
 
         # Insert data into the database
-        cur = mysql.connection.cursor()
-        cur.execute("""
-            INSERT INTO sensor_data (location, ph_value, temperature, turbidity, date, time)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (location, ph_value, temperature, turbidity, date, time))
-        mysql.connection.commit()
-        cur.close()
+        _, durable = write_readings(get_db, [
+            (ph_value, temperature, turbidity, location, time, date, now.replace(microsecond=0), None)
+        ])
 
-        return jsonify({'message': 'Record added successfully via URL'}), 201
+        return jsonify({'message': 'Record added successfully via URL'}), 201 if durable else 202
+    except BufferFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(RETRY_AFTER)}
     except Exception as e:
         app.logger.error(f"Error creating record via URL: {e}", exc_info=True)
         return jsonify({'error': 'Internal Server Error'}), 500
@@ -717,7 +698,6 @@ def test_create_data_url():
 
 @api.route('/data-old', methods=['POST'])
 def data_old():
-    from app import mysql
 
     try:
         # Extract data from the POST request
@@ -735,16 +715,13 @@ def data_old():
             return jsonify({'error': 'All fields (location, ph_value, temperature, turbidity, date, time) are required'}), 400
 
         # Insert data into the database
-        cur = mysql.connection.cursor()
-        query = """
-            INSERT INTO sensor_data (location, ph_value, temperature, turbidity, date, time)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
-        cur.execute(query, (location, ph_value, temperature, turbidity, date, time))
-        mysql.connection.commit()
-        cur.close()
+        _, durable = write_readings(get_db, [
+            (ph_value, temperature, turbidity, location, time, date, parse_measured_at(date, time), None)
+        ])
 
-        return jsonify({'message': 'Data inserted successfully'}), 201
+        return jsonify({'message': 'Data inserted successfully'}), 201 if durable else 202
+    except BufferFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(RETRY_AFTER)}
     except Exception as e:
         app.logger.error(f"Error in /data-old: {e}", exc_info=True)
         return jsonify({'error': 'Internal Server Error'}), 500
@@ -753,91 +730,12 @@ def data_old():
 @api.route('/api/data/dashboard/stats', methods=['GET'])
 @token_required
 def dashboard_stats(current_user):
-    from app import mysql  # Import here to avoid circular import
-    
     try:
-        cur = mysql.connection.cursor()
-        
-        # Get total readings in the last 24 hours
-        cur.execute("""
-            SELECT COUNT(*) as total_readings_24h
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-        """)
-        total_readings = cur.fetchone()['total_readings_24h']
-        
-        # Get highest pH value in the last 24 hours
-        cur.execute("""
-            SELECT ph_value as value, location, CONCAT(date, ' ', time) as timestamp
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-            ORDER BY ph_value DESC
-            LIMIT 1
-        """)
-        highest_ph = cur.fetchone()
-        
-        # Get highest temperature in the last 24 hours
-        cur.execute("""
-            SELECT temperature as value, location, CONCAT(date, ' ', time) as timestamp
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-            ORDER BY temperature DESC
-            LIMIT 1
-        """)
-        highest_temp = cur.fetchone()
-        
-        # Get highest turbidity in the last 24 hours
-        cur.execute("""
-            SELECT turbidity as value, location, CONCAT(date, ' ', time) as timestamp
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-            ORDER BY turbidity DESC
-            LIMIT 1
-        """)
-        highest_turbidity = cur.fetchone()
-        
-        # Get average values
-        cur.execute("""
-            SELECT 
-                AVG(ph_value) as avg_ph,
-                AVG(temperature) as avg_temp,
-                AVG(turbidity) as avg_turbidity
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-        """)
-        averages = cur.fetchone()
-        
-        cur.close()
-        
-        # Format the response
-        formatted_highest_ph = {
-            'value': float(highest_ph['value']) if highest_ph else 0,
-            'location': highest_ph['location'] if highest_ph else '',
-            'timestamp': highest_ph['timestamp'] if highest_ph else ''
-        } if highest_ph else None
-        
-        formatted_highest_temp = {
-            'value': float(highest_temp['value']) if highest_temp else 0,
-            'location': highest_temp['location'] if highest_temp else '',
-            'timestamp': highest_temp['timestamp'] if highest_temp else ''
-        } if highest_temp else None
-        
-        formatted_highest_turbidity = {
-            'value': float(highest_turbidity['value']) if highest_turbidity else 0,
-            'location': highest_turbidity['location'] if highest_turbidity else '',
-            'timestamp': highest_turbidity['timestamp'] if highest_turbidity else ''
-        } if highest_turbidity else None
-        
-        return jsonify({
-            'status': 'success',
-            'total_readings_24h': total_readings,
-            'highest_ph': formatted_highest_ph,
-            'highest_temp': formatted_highest_temp,
-            'highest_turbidity': formatted_highest_turbidity,
-            'avg_ph': float(averages['avg_ph']) if averages['avg_ph'] else 0,
-            'avg_temp': float(averages['avg_temp']) if averages['avg_temp'] else 0,
-            'avg_turbidity': float(averages['avg_turbidity']) if averages['avg_turbidity'] else 0
-        }), 200
+        # Served from the rolling window when enabled, otherwise one statement
+        window = current_window()
+        if window is not None:
+            return jsonify(stats.format_dashboard_stats(window.window_stats())), 200
+        return jsonify(stats.dashboard_stats(get_db())), 200
         
     except Exception as e:
         app.logger.error(f"Error retrieving dashboard stats: {e}", exc_info=True)
@@ -850,20 +748,12 @@ def dashboard_stats(current_user):
 @api.route('/api/data/last-24-hours', methods=['GET'])
 @token_required
 def last_24_hours_data(current_user):
-    from app import mysql  # Import here to avoid circular import
     
     try:
-        cur = mysql.connection.cursor()
+        cur = get_db().cursor()
         
-        # Get data from the last 24 hours
-        cur.execute("""
-            SELECT *
-            FROM sensor_data
-            WHERE created_at >= NOW() - INTERVAL 24 HOUR
-            ORDER BY created_at DESC
-        """)
-        
-        data = cur.fetchall()
+        # Readings measured in the trailing window, newest first
+        data = stats.recent_readings(cur)
         cur.close()
         
         return jsonify({
@@ -881,11 +771,11 @@ def last_24_hours_data(current_user):
 # Highest values
 @api.route('/api/data/highest-values', methods=['GET'])
 @token_required
+@cached_response(global_tags)
 def highest_values(current_user):
-    from app import mysql  # Import here to avoid circular import
     
     try:
-        cur = mysql.connection.cursor()
+        cur = get_db().cursor()
         
         # Get highest pH value
         cur.execute("""
@@ -0,0 +1,4 @@
+"""
+Shared services.
+Business logic used by both the api blueprints and the legacy routes blueprint.
+"""
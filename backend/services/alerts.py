@@ -0,0 +1,258 @@
+"""
+Threshold alert engine.
+
+Readings are checked against alert_thresholds as they are inserted, inside
+the same transaction. An out-of-range reading opens an alert for its location
+and parameter (or extends the one already open); the next in-range reading
+measured at or after the alert's last breach closes it, so a backfilled
+reading cannot close a live breach. Corrected or deleted readings re-evaluate
+their location against its latest reading. Open alerts are the rows of sensor_alerts with is_active = 1, so
+/warnings reads only the currently active alerts instead of rescanning
+readings.
+"""
+import logging
+import os
+
+from core.cache import get_cache
+
+logger = logging.getLogger('alerts')
+
+PARAMETERS = ('ph_value', 'temperature', 'turbidity')
+
+# Used until alert_thresholds has a row for a parameter
+DEFAULT_THRESHOLDS = {
+    'ph_value': (6.5, 8.5),
+    'temperature': (0, 33),
+    'turbidity': (1, 5)
+}
+
+# Position of each parameter and of location in INSERT_COLUMNS rows
+_PARAMETER_INDEX = {'ph_value': 0, 'temperature': 1, 'turbidity': 2}
+_LOCATION_INDEX = 3
+_MEASURED_AT_INDEX = 6
+
+_thresholds = get_cache('alert_thresholds', maxsize=1, ttl=float(os.getenv('ALERT_THRESHOLD_TTL', 60)))
+
+
+def load_thresholds(cursor):
+    """Return {parameter: (min, max)}, cached per process for ALERT_THRESHOLD_TTL seconds."""
+    def load():
+        cursor.execute("SELECT parameter, min_value, max_value FROM alert_thresholds")
+        thresholds = dict(DEFAULT_THRESHOLDS)
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = (row['parameter'], row['min_value'], row['max_value'])
+            if row[0] in PARAMETERS:
+                thresholds[row[0]] = (row[1], row[2])
+        return thresholds
+    return _thresholds.get_or_load('thresholds', load)
+
+
+def update_thresholds(conn, changes):
+    """
+    Set {parameter: (min, max)} thresholds and commit; None leaves that side
+    unbounded. Raises ValueError for unknown parameters or inverted ranges.
+    """
+    for parameter, (low, high) in changes.items():
+        if parameter not in PARAMETERS:
+            raise ValueError(f'Unknown parameter: {parameter}')
+        if low is not None and high is not None and low > high:
+            raise ValueError(f'min_value must not exceed max_value for {parameter}')
+
+    cursor = conn.cursor()
+    try:
+        for parameter, (low, high) in changes.items():
+            cursor.execute("""
+                INSERT INTO alert_thresholds (parameter, min_value, max_value) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE min_value = VALUES(min_value), max_value = VALUES(max_value)
+            """, (parameter, low, high))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    _thresholds.clear()
+
+
+def is_breach(value, threshold):
+    low, high = threshold
+    return (low is not None and value < low) or (high is not None and value > high)
+
+
+def _runs(rows, ids, thresholds):
+    """
+    Group readings per (location, parameter) into runs of consecutive
+    breaching or in-range readings, in input order.
+    """
+    runs = {}
+    for reading_id, row in zip(ids, rows):
+        for parameter, index in _PARAMETER_INDEX.items():
+            value = float(row[index])
+            breach = is_breach(value, thresholds[parameter])
+            key = (row[_LOCATION_INDEX], parameter)
+            sequence = runs.setdefault(key, [])
+            if sequence and sequence[-1]['breach'] == breach:
+                run = sequence[-1]
+            else:
+                run = {'breach': breach, 'readings': []}
+                sequence.append(run)
+            run['readings'].append((reading_id, value, row[_MEASURED_AT_INDEX]))
+    return runs
+
+
+def _open_or_extend(cursor, location, parameter, readings):
+    first_id, _, first_at = readings[0]
+    last_id, last_value, _ = readings[-1]
+    values = [value for _, value, _ in readings]
+    cursor.execute("""
+        INSERT INTO sensor_alerts
+            (location, parameter, is_active, opened_at, opening_reading_id, last_reading_id,
+             last_value, min_value, max_value, reading_count)
+        VALUES (%s, %s, 1, COALESCE(%s, NOW()), %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            last_reading_id = VALUES(last_reading_id),
+            last_value = VALUES(last_value),
+            min_value = LEAST(min_value, VALUES(min_value)),
+            max_value = GREATEST(max_value, VALUES(max_value)),
+            reading_count = reading_count + VALUES(reading_count)
+    """, (location, parameter, first_at, first_id, last_id, last_value, min(values), max(values), len(values)))
+    # MySQL reports 1 for a new row and 2 for an update of an existing one
+    return cursor.rowcount == 1
+
+
+def _close(cursor, location, parameter, reading):
+    reading_id, _, measured_at = reading
+    # Readings older than the last breach (backfills, late batches) leave the alert open;
+    # so does a reading without measured_at, unless the last breach has none either
+    cursor.execute("""
+        UPDATE sensor_alerts a
+        LEFT JOIN sensor_data s ON s.id = a.last_reading_id
+        SET a.is_active = NULL, a.closed_at = COALESCE(%s, NOW()), a.closing_reading_id = %s
+        WHERE a.location = %s AND a.parameter = %s AND a.is_active = 1
+        AND (s.measured_at IS NULL OR s.measured_at <= %s)
+    """, (measured_at, reading_id, location, parameter, measured_at))
+    return cursor.rowcount > 0
+
+
+def evaluate(cursor, rows, ids):
+    """
+    Apply newly inserted INSERT_COLUMNS rows to the alert state.
+    Runs inside the caller's transaction and does not commit. Returns a list of
+    ('open' | 'close', location, parameter, reading_id) events.
+    """
+    thresholds = load_thresholds(cursor)
+    events = []
+    # Sorted so concurrent writers lock alert rows in the same order
+    for (location, parameter), sequence in sorted(_runs(rows, ids, thresholds).items()):
+        for run in sequence:
+            if run['breach']:
+                if _open_or_extend(cursor, location, parameter, run['readings']):
+                    events.append(('open', location, parameter, run['readings'][0][0]))
+            elif _close(cursor, location, parameter, run['readings'][0]):
+                events.append(('close', location, parameter, run['readings'][0][0]))
+    return events
+
+
+def merge_location(cursor, old, new):
+    """
+    Move old's alerts to new when two locations are merged. An alert open at
+    both is closed at old, since new's alert keeps tracking the parameter.
+    Runs inside the caller's transaction and does not commit.
+    """
+    cursor.execute("SELECT parameter FROM sensor_alerts WHERE location = %s AND is_active = 1", (new,))
+    open_at_new = [row[0] for row in cursor.fetchall()]
+    if open_at_new:
+        cursor.execute(f"""
+            UPDATE sensor_alerts SET is_active = NULL, closed_at = NOW()
+            WHERE location = %s AND is_active = 1 AND parameter IN ({', '.join(['%s'] * len(open_at_new))})
+        """, [old] + open_at_new)
+    cursor.execute("UPDATE sensor_alerts SET location = %s WHERE location = %s", (new, old))
+
+
+def _latest_reading(cursor, location_id):
+    cursor.execute(f"""
+        SELECT id, {', '.join(PARAMETERS)}, measured_at FROM sensor_data
+        WHERE location_id = %s
+        ORDER BY measured_at DESC, id DESC
+        LIMIT 1
+    """, (location_id,))
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        row = tuple(row[column] for column in ('id',) + PARAMETERS + ('measured_at',))
+    return row
+
+
+def reevaluate(cursor, readings):
+    """
+    Bring the alerts of the locations of readings (READ_COLUMNS dicts, before
+    and after an update or delete) in line with each location's latest
+    reading: an alert is open exactly when that reading breaches. Runs inside
+    the caller's transaction and does not commit. Returns events like evaluate.
+    """
+    thresholds = load_thresholds(cursor)
+    events = []
+    places = {(reading['location_id'], reading['location']) for reading in readings
+              if reading and reading.get('location_id')}
+    for location_id, location in sorted(places):
+        latest = _latest_reading(cursor, location_id)
+        for position, parameter in enumerate(PARAMETERS, start=1):
+            if latest is None:
+                cursor.execute("""
+                    UPDATE sensor_alerts SET is_active = NULL, closed_at = NOW()
+                    WHERE location = %s AND parameter = %s AND is_active = 1
+                """, (location, parameter))
+                if cursor.rowcount:
+                    events.append(('close', location, parameter, None))
+                continue
+
+            reading = (latest[0], float(latest[position]), latest[-1])
+            if not is_breach(reading[1], thresholds[parameter]):
+                if _close(cursor, location, parameter, reading):
+                    events.append(('close', location, parameter, reading[0]))
+                continue
+            cursor.execute(
+                "SELECT 1 FROM sensor_alerts WHERE location = %s AND parameter = %s AND is_active = 1",
+                (location, parameter)
+            )
+            if cursor.fetchone() is None and _open_or_extend(cursor, location, parameter, [reading]):
+                events.append(('open', location, parameter, reading[0]))
+    return events
+
+
+def log_events(events):
+    for event, location, parameter, reading_id in events:
+        logger.info(f"Alert {event}: {parameter} at {location} (reading {reading_id})")
+
+
+def active_alerts(cursor):
+    """Return the open alerts as dicts, oldest first."""
+    cursor.execute("""
+        SELECT id, location, parameter, opened_at, last_value, min_value, max_value,
+               reading_count, last_reading_id
+        FROM sensor_alerts
+        WHERE is_active = 1
+        ORDER BY opened_at, id
+    """)
+    rows = cursor.fetchall()
+    if rows and not isinstance(rows[0], dict):
+        columns = [desc[0] for desc in cursor.description]
+        rows = [dict(zip(columns, row)) for row in rows]
+    return list(rows)
+
+
+def warnings(cursor):
+    """Active alerts grouped in the /warnings response shape."""
+    locations = {}
+    for alert in active_alerts(cursor):
+        locations.setdefault(alert['parameter'], []).append(alert['location'])
+
+    result = []
+    for parameter in PARAMETERS:
+        if parameter in locations:
+            result.append({
+                'parameter': parameter,
+                'locations': locations[parameter],
+                'message': f"{parameter.replace('_', ' ').title()} out of safe limits in: {', '.join(locations[parameter])}"
+            })
+    return result
@@ -0,0 +1,396 @@
+"""
+Bulk loading of historical readings from CSV or NDJSON files.
+
+Used by `manage.py bulk-load` to import logger dumps when a reservoir is
+onboarded. Files are streamed (optionally gzipped) and processed in chunks:
+every line is validated and normalized like an API reading
+(readings.validate_reading), locations are resolved to their canonical name
+and location_id, and the chunk is written with large multi-row INSERTs or
+LOAD DATA LOCAL INFILE. CSV files need a header row naming the reading
+fields; other columns are ignored. Lines that fail validation are appended
+to a rejects file with their line number and error.
+
+Each chunk commits together with the file's checkpoint row in bulk_loads,
+so an interrupted load resumes after the last committed chunk without
+loading a row twice. Rows are written with IGNORE, so readings whose
+reading_key is already stored are skipped.
+
+Loading bypasses save_readings: rollups are rebuilt once for the loaded date
+range at the end, and alert state, the live feed and the per-worker caches
+are not touched. For a large initial load on a quiet table, drop_indexes
+removes the non-unique secondary indexes of sensor_data first and rebuilds
+them in one ALTER at the end, which is much faster than maintaining them row
+by row. The dropped definitions are kept in bulk_load_dropped_indexes so an
+interrupted run still restores them.
+
+Only one load runs at a time, guarded by a MySQL named lock.
+"""
+import csv
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import msgspec
+
+from services import locations, rollups
+from services.readings import INSERT_CHUNK_SIZE, INSERT_COLUMNS, REQUIRED_FIELDS, validate_reading
+
+logger = logging.getLogger('bulk_load')
+
+TABLE = 'sensor_data'
+LOCK_NAME = 'water360_bulk_load'
+
+# Readings validated and committed together
+CHUNK_ROWS = int(os.getenv('BULK_LOAD_CHUNK_ROWS', 20000))
+
+FORMATS = ('csv', 'ndjson')
+METHODS = ('insert', 'load-data')
+
+_EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+
+class BulkLoadError(Exception):
+    """The source or the database is not in a state the load can work with."""
+
+
+class LoadBusy(BulkLoadError):
+    """Another bulk load holds the named lock."""
+
+
+@contextmanager
+def load_lock(cursor, timeout=0):
+    """Hold the bulk-load lock for the block; raises LoadBusy if another load has it."""
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, timeout))
+    if cursor.fetchone()[0] != 1:
+        raise LoadBusy(f"Lock {LOCK_NAME} is held by another bulk load")
+    try:
+        yield
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchall()
+
+
+def detect_format(path):
+    """'csv' or 'ndjson' from the file extension, ignoring a trailing .gz."""
+    name = path[:-3] if path.endswith('.gz') else path
+    fmt = _EXTENSIONS.get(os.path.splitext(name)[1].lower())
+    if fmt is None:
+        raise BulkLoadError(f"Cannot tell the format of {path}; pass --format")
+    return fmt
+
+
+def source_name(path):
+    """Checkpoint key of a file: its absolute path, hashed when too long for the column."""
+    source = os.path.abspath(path)
+    if len(source) > 255:
+        source = f"{source[:200]}...{hashlib.sha1(source.encode('utf-8')).hexdigest()}"
+    return source
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def _parse_csv(header, text):
+    values = next(csv.reader([text]))
+    if len(values) != len(header):
+        raise ValueError(f"Expected {len(header)} columns, got {len(values)}")
+    # Empty cells are treated as missing so optional fields can be left blank
+    return {name: value.strip() for name, value in zip(header, values) if value.strip()}
+
+
+def _parse_ndjson(text):
+    item = msgspec.json.decode(text)
+    if not isinstance(item, dict):
+        raise ValueError('Line must be a JSON object')
+    return item
+
+
+def read_chunks(path, fmt, offset=0, line_no=0, chunk_rows=CHUNK_ROWS, default_location=None):
+    """
+    Yield (offset, line_no, rows, rejects) per chunk of chunk_rows lines,
+    where offset and line_no are the position after the chunk, rows are
+    validated reading rows and rejects are (line_no, error, line) tuples.
+    Reading starts at offset; for CSV the header is always read first.
+    default_location fills readings without a location.
+    """
+    with _open(path) as handle:
+        header = None
+        if fmt == 'csv':
+            first = handle.readline()
+            header = [name.strip() for name in next(csv.reader([first.decode('utf-8-sig')]), [])]
+            required = [field for field in REQUIRED_FIELDS if not (field == 'location' and default_location)]
+            missing = [field for field in required if field not in header]
+            if missing:
+                raise BulkLoadError(f"{path}: CSV header has no {', '.join(missing)} column")
+            if offset == 0:
+                offset, line_no = len(first), 1
+        handle.seek(offset)
+
+        rows = []
+        rejects = []
+        for raw in handle:
+            offset += len(raw)
+            line_no += 1
+            text = raw.decode('utf-8', errors='replace').strip()
+            if text:
+                try:
+                    item = _parse_csv(header, text) if fmt == 'csv' else _parse_ndjson(text)
+                except (ValueError, csv.Error, msgspec.DecodeError) as e:
+                    rejects.append((line_no, str(e), text))
+                else:
+                    if default_location and not item.get('location'):
+                        item['location'] = default_location
+                    row, error = validate_reading(item)
+                    if error:
+                        rejects.append((line_no, error, text))
+                    else:
+                        rows.append(row)
+            if len(rows) + len(rejects) >= chunk_rows:
+                yield offset, line_no, rows, rejects
+                rows, rejects = [], []
+        if rows or rejects:
+            yield offset, line_no, rows, rejects
+
+
+def _insert(cursor, rows):
+    """Multi-row INSERT IGNORE; returns the rows inserted."""
+    columns = ', '.join(INSERT_COLUMNS)
+    row_placeholder = '(' + ', '.join(['%s'] * len(INSERT_COLUMNS)) + ')'
+    inserted = 0
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        chunk = rows[start:start + INSERT_CHUNK_SIZE]
+        cursor.execute(
+            f"INSERT IGNORE INTO {TABLE} ({columns}) VALUES {', '.join([row_placeholder] * len(chunk))}",
+            [value for row in chunk for value in row]
+        )
+        inserted += cursor.rowcount
+    return inserted
+
+
+def _tsv_value(value):
+    if value is None:
+        return '\\N'
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+
+
+def _load_data(cursor, rows):
+    """LOAD DATA LOCAL INFILE from a temporary TSV file; returns the rows inserted."""
+    with tempfile.NamedTemporaryFile('w', encoding='utf-8', suffix='.tsv', delete=False) as handle:
+        for row in rows:
+            handle.write('\t'.join(_tsv_value(value) for value in row) + '\n')
+        path = handle.name
+    try:
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE {TABLE}
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            ({', '.join(INSERT_COLUMNS)})
+        """, (path,))
+        return cursor.rowcount
+    finally:
+        os.unlink(path)
+
+
+_WRITERS = {'insert': _insert, 'load-data': _load_data}
+
+_CHECKPOINT_COLUMNS = ('bytes_done', 'lines_done', 'rows_loaded', 'rows_duplicate', 'rows_rejected',
+                       'min_measured_at', 'max_measured_at', 'finished_at')
+
+
+def get_checkpoint(cursor, source):
+    """The bulk_loads row of source as a dict, or None."""
+    cursor.execute(f"SELECT {', '.join(_CHECKPOINT_COLUMNS)} FROM bulk_loads WHERE source = %s", (source,))
+    row = cursor.fetchone()
+    return dict(zip(_CHECKPOINT_COLUMNS, row)) if row else None
+
+
+def _save_checkpoint(cursor, source, state):
+    cursor.execute(f"""
+        UPDATE bulk_loads SET {', '.join(f'{column} = %s' for column in _CHECKPOINT_COLUMNS[:-1])}
+        WHERE source = %s
+    """, [state[column] for column in _CHECKPOINT_COLUMNS[:-1]] + [source])
+
+
+def _write_rejects(path, source, rejects):
+    with open(path, 'a', encoding='utf-8') as handle:
+        for line_no, error, text in rejects:
+            handle.write(json.dumps({'source': source, 'line': line_no, 'error': error, 'text': text}) + '\n')
+
+
+def load_file(conn, path, fmt=None, method='insert', chunk_rows=CHUNK_ROWS, default_location=None,
+              restart=False, rejects_path=None, log=print):
+    """
+    Load one file, resuming from its checkpoint. Returns the checkpoint
+    state. A finished file is skipped unless restart is set; restart does
+    not remove rows loaded by an earlier run.
+    """
+    fmt = fmt or detect_format(path)
+    writer = _WRITERS[method]
+    source = source_name(path)
+    rejects_path = rejects_path or f'{path}.rejects.ndjson'
+
+    cursor = conn.cursor()
+    try:
+        if restart:
+            cursor.execute("DELETE FROM bulk_loads WHERE source = %s", (source,))
+        cursor.execute("INSERT IGNORE INTO bulk_loads (source) VALUES (%s)", (source,))
+        conn.commit()
+        state = get_checkpoint(cursor, source)
+        if state['finished_at']:
+            log(f"{path}: already loaded ({state['rows_loaded']} rows); pass --restart to load it again")
+            return state
+        if state['bytes_done']:
+            log(f"{path}: resuming at line {state['lines_done'] + 1}")
+
+        started = time.perf_counter()
+        processed = 0
+        for offset, line_no, rows, rejects in read_chunks(path, fmt, state['bytes_done'], state['lines_done'],
+                                                          chunk_rows, default_location):
+            inserted = 0
+            if rows:
+                rows = locations.resolve_rows(conn, rows)
+                inserted = writer(cursor, rows)
+                low = min(row[6] for row in rows)
+                high = max(row[6] for row in rows)
+                state['min_measured_at'] = min(filter(None, (state['min_measured_at'], low)))
+                state['max_measured_at'] = max(filter(None, (state['max_measured_at'], high)))
+            if rejects:
+                _write_rejects(rejects_path, source, rejects)
+
+            state['bytes_done'] = offset
+            state['lines_done'] = line_no
+            state['rows_loaded'] += inserted
+            state['rows_duplicate'] += len(rows) - inserted
+            state['rows_rejected'] += len(rejects)
+            _save_checkpoint(cursor, source, state)
+            conn.commit()
+
+            processed += len(rows) + len(rejects)
+            elapsed = time.perf_counter() - started
+            log(f"{path}: line {line_no}, {state['rows_loaded']} loaded, {state['rows_duplicate']} duplicate, "
+                f"{state['rows_rejected']} rejected ({processed / elapsed:.0f} rows/s)")
+
+        cursor.execute("UPDATE bulk_loads SET finished_at = NOW() WHERE source = %s", (source,))
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        log(f"{path}: done in {elapsed:.1f}s ({processed / elapsed if elapsed else 0:.0f} rows/s)")
+        if state['rows_rejected']:
+            log(f"{path}: rejected lines are in {rejects_path}")
+        return state
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def secondary_indexes(cursor, table=TABLE):
+    """[(name, column list)] of the non-unique secondary indexes of table."""
+    cursor.execute("""
+        SELECT index_name,
+               GROUP_CONCAT(CONCAT(column_name, IF(sub_part IS NULL, '', CONCAT('(', sub_part, ')')))
+                            ORDER BY seq_in_index SEPARATOR ', ')
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND non_unique = 1
+        GROUP BY index_name
+        ORDER BY index_name
+    """, (table,))
+    return [(name, columns) for name, columns in cursor.fetchall()]
+
+
+def drop_indexes(conn, table=TABLE, log=print):
+    """
+    Record and drop the non-unique secondary indexes of table. Unique keys
+    stay, since IGNORE relies on them. Returns the names dropped.
+    """
+    cursor = conn.cursor()
+    try:
+        indexes = secondary_indexes(cursor, table)
+        if not indexes:
+            return []
+        cursor.executemany(
+            "INSERT IGNORE INTO bulk_load_dropped_indexes (table_name, index_name, columns) VALUES (%s, %s, %s)",
+            [(table, name, columns) for name, columns in indexes]
+        )
+        conn.commit()
+        started = time.perf_counter()
+        cursor.execute(f"""
+            ALTER TABLE {table}
+            {', '.join(f'DROP INDEX {name}' for name, _ in indexes)},
+            ALGORITHM=INPLACE, LOCK=NONE
+        """)
+        log(f"Dropped {len(indexes)} secondary index(es) of {table} in {time.perf_counter() - started:.1f}s")
+        return [name for name, _ in indexes]
+    finally:
+        cursor.close()
+
+
+def restore_indexes(conn, table=TABLE, log=print):
+    """Rebuild the indexes recorded by drop_indexes in one ALTER. Returns the names added."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT index_name, columns FROM bulk_load_dropped_indexes WHERE table_name = %s ORDER BY index_name",
+            (table,)
+        )
+        recorded = cursor.fetchall()
+        if not recorded:
+            return []
+        present = {name for name, _ in secondary_indexes(cursor, table)}
+        missing = [(name, columns) for name, columns in recorded if name not in present]
+        if missing:
+            started = time.perf_counter()
+            cursor.execute(f"""
+                ALTER TABLE {table}
+                {', '.join(f'ADD INDEX {name} ({columns})' for name, columns in missing)},
+                ALGORITHM=INPLACE, LOCK=NONE
+            """)
+            log(f"Rebuilt {len(missing)} index(es) of {table} in {time.perf_counter() - started:.1f}s")
+        cursor.execute("DELETE FROM bulk_load_dropped_indexes WHERE table_name = %s", (table,))
+        conn.commit()
+        return [name for name, _ in missing]
+    finally:
+        cursor.close()
+
+
+def load(conn, paths, fmt=None, method='insert', chunk_rows=CHUNK_ROWS, default_location=None,
+         restart=False, drop_secondary_indexes=False, update_rollups=True, log=print):
+    """
+    Load several files under the bulk-load lock, then rebuild any dropped
+    indexes and the rollups for the loaded date range. Returns
+    {path: checkpoint state}. Raises LoadBusy when another load is running.
+    """
+    lock_cursor = conn.cursor()
+    try:
+        with load_lock(lock_cursor):
+            if drop_secondary_indexes:
+                drop_indexes(conn, log=log)
+
+            results = {}
+            for path in paths:
+                results[path] = load_file(conn, path, fmt=fmt, method=method, chunk_rows=chunk_rows,
+                                          default_location=default_location, restart=restart, log=log)
+
+            # Also restores indexes left dropped by an interrupted earlier run
+            restore_indexes(conn, log=log)
+
+            lows = [state['min_measured_at'] for state in results.values() if state['min_measured_at']]
+            highs = [state['max_measured_at'] for state in results.values() if state['max_measured_at']]
+            if update_rollups and lows:
+                since = rollups.day_start(min(lows))
+                until = rollups.day_start(max(highs)) + timedelta(days=1)
+                log(f"Rebuilding rollups for {since:%Y-%m-%d} to {until:%Y-%m-%d}")
+                rollups.backfill(conn, since=since, until=until, log=log)
+            return results
+    finally:
+        lock_cursor.close()
@@ -0,0 +1,85 @@
+"""
+Downsampling of time series for charts.
+
+A chart cannot show more points than it has pixels, so graph endpoints can
+return a bounded number of points however often a sensor reports. Two
+methods pick which readings to keep; both return indices of real readings,
+never interpolated values:
+
+    lttb    Largest-Triangle-Three-Buckets. Splits the series into equal-count
+            buckets and keeps, from each, the point forming the largest
+            triangle with the previously kept point and the next bucket's
+            average. Preserves the visual shape of the line.
+    minmax  Keeps the lowest and highest reading of each bucket, so spikes
+            (e.g. a turbidity breach) are never smoothed away.
+
+The per-bucket work is vectorized with NumPy; LTTB only loops over buckets,
+not over readings.
+"""
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+# Smallest useful output: the first point, the last, and one in between
+MIN_POINTS = 3
+
+
+def _lttb(x, y, points):
+    n = len(y)
+    # points - 2 buckets between the first and last reading, which are always kept
+    edges = np.linspace(1, n - 1, points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+        if bucket + 1 < points - 2:
+            next_x, next_y = mean_x[bucket + 1], mean_y[bucket + 1]
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        px, py = x[previous], y[previous]
+        # Twice the triangle area; the factor does not change the argmax
+        area = np.abs((px - next_x) * (y[lo:hi] - py) - (px - x[lo:hi]) * (next_y - py))
+        previous = lo + int(area.argmax())
+        selected[bucket + 1] = previous
+    return selected
+
+
+def _minmax(x, y, points):
+    n = len(y)
+    buckets = max(1, (points - 2) // 2)
+    bucket_of = np.arange(n) * buckets // n
+    # Sorted by bucket, then by value: each bucket's first entry is its minimum, its last the maximum
+    order = np.lexsort((y, bucket_of))
+    starts = np.searchsorted(bucket_of, np.arange(buckets))
+    ends = np.append(starts[1:], n) - 1
+    return np.unique(np.concatenate(([0, n - 1], order[starts], order[ends])))
+
+
+_SELECTORS = {'lttb': _lttb, 'minmax': _minmax}
+
+
+def downsample(x, series, max_points, method='lttb'):
+    """
+    Indices (ascending) of the readings to keep so that at most max_points
+    remain. x is the time axis (any increasing numbers); series is a list of
+    value arrays sharing it. Each series gets an equal share of max_points
+    and the kept indices are merged, so every series keeps its own shape
+    while all of them still share one time axis.
+    """
+    share = max_points // max(len(series), 1)
+    if share < MIN_POINTS:
+        raise ValueError(f'max_points must be at least {MIN_POINTS * max(len(series), 1)}')
+    if method not in _SELECTORS:
+        raise ValueError(f"Unknown downsampling method {method!r}, expected one of {', '.join(METHODS)}")
+
+    x = np.asarray(x, dtype=np.float64)
+    if len(x) <= max_points:
+        return np.arange(len(x))
+    select = _SELECTORS[method]
+    return np.unique(np.concatenate([select(x, np.asarray(values, dtype=np.float64), share) for values in series]))
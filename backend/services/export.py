@@ -0,0 +1,95 @@
+"""
+Streaming export of sensor_data.
+
+Rows are read through an unbuffered MySQLdb SSCursor on a dedicated pooled
+connection and encoded one fetchmany() batch at a time, so memory stays
+constant however many rows match. The connection is held until the stream
+finishes; an abandoned stream invalidates it rather than draining the rest of
+the result set.
+"""
+import csv
+import io
+import json
+import logging
+import time
+from datetime import date, datetime
+
+import MySQLdb
+
+logger = logging.getLogger('export')
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Rows pulled from the server and encoded per chunk written to the client
+FETCH_SIZE = 1000
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=' ') if isinstance(value, datetime) else value.isoformat()
+    return str(value)
+
+
+def _encode_ndjson(columns, batches):
+    dumps = json.JSONEncoder(default=_json_default, separators=(',', ':')).encode
+    for batch in batches:
+        yield ''.join(dumps(dict(zip(columns, row))) + '\n' for row in batch)
+
+
+def _encode_csv(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(
+            [value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else value for value in row]
+            for row in batch
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_export(conn, query, params, columns, fmt='ndjson', fetch_size=FETCH_SIZE):
+    """
+    Yield the encoded export of query in fmt ('ndjson' or 'csv').
+    conn must be a dedicated PooledConnection; it is released (or invalidated,
+    if the client disconnects mid-stream) when the generator finishes.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported export format: {fmt}')
+
+    state = {'rows': 0, 'done': False}
+    started = time.perf_counter()
+    cursor = conn.cursor(MySQLdb.cursors.SSCursor)
+
+    def batches():
+        cursor.execute(query, params)
+        while True:
+            batch = cursor.fetchmany(fetch_size)
+            if not batch:
+                state['done'] = True
+                return
+            state['rows'] += len(batch)
+            yield batch
+
+    encoder = _encode_ndjson if fmt == 'ndjson' else _encode_csv
+    try:
+        for chunk in encoder(columns, batches()):
+            yield chunk
+    finally:
+        elapsed = time.perf_counter() - started
+        rate = state['rows'] / elapsed if elapsed > 0 else 0.0
+        if state['done']:
+            cursor.close()
+            conn.close()
+            logger.info(f"Exported {state['rows']} rows as {fmt} in {elapsed:.2f}s ({rate:,.0f} rows/s)")
+        else:
+            # Unread rows would have to be drained before the connection is reusable
+            conn.invalidate()
+            logger.warning(f"Export aborted after {state['rows']} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)")
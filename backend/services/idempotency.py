@@ -0,0 +1,146 @@
+"""
+Idempotent ingestion with client-supplied reading keys.
+
+Gateways retry a POST when the response times out, even though the first
+attempt may have been committed. A reading may carry a reading_key (any
+ASCII string up to 64 characters, such as a content hash) or a device_id and
+seq, which become the key "device_id:seq". A key identifies a reading
+together with its measured_at, so a retry must resend the same date and time.
+
+sensor_data has a unique index on (reading_key, measured_at). measured_at is
+part of it because MySQL requires the partitioning column in every unique key
+of a partitioned table. Before inserting, save_readings looks keyed rows up
+and leaves out the ones already stored, so repeats get the original id and
+are not counted twice in the rollups or alert state. Keys committed recently
+are remembered per worker, so an obvious repeat needs no lookup query. The
+unique index catches the remaining race between concurrent writers.
+
+Readings without a key are always inserted.
+"""
+import os
+
+from core.cache import get_cache
+
+RECENT_KEYS = int(os.getenv('IDEMPOTENCY_RECENT_KEYS', 100000))
+RECENT_KEYS_TTL = int(os.getenv('IDEMPOTENCY_RECENT_KEYS_TTL', 600))
+
+KEY_MAX_LENGTH = 64
+
+# Positions in INSERT_COLUMNS rows (see readings.INSERT_COLUMNS)
+_MEASURED_AT_INDEX = 6
+_KEY_INDEX = 7
+
+# (reading_key, measured_at) pairs per lookup statement
+LOOKUP_CHUNK_SIZE = 500
+
+
+def _recent():
+    return get_cache('reading_keys', maxsize=RECENT_KEYS, ttl=RECENT_KEYS_TTL)
+
+
+def make_key(reading_key=None, device_id=None, seq=None):
+    """
+    The reading key for a payload, or None when it has none. Raises
+    ValueError for keys that cannot be stored.
+    """
+    if reading_key is None and device_id is not None and seq is not None:
+        reading_key = f'{str(device_id).strip()}:{seq}'
+    if reading_key is None:
+        return None
+    reading_key = str(reading_key).strip()
+    if not reading_key or len(reading_key) > KEY_MAX_LENGTH or not reading_key.isascii():
+        raise ValueError(f'reading_key must be 1 to {KEY_MAX_LENGTH} ASCII characters')
+    return reading_key
+
+
+def key_of(row):
+    """(reading_key, measured_at) of an INSERT_COLUMNS row, or None when unkeyed."""
+    if not row[_KEY_INDEX]:
+        return None
+    return row[_KEY_INDEX], row[_MEASURED_AT_INDEX]
+
+
+def load(cursor, keys, table='sensor_data'):
+    """{key: id} for the keys stored in table, read from the database."""
+    found = {}
+    for start in range(0, len(keys), LOOKUP_CHUNK_SIZE):
+        chunk = keys[start:start + LOOKUP_CHUNK_SIZE]
+        cursor.execute(f"""
+            SELECT id, reading_key, measured_at FROM {table}
+            WHERE (reading_key, measured_at) IN ({', '.join(['(%s, %s)'] * len(chunk))})
+        """, [value for key in chunk for value in key])
+        for row in cursor.fetchall():
+            if isinstance(row, dict):
+                row = (row['id'], row['reading_key'], row['measured_at'])
+            found[(row[1], row[2])] = row[0]
+    return found
+
+
+def existing(cursor, keys):
+    """{key: id} for the keys already stored, from the recent-keys cache or sensor_data."""
+    recent = _recent()
+    found = {}
+    missing = []
+    for key in keys:
+        reading_id = recent.get(key)
+        if reading_id is not None:
+            found[key] = reading_id
+        else:
+            missing.append(key)
+    if missing:
+        found.update(load(cursor, missing))
+    return found
+
+
+def split(cursor, rows):
+    """
+    Plan the insert of INSERT_COLUMNS rows. Returns (ids, fresh): ids holds
+    the stored id of every row whose key already exists and None elsewhere;
+    fresh lists the positions of rows to insert. A key repeated within rows
+    is inserted once, see assign.
+    """
+    keys = {key for key in map(key_of, rows) if key is not None}
+    stored = existing(cursor, list(keys)) if keys else {}
+
+    ids = [None] * len(rows)
+    fresh = []
+    seen = set()
+    for index, row in enumerate(rows):
+        key = key_of(row)
+        if key is None:
+            fresh.append(index)
+        elif key in stored:
+            ids[index] = stored[key]
+        elif key not in seen:
+            seen.add(key)
+            fresh.append(index)
+    return ids, fresh
+
+
+def assign(rows, ids, fresh, new_ids):
+    """Fill ids in place with the ids of the inserted rows, including repeats within rows."""
+    inserted = {}
+    for index, new_id in zip(fresh, new_ids):
+        ids[index] = new_id
+        key = key_of(rows[index])
+        if key is not None:
+            inserted[key] = new_id
+    for index, row in enumerate(rows):
+        if ids[index] is None:
+            ids[index] = inserted[key_of(row)]
+    return ids
+
+
+def remember(rows, ids):
+    """Cache the keys of committed rows."""
+    recent = _recent()
+    for row, reading_id in zip(rows, ids):
+        key = key_of(row)
+        if key is not None:
+            recent.set(key, reading_id)
+
+
+def forget(reading):
+    """Drop a deleted reading (a READ_COLUMNS dict) from the recent-keys cache."""
+    if reading and reading.get('reading_key'):
+        _recent().invalidate((reading['reading_key'], reading['measured_at']))
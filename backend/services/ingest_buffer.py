@@ -0,0 +1,286 @@
+"""
+Write-behind ingest buffer.
+
+With INGEST_BUFFER_ENABLED=true, validated readings are not written by the
+request thread. They are queued in a bounded in-process buffer and a
+background flusher writes whatever has accumulated with one save_readings
+call (one transaction, one fsync) once INGEST_FLUSH_ROWS readings are
+waiting or the oldest has waited INGEST_FLUSH_MS. Under load this turns many
+single-row commits into a few large group commits.
+
+Acknowledgements depend on INGEST_BUFFER_ACK:
+
+    durable    the request waits for the group commit that contains its
+               readings and gets their ids (201). If the commit does not
+               happen within INGEST_BUFFER_ACK_TIMEOUT the readings stay
+               queued and the request gets 202.
+    buffered   the request returns 202 as soon as the readings are queued.
+               Faster, but readings queued when a worker is killed are lost.
+
+When the buffer holds INGEST_BUFFER_SIZE readings new submissions are
+rejected with BufferFull (503 with Retry-After) instead of growing memory
+without bound. The buffer is drained on interpreter exit and from gunicorn's
+worker_exit hook, so a graceful restart does not drop queued readings.
+
+Each worker has its own buffer, so staleness is bounded per worker by
+INGEST_FLUSH_MS plus the commit time.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from core import metrics
+from core.database import get_db_connection
+from services.readings import save_readings
+
+logger = logging.getLogger('ingest_buffer')
+
+ENABLED = os.getenv('INGEST_BUFFER_ENABLED', 'false').lower() == 'true'
+BUFFER_SIZE = int(os.getenv('INGEST_BUFFER_SIZE', 10000))
+FLUSH_ROWS = int(os.getenv('INGEST_FLUSH_ROWS', 500))
+FLUSH_MS = float(os.getenv('INGEST_FLUSH_MS', 50))
+ACK_MODE = os.getenv('INGEST_BUFFER_ACK', 'durable').lower()
+ACK_TIMEOUT = float(os.getenv('INGEST_BUFFER_ACK_TIMEOUT', 5))
+DRAIN_TIMEOUT = float(os.getenv('INGEST_BUFFER_DRAIN_TIMEOUT', 20))
+
+# Seconds clients are told to wait when the buffer is full
+RETRY_AFTER = 1
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+class BufferFull(Exception):
+    """The buffer is at capacity, or closed for shutdown."""
+
+
+class Ticket:
+    """Tracks one submission until the group commit that contains it."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.ids = None
+        self.error = None
+        self.queued_at = time.monotonic()
+        self._done = threading.Event()
+
+    def _resolve(self, ids=None, error=None):
+        self.ids = ids
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """True once the submission has been committed or has failed."""
+        return self._done.wait(timeout)
+
+    def result(self):
+        """The new ids in input order. Raises the write error if the commit failed."""
+        if self.error is not None:
+            raise self.error
+        return self.ids
+
+
+class IngestBuffer:
+    """
+    Bounded queue of reading submissions with one flusher thread.
+    connect returns a connection whose close() releases it.
+    """
+
+    def __init__(self, capacity=BUFFER_SIZE, flush_rows=FLUSH_ROWS, flush_ms=FLUSH_MS,
+                 connect=get_db_connection):
+        self.capacity = capacity
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_ms / 1000.0
+        self._connect = connect
+        self.pid = os.getpid()
+        self._pending = deque()
+        self._pending_rows = 0
+        self._in_flight = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = {'submitted': 0, 'rejected': 0, 'flushes': 0, 'committed': 0, 'failed': 0, 'retries': 0}
+        self._thread = threading.Thread(target=self._run, name='ingest-flusher', daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        """Queue validated rows and return their Ticket. Raises BufferFull."""
+        ticket = Ticket(list(rows))
+        with self._cond:
+            if self._closed:
+                raise BufferFull('Ingest buffer is shutting down')
+            if self._pending_rows + len(ticket.rows) > self.capacity:
+                self._stats['rejected'] += len(ticket.rows)
+                metrics.ingest_rejected(len(ticket.rows))
+                raise BufferFull(f'Ingest buffer is full ({self._pending_rows} readings queued)')
+            self._pending.append(ticket)
+            self._pending_rows += len(ticket.rows)
+            self._stats['submitted'] += len(ticket.rows)
+            metrics.ingest_queued(len(ticket.rows))
+            self._cond.notify_all()
+        return ticket
+
+    def _take(self):
+        """
+        Wait for work and return the next group of tickets, or None when
+        closed and empty. A group is cut at flush_rows readings or once the
+        oldest ticket has waited flush_interval; closing flushes immediately.
+        """
+        with self._cond:
+            while not self._pending:
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+            deadline = self._pending[0].queued_at + self.flush_interval
+            while self._pending_rows < self.flush_rows and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            group = [self._pending.popleft()]
+            rows = len(group[0].rows)
+            while self._pending and rows + len(self._pending[0].rows) <= self.flush_rows:
+                ticket = self._pending.popleft()
+                group.append(ticket)
+                rows += len(ticket.rows)
+            self._pending_rows -= rows
+            self._in_flight = rows
+            return group
+
+    def _write(self, rows):
+        conn = self._connect()
+        try:
+            return save_readings(conn, rows)
+        finally:
+            conn.close()
+
+    def _flush(self, group):
+        rows = [row for ticket in group for row in ticket.rows]
+        started = time.perf_counter()
+        try:
+            ids = self._write(rows)
+        except Exception as e:
+            if len(group) == 1:
+                logger.error(f"Ingest flush of {len(rows)} readings failed: {e}")
+                self._stats['failed'] += len(rows)
+                group[0]._resolve(error=e)
+                return
+            # One bad submission must not fail the others it was grouped with
+            logger.warning(f"Group commit of {len(rows)} readings failed, retrying submissions separately: {e}")
+            self._stats['retries'] += 1
+            for ticket in group:
+                self._flush([ticket])
+            return
+
+        metrics.ingest_flushed(len(rows), time.perf_counter() - started)
+        self._stats['flushes'] += 1
+        self._stats['committed'] += len(rows)
+        offset = 0
+        for ticket in group:
+            ticket._resolve(ids=ids[offset:offset + len(ticket.rows)])
+            offset += len(ticket.rows)
+
+    def _run(self):
+        while True:
+            group = self._take()
+            if group is None:
+                return
+            try:
+                self._flush(group)
+            except Exception as e:
+                # Never let the flusher die with tickets unresolved
+                logger.exception("Ingest flusher failed")
+                for ticket in group:
+                    if not ticket.wait(0):
+                        ticket._resolve(error=e)
+            finally:
+                metrics.ingest_queued(-sum(len(ticket.rows) for ticket in group))
+                with self._cond:
+                    self._in_flight = 0
+                    self._cond.notify_all()
+
+    def close(self, timeout=DRAIN_TIMEOUT):
+        """
+        Stop accepting readings and flush everything queued. Returns the
+        number of readings still unwritten when timeout ran out.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._cond:
+            left = self._pending_rows + self._in_flight
+        if left:
+            logger.error(f"Ingest buffer closed with {left} readings unwritten")
+        return left
+
+    def stats(self):
+        with self._cond:
+            return dict(
+                self._stats,
+                queued=self._pending_rows,
+                in_flight=self._in_flight,
+                capacity=self.capacity,
+                flush_rows=self.flush_rows,
+                flush_ms=self.flush_interval * 1000,
+                closed=self._closed,
+            )
+
+
+def get_buffer():
+    """The process-wide buffer, or None when INGEST_BUFFER_ENABLED is off."""
+    global _buffer
+    if not ENABLED:
+        return None
+    # A buffer inherited across fork has no flusher thread in this process
+    if _buffer is None or _buffer.pid != os.getpid():
+        with _buffer_lock:
+            if _buffer is None or _buffer.pid != os.getpid():
+                _buffer = IngestBuffer()
+                atexit.register(shutdown)
+    return _buffer
+
+
+def write_readings(get_conn, rows):
+    """
+    Write validated rows directly or through the buffer.
+    Returns (ids, durable): ids is None when the readings were only queued.
+    Raises BufferFull when the buffer cannot take them.
+    """
+    buffer = get_buffer()
+    if buffer is None:
+        return save_readings(get_conn(), rows), True
+
+    ticket = buffer.submit(rows)
+    if ACK_MODE == 'durable' and ticket.wait(ACK_TIMEOUT):
+        return ticket.result(), True
+    return None, False
+
+
+def shutdown(timeout=DRAIN_TIMEOUT):
+    """Drain and stop the buffer if one was started. Safe to call twice."""
+    global _buffer
+    with _buffer_lock:
+        buffer, _buffer = _buffer, None
+    if buffer is not None:
+        left = buffer.close(timeout)
+        logger.info(f"Ingest buffer drained ({left} readings left)")
+
+
+def init_ingest_buffer(app):
+    """Start this worker's flusher when the buffer is enabled."""
+    if get_buffer() is not None:
+        app.logger.info(
+            f"Ingest buffer on: {BUFFER_SIZE} readings, flush at {FLUSH_ROWS} rows or {FLUSH_MS}ms, {ACK_MODE} acks"
+        )
+
+
+def get_ingest_buffer_stats():
+    buffer = _buffer
+    if buffer is None:
+        return {'enabled': ENABLED}
+    return dict(buffer.stats(), enabled=True, ack=ACK_MODE)
@@ -0,0 +1,273 @@
+"""
+Live feed of new sensor readings for Server-Sent Events.
+
+Inserts are published to an in-process core.pubsub.Broker by the
+services.readings write listener; the SSE endpoints subscribe to it. Event ids
+are sensor_data ids, so a reconnecting client's Last-Event-ID is replayed from
+the broker's ring buffer, or from sensor_data when the buffer no longer
+reaches back that far. Events are published under the reading's
+location_id, and subscriptions resolve their location names and aliases to
+location_ids, so live events and replay match the same readings.
+
+Each worker only sees its own inserts, so behind more than one gunicorn worker
+every worker polls sensor_data for new ids instead (SSE_DB_TAIL_INTERVAL,
+which replicas must also set).
+Every open stream holds a worker thread, so run gunicorn with gthread workers.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from core.database import get_db_connection
+from core.pubsub import Broker
+from services import readings
+from services.locations import UNKNOWN_ID, location_ids
+
+logger = logging.getLogger('live_feed')
+
+HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT', 15))
+MAX_STREAM_SECONDS = float(os.getenv('SSE_MAX_DURATION', 300))
+REPLAY_LIMIT = int(os.getenv('SSE_REPLAY_LIMIT', 1000))
+# Several workers (set by gunicorn.conf.py) must tail, or each sees only its own inserts
+TAIL_INTERVAL = float(os.getenv('SSE_DB_TAIL_INTERVAL', 1 if int(os.getenv('GUNICORN_WORKERS', 1)) > 1 else 0))
+
+# Every open stream pins one of the worker's threads (set by gunicorn.conf.py);
+# by default streams may take a quarter of them and the rest serve requests
+WORKER_THREADS = int(os.getenv('GUNICORN_THREADS', 32))
+MAX_CLIENTS = int(os.getenv('SSE_MAX_CLIENTS', max(1, WORKER_THREADS // 4)))
+
+# Tells EventSource how long to wait before reconnecting, in milliseconds
+RETRY_MS = 3000
+
+_broker = None
+_broker_lock = threading.Lock()
+_tail_thread = None
+
+
+def _payload(row):
+    measured_at = row.get('measured_at')
+    return {
+        'id': row['id'],
+        'location': row['location'],
+        'ph_value': float(row['ph_value']),
+        'temperature': float(row['temperature']),
+        'turbidity': float(row['turbidity']),
+        'date': row['date'],
+        'time': row['time'],
+        'measured_at': measured_at.strftime('%Y-%m-%d %H:%M:%S') if measured_at else None,
+    }
+
+
+def _on_write(event, before, after):
+    if event != 'insert' or TAIL_INTERVAL > 0:
+        return
+    for row in after:
+        _broker.publish(row['id'], row['location_id'], _payload(row))
+
+
+def get_broker():
+    """Return the process-wide broker, registering the insert listener on first use."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = Broker(
+                    history=int(os.getenv('SSE_HISTORY', 1000)),
+                    max_subscribers=MAX_CLIENTS,
+                    queue_size=int(os.getenv('SSE_QUEUE_SIZE', 256))
+                )
+                readings.add_listener(_on_write)
+    return _broker
+
+
+def _rows_after(cursor, after_id, ids=None, limit=REPLAY_LIMIT):
+    query = f"SELECT {', '.join(readings.READ_COLUMNS)} FROM sensor_data WHERE id > %s"
+    params = [after_id]
+    if ids:
+        query += f" AND location_id IN ({', '.join(['%s'] * len(ids))})"
+        params.extend(ids)
+    query += " ORDER BY id LIMIT %s"
+    params.append(limit)
+    cursor.execute(query, params)
+    return [dict(zip(readings.READ_COLUMNS, row)) for row in cursor.fetchall()]
+
+
+def _tail_loop(interval):
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM sensor_data")
+        last_id = cursor.fetchone()[0]
+        cursor.close()
+    finally:
+        conn.close()
+
+    while True:
+        time.sleep(interval)
+        try:
+            conn = get_db_connection()
+            try:
+                cursor = conn.cursor()
+                rows = _rows_after(cursor, last_id)
+                cursor.close()
+            finally:
+                conn.close()
+        except Exception as e:
+            logger.warning(f"Live feed tail failed: {e}")
+            continue
+        for row in rows:
+            _broker.publish(row['id'], row['location_id'], _payload(row))
+            last_id = row['id']
+
+
+def _ensure_tail():
+    global _tail_thread
+    if TAIL_INTERVAL <= 0:
+        return
+    with _broker_lock:
+        if _tail_thread is None or not _tail_thread.is_alive():
+            _tail_thread = threading.Thread(target=_tail_loop, args=(TAIL_INTERVAL,), name='live-feed-tail', daemon=True)
+            _tail_thread.start()
+
+
+def resolve_locations(locations):
+    """
+    The location_ids to subscribe to for location names or aliases, or None
+    for every location. Unknown names match nothing.
+    """
+    if not locations:
+        return None
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        ids = location_ids(cursor, locations)
+        cursor.close()
+    finally:
+        conn.close()
+    return ids or [UNKNOWN_ID]
+
+
+def replay(after_id, ids=None):
+    """Events after after_id for the location_ids, from the ring buffer or else from sensor_data."""
+    events = get_broker().replay(after_id, ids)
+    if events is not None:
+        return events
+
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        rows = _rows_after(cursor, after_id, ids)
+        cursor.close()
+    finally:
+        conn.close()
+    return [(row['id'], row['location_id'], _payload(row)) for row in rows]
+
+
+def _format(event_id, payload, event='reading'):
+    # Events without an id leave the client's Last-Event-ID untouched
+    prefix = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{prefix}event: {event}\ndata: {json.dumps(payload, separators=(',', ':'))}\n\n"
+
+
+def open_stream(last_event_id=None, locations=None):
+    """
+    Subscribe and return a generator of SSE text, or None when the broker is at
+    its subscriber limit. locations are names or aliases. Resolving them and
+    replaying happen here, before the response starts, so the stream itself
+    never holds a database connection.
+    """
+    _ensure_tail()
+    ids = resolve_locations(locations)
+    subscription = get_broker().subscribe(ids)
+    if subscription is None:
+        return None
+
+    try:
+        backlog = replay(last_event_id, ids) if last_event_id is not None else []
+    except Exception:
+        subscription.close()
+        raise
+
+    def generate():
+        started = time.monotonic()
+        sent = set()
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            for event_id, _, payload in backlog:
+                sent.add(event_id)
+                yield _format(event_id, payload)
+
+            while time.monotonic() - started < MAX_STREAM_SECONDS:
+                event = subscription.get(timeout=0 if subscription.closed else HEARTBEAT_SECONDS)
+                if event is None:
+                    if subscription.closed:
+                        # Fell behind and was dropped; the client resumes via Last-Event-ID
+                        yield _format(None, {'reason': 'overflow'}, event='reset')
+                        return
+                    yield ": keepalive\n\n"
+                    continue
+                event_id, _, payload = event
+                if event_id in sent:
+                    continue
+                yield _format(event_id, payload)
+        finally:
+            subscription.close()
+
+    return _Stream(generate(), subscription)
+
+
+class _Stream:
+    """
+    Response iterable that releases the subscription on close(), even if the
+    client went away before the generator was first advanced.
+    """
+
+    def __init__(self, generator, subscription):
+        self._generator = generator
+        self._subscription = subscription
+
+    def __iter__(self):
+        return self._generator
+
+    def close(self):
+        self._generator.close()
+        self._subscription.close()
+
+
+def parse_stream_args(args, headers):
+    """
+    Return (last_event_id, locations) from the Last-Event-ID header (or a
+    last_event_id query argument) and ?location=a,b. Raises ValueError.
+    """
+    raw = headers.get('Last-Event-ID') or args.get('last_event_id')
+    try:
+        last_event_id = int(raw) if raw not in (None, '') else None
+    except ValueError:
+        raise ValueError('Last-Event-ID must be a reading id')
+    locations = [value.strip() for value in (args.get('location') or '').split(',') if value.strip()]
+    return last_event_id, locations or None
+
+
+# Disable caching and proxy buffering so events reach the client immediately
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no',
+}
+
+
+def init_live_feed(app):
+    """Create the broker at startup so this worker publishes its own inserts."""
+    get_broker()
+    if MAX_CLIENTS >= WORKER_THREADS:
+        app.logger.warning(
+            f"SSE_MAX_CLIENTS={MAX_CLIENTS} is not below the {WORKER_THREADS} worker threads; "
+            "open streams can starve other requests"
+        )
+    if TAIL_INTERVAL > 0:
+        app.logger.info(f"Live feed tails sensor_data every {TAIL_INTERVAL}s")
+
+
+def get_live_feed_stats():
+    return get_broker().stats()
@@ -0,0 +1,248 @@
+"""
+Location dimension.
+
+Readings keep their location name for display, but filters and indexes use
+the small integer sensor_data.location_id. Every spelling seen for a place is
+stored in location_aliases under its normalized form (trimmed, single-spaced,
+casefolded), so 'US', 'us' and ' Us ' resolve to the same location through a
+primary-key lookup instead of a LOWER(location) scan. Resolved names are
+cached per process.
+"""
+import logging
+import os
+
+from core.cache import get_cache
+from services import alerts, rollups
+
+logger = logging.getLogger('locations')
+
+LOCATION_CACHE_TTL = int(os.getenv('LOCATION_CACHE_TTL', 300))
+
+# location_id used for names that do not resolve; ids start at 1, so it matches no rows
+UNKNOWN_ID = 0
+
+# Position of location in validated reading rows (see readings.validate_reading)
+_LOCATION_INDEX = 3
+
+
+def normalize(name):
+    """The alias key for a location name."""
+    return ' '.join(str(name).split()).casefold()
+
+
+def _cache():
+    return get_cache('locations', maxsize=4096, ttl=LOCATION_CACHE_TTL)
+
+
+def _load(cursor, alias):
+    cursor.execute("""
+        SELECT l.id, l.name FROM location_aliases a
+        JOIN locations l ON l.id = a.location_id
+        WHERE a.alias = %s
+    """, (alias,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return row['id'], row['name']
+    return row[0], row[1]
+
+
+def lookup(cursor, name):
+    """(location_id, canonical name) for a name or alias, or None when unknown."""
+    if name is None or not str(name).strip():
+        return None
+    alias = normalize(name)
+    return _cache().get_or_load(alias, lambda: _load(cursor, alias))
+
+
+def location_id(cursor, name):
+    """location_id for a name or alias, or UNKNOWN_ID."""
+    found = lookup(cursor, name)
+    return found[0] if found else UNKNOWN_ID
+
+
+def location_ids(cursor, names):
+    """location_ids for several names, skipping unknown ones."""
+    return [found[0] for found in (lookup(cursor, name) for name in names) if found]
+
+
+def _create(cursor, name):
+    """
+    Register name as a location with itself as an alias. Concurrent writers
+    may race here; the unique keys make both converge on one row. The reads
+    are locking reads so they see a row another transaction committed after
+    this one's snapshot. Does not commit or cache.
+    """
+    name = ' '.join(str(name).split())
+    alias = normalize(name)
+    cursor.execute("INSERT IGNORE INTO locations (name) VALUES (%s)", (name,))
+    cursor.execute("SELECT id FROM locations WHERE name = %s LOCK IN SHARE MODE", (name,))
+    row = cursor.fetchone()
+    new_id = row['id'] if isinstance(row, dict) else row[0]
+    cursor.execute("INSERT IGNORE INTO location_aliases (alias, location_id) VALUES (%s, %s)", (alias, new_id))
+    cursor.execute("""
+        SELECT l.id, l.name FROM location_aliases a
+        JOIN locations l ON l.id = a.location_id
+        WHERE a.alias = %s LOCK IN SHARE MODE
+    """, (alias,))
+    row = cursor.fetchone()
+    if isinstance(row, dict):
+        return row['id'], row['name']
+    return row[0], row[1]
+
+
+def resolve(conn, name):
+    """
+    (location_id, canonical name) for name, creating the location if it is
+    new. A new location is written in the caller's transaction under a
+    savepoint and commits with it, so no second connection is needed and a
+    failed create leaves the caller's earlier work intact. It is not cached
+    here: the first lookup after the commit loads it, so the cache never
+    holds an id from a rolled-back transaction.
+    """
+    cursor = conn.cursor()
+    try:
+        found = lookup(cursor, name)
+        if found is None:
+            cursor.execute("SAVEPOINT location_create")
+            try:
+                found = _create(cursor, name)
+            except Exception:
+                cursor.execute("ROLLBACK TO SAVEPOINT location_create")
+                raise
+            cursor.execute("RELEASE SAVEPOINT location_create")
+        return found
+    finally:
+        cursor.close()
+
+
+def resolve_rows(conn, rows):
+    """
+    Turn validated reading rows into INSERT_COLUMNS rows: the location is
+    replaced by its canonical name and its location_id appended.
+    """
+    resolved = {}
+    for row in rows:
+        name = row[_LOCATION_INDEX]
+        if name not in resolved:
+            resolved[name] = resolve(conn, name)
+    result = []
+    for row in rows:
+        found_id, canonical = resolved[row[_LOCATION_INDEX]]
+        result.append(row[:_LOCATION_INDEX] + (canonical,) + row[_LOCATION_INDEX + 1:] + (found_id,))
+    return result
+
+
+def add_alias(conn, alias, name):
+    """
+    Point alias at the location called name. If alias already belongs to a
+    different location, that location's readings, aliases, alerts and rollups
+    are merged into name's and it is removed, all in one transaction, and the
+    cached responses of both are invalidated. Commits; returns the number of
+    readings moved.
+    """
+    cursor = conn.cursor()
+    try:
+        target = lookup(cursor, name)
+        if target is None:
+            raise ValueError(f'Unknown location: {name}')
+        current = lookup(cursor, alias)
+
+        moved = 0
+        merged = None
+        if current is not None and current[0] != target[0]:
+            cursor.execute(
+                "SELECT MIN(measured_at), MAX(measured_at) FROM sensor_data WHERE location_id = %s",
+                (current[0],)
+            )
+            start, end = cursor.fetchone()
+            cursor.execute("SELECT DISTINCT date FROM sensor_data WHERE location_id = %s", (current[0],))
+            merged = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                "UPDATE sensor_data SET location_id = %s, location = %s, updated_at = updated_at WHERE location_id = %s",
+                (target[0], target[1], current[0])
+            )
+            moved = cursor.rowcount
+            cursor.execute("UPDATE location_aliases SET location_id = %s WHERE location_id = %s",
+                           (target[0], current[0]))
+            cursor.execute("DELETE FROM locations WHERE id = %s", (current[0],))
+            # Alerts and rollups are keyed by the canonical name
+            alerts.merge_location(cursor, current[1], target[1])
+            rollups.merge_location(cursor, current[1], target[1], start, end)
+
+        cursor.execute("""
+            INSERT INTO location_aliases (alias, location_id) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE location_id = VALUES(location_id)
+        """, (normalize(alias), target[0]))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    # Other workers pick the change up when LOCATION_CACHE_TTL expires
+    _cache().clear()
+    if merged is not None:
+        # response_cache resolves locations through this module
+        from services.response_cache import invalidate_locations
+        invalidate_locations([current[0], target[0]], merged)
+    return moved
+
+
+def backfill(conn, chunk_size=5000, log=print):
+    """
+    Register every location spelling in sensor_data, then fill location_id and
+    the canonical name in primary-key chunks, committing each chunk so the
+    backfill can be interrupted and resumed. The most frequent spelling of a
+    normalized name becomes canonical. Returns the number of rows updated.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT location COLLATE utf8mb4_bin AS spelling, COUNT(*) FROM sensor_data
+        WHERE location_id IS NULL GROUP BY spelling
+    """)
+    spellings = {}
+    for spelling, count in cursor.fetchall():
+        spellings.setdefault(normalize(spelling), []).append((count, spelling))
+    for alias, counts in sorted(spellings.items()):
+        if lookup(cursor, alias) is None:
+            found = _create(cursor, max(counts)[1])
+            conn.commit()
+            _cache().set(alias, found)
+            log(f"Registered location {found[1]!r} (id {found[0]})")
+
+    cursor.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM sensor_data WHERE location_id IS NULL")
+    low, high = cursor.fetchone()
+
+    updated = 0
+    start = low
+    while start and start <= high:
+        end = start + chunk_size - 1
+        cursor.execute("""
+            SELECT id, location FROM sensor_data
+            WHERE id BETWEEN %s AND %s AND location_id IS NULL
+        """, (start, end))
+        rows = []
+        for row_id, name in cursor.fetchall():
+            found = lookup(cursor, name)
+            if found is not None:
+                rows.append((row_id, found[0], found[1]))
+
+        if rows:
+            values = ' UNION ALL '.join(['SELECT %s AS id, %s AS location_id, %s AS location'] * len(rows))
+            params = [value for row in rows for value in row]
+            cursor.execute(f"""
+                UPDATE sensor_data s
+                JOIN ({values}) v ON s.id = v.id
+                SET s.location_id = v.location_id, s.location = v.location, s.updated_at = s.updated_at
+            """, params)
+            conn.commit()
+            updated += len(rows)
+
+        log(f"Backfilled ids {start}-{end}: {updated} updated")
+        start = end + 1
+
+    cursor.close()
+    return updated
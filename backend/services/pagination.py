@@ -0,0 +1,120 @@
+"""
+Keyset pagination for list endpoints.
+
+Pages are ordered newest first on (created_at, id) and continue from an
+opaque cursor holding the last row's key, so every page is one index range
+scan of at most page_size + 1 rows however deep the client pages.
+"""
+import base64
+import json
+import os
+from datetime import datetime
+
+DEFAULT_PAGE_SIZE = int(os.getenv('PAGE_SIZE_DEFAULT', 100))
+MAX_PAGE_SIZE = int(os.getenv('PAGE_SIZE_MAX', 1000))
+
+# Columns the keyset needs on every row, whether or not the client asked for them
+KEY_COLUMNS = ('created_at', 'id')
+
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+
+class PaginationError(ValueError):
+    """Raised for a malformed cursor, page size or fields parameter."""
+
+
+def encode_cursor(created_at, row_id):
+    """Encode a (created_at, id) key as an opaque URL-safe token."""
+    key = [created_at.strftime(_TIMESTAMP_FORMAT) if created_at else None, row_id]
+    token = base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Decode a token from encode_cursor back into (created_at, id)."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if created_at is not None:
+            created_at = datetime.strptime(created_at, _TIMESTAMP_FORMAT)
+        return created_at, int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise PaginationError('Invalid cursor')
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Parse ?limit=, capped at maximum."""
+    if value in (None, ''):
+        return default
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise PaginationError('limit must be an integer')
+    if size < 1:
+        raise PaginationError('limit must be at least 1')
+    return min(size, maximum)
+
+
+def parse_fields(value, allowed, default=None):
+    """
+    Parse ?fields=a,b,c against the allowed column names.
+    Returns the requested columns in request order, or default (all allowed).
+    """
+    if not value:
+        return list(default or allowed)
+    fields = []
+    for field in value.split(','):
+        field = field.strip()
+        if not field:
+            continue
+        if field not in allowed:
+            raise PaginationError(f'Unknown field: {field}')
+        if field not in fields:
+            fields.append(field)
+    if not fields:
+        raise PaginationError('fields must name at least one column')
+    return fields
+
+
+def fetch_page(cursor, table, fields, filters=None, params=None, after=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Fetch one page of table newest first.
+    filters is a list of SQL conditions with %s placeholders matched by params;
+    after is a token from a previous page. Returns (rows as dicts limited to
+    fields, next cursor token or None).
+    """
+    columns = list(fields) + [column for column in KEY_COLUMNS if column not in fields]
+    conditions = list(filters or [])
+    values = list(params or [])
+
+    if after:
+        created_at, row_id = decode_cursor(after)
+        if created_at is None:
+            conditions.append("(created_at IS NULL AND id < %s)")
+            values.append(row_id)
+        else:
+            # Expanded form of (created_at, id) < (%s, %s) so MySQL uses a range scan
+            conditions.append("(created_at < %s OR (created_at = %s AND id < %s) OR created_at IS NULL)")
+            values.extend([created_at, created_at, row_id])
+
+    query = f"SELECT {', '.join(columns)} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY created_at DESC, id DESC LIMIT %s"
+    values.append(page_size + 1)
+
+    cursor.execute(query, values)
+    rows = cursor.fetchall()
+    if rows and not isinstance(rows[0], dict):
+        rows = [dict(zip(columns, row)) for row in rows]
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(last['created_at'], last['id'])
+
+    extra = [column for column in KEY_COLUMNS if column not in fields]
+    if extra:
+        rows = [{column: row[column] for column in fields} for row in rows]
+    return list(rows), next_cursor
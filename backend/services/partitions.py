@@ -0,0 +1,243 @@
+"""
+Monthly RANGE partitioning of sensor_data on measured_at.
+
+`enable` converts the table once: measured_at becomes NOT NULL, the primary
+key becomes (id, measured_at) because MySQL requires the partitioning column
+in every unique key, and rows are split into one partition per month plus a
+MAXVALUE catch-all. Queries that filter on measured_at are then pruned to the
+months they touch (check the partitions column of EXPLAIN).
+
+`maintain` runs on a schedule. It splits future months out of the catch-all
+so they exist before data arrives, and removes months older than the
+retention period. Expired months are either dropped or exchanged into a
+standalone sensor_data_archive_YYYYMM table, which is a metadata-only swap.
+Hourly and daily rollups are not touched, so graphs keep covering expired
+months.
+
+Every DDL step runs under a MySQL named lock, so the job can be started from
+several pods at once: one does the work and the others skip.
+"""
+import logging
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger('partitions')
+
+TABLE = 'sensor_data'
+ARCHIVE_PREFIX = 'sensor_data_archive_'
+
+# Catch-all for readings beyond the last monthly partition
+FUTURE_PARTITION = 'pfuture'
+
+LOCK_NAME = 'water360_partition_maintenance'
+
+MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', 3))
+# 0 keeps every month
+RETENTION_MONTHS = int(os.getenv('PARTITION_RETENTION_MONTHS', 0))
+ARCHIVE = os.getenv('PARTITION_ARCHIVE', 'true').lower() == 'true'
+
+
+class PartitionError(Exception):
+    """The table is not in a state the requested operation can work with."""
+
+
+class LockBusy(PartitionError):
+    """Another maintenance run holds the named lock."""
+
+
+def month_start(moment):
+    """Truncate a datetime to the first of its month."""
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, count):
+    """Shift a month start by count months."""
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'p{month:%Y%m}'
+
+
+def partition_month(name):
+    """The month a partition holds, or None for the catch-all."""
+    try:
+        return datetime.strptime(name, 'p%Y%m')
+    except ValueError:
+        return None
+
+
+def _definition(month):
+    return f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1):%Y-%m-%d}')"
+
+
+def _future_definition():
+    return f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)"
+
+
+def list_partitions(cursor, table=TABLE):
+    """[(name, estimated rows)] in order, or [] when the table is not partitioned."""
+    cursor.execute("""
+        SELECT partition_name, table_rows FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+        ORDER BY partition_ordinal_position
+    """, (table,))
+    return [(name, rows) for name, rows in cursor.fetchall()]
+
+
+@contextmanager
+def maintenance_lock(cursor, timeout=0):
+    """Hold the named lock for the block; raises LockBusy if another run has it."""
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (LOCK_NAME, timeout))
+    if cursor.fetchone()[0] != 1:
+        raise LockBusy(f"Lock {LOCK_NAME} is held by another maintenance run")
+    try:
+        yield
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+        cursor.fetchall()
+
+
+def _months(first, last):
+    months = []
+    month = first
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def enable(conn, months_ahead=MONTHS_AHEAD, now=None, log=print):
+    """
+    Partition sensor_data by month. This rebuilds the table and blocks writes
+    while it copies, so run it in a maintenance window. Returns the number of
+    monthly partitions created, or 0 if the table was already partitioned.
+    """
+    cursor = conn.cursor()
+    try:
+        with maintenance_lock(cursor):
+            if list_partitions(cursor):
+                log(f"{TABLE} is already partitioned")
+                return 0
+
+            cursor.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE measured_at IS NULL")
+            missing = cursor.fetchone()[0]
+            if missing:
+                raise PartitionError(
+                    f"{missing} rows have no measured_at; run manage.py backfill-measured-at "
+                    f"and fix or delete rows with unparseable date/time first"
+                )
+
+            current = month_start(now or datetime.now())
+            cursor.execute(f"SELECT MIN(measured_at) FROM {TABLE}")
+            oldest = cursor.fetchone()[0]
+            months = _months(month_start(oldest) if oldest else current, add_months(current, months_ahead))
+
+            log(f"Partitioning {TABLE} into {len(months)} monthly partitions "
+                f"({partition_name(months[0])} to {partition_name(months[-1])})")
+            definitions = ', '.join([_definition(month) for month in months] + [_future_definition()])
+            cursor.execute(f"""
+                ALTER TABLE {TABLE}
+                MODIFY measured_at DATETIME NOT NULL,
+                DROP PRIMARY KEY,
+                ADD PRIMARY KEY (id, measured_at)
+                PARTITION BY RANGE COLUMNS (measured_at) ({definitions})
+            """)
+            return len(months)
+    finally:
+        cursor.close()
+
+
+def _require_partitions(cursor):
+    partitions = list_partitions(cursor)
+    if not partitions:
+        raise PartitionError(f"{TABLE} is not partitioned; run manage.py partitions enable first")
+    return partitions
+
+
+def create_future(cursor, months_ahead=MONTHS_AHEAD, now=None):
+    """
+    Split monthly partitions out of the catch-all up to months_ahead months
+    past the current one. Cheap while the catch-all is empty. Returns the
+    names created.
+    """
+    partitions = _require_partitions(cursor)
+    months = [month for month in map(partition_month, (name for name, _ in partitions)) if month]
+    target = add_months(month_start(now or datetime.now()), months_ahead)
+    first = add_months(max(months), 1) if months else month_start(now or datetime.now())
+    missing = _months(first, target)
+    if not missing:
+        return []
+
+    definitions = ', '.join([_definition(month) for month in missing] + [_future_definition()])
+    cursor.execute(f"ALTER TABLE {TABLE} REORGANIZE PARTITION {FUTURE_PARTITION} INTO ({definitions})")
+    return [partition_name(month) for month in missing]
+
+
+def _table_exists(cursor, table):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name = %s
+    """, (table,))
+    return cursor.fetchone() is not None
+
+
+def _archive(cursor, name, month):
+    """Swap a partition's rows into sensor_data_archive_YYYYMM."""
+    archive = f'{ARCHIVE_PREFIX}{month:%Y%m}'
+    if _table_exists(cursor, archive):
+        # A previous run may have exchanged the rows and stopped before the drop
+        cursor.execute(f"SELECT COUNT(*) FROM {TABLE} PARTITION ({name})")
+        if cursor.fetchone()[0]:
+            raise PartitionError(f"{archive} already exists and {name} still holds rows")
+        return archive
+    cursor.execute(f"CREATE TABLE {archive} LIKE {TABLE}")
+    cursor.execute(f"ALTER TABLE {archive} REMOVE PARTITIONING")
+    cursor.execute(f"ALTER TABLE {TABLE} EXCHANGE PARTITION {name} WITH TABLE {archive}")
+    return archive
+
+
+def expire(cursor, retention_months=RETENTION_MONTHS, archive=ARCHIVE, now=None, log=print):
+    """
+    Remove monthly partitions that ended more than retention_months months
+    before the current month, oldest first. Returns the names removed.
+    """
+    if retention_months <= 0:
+        return []
+    partitions = _require_partitions(cursor)
+    cutoff = add_months(month_start(now or datetime.now()), -retention_months)
+
+    removed = []
+    for name, rows in partitions:
+        month = partition_month(name)
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        if archive:
+            table = _archive(cursor, name, month)
+            log(f"Archived {name} (~{rows} rows) to {table}")
+        else:
+            log(f"Dropping {name} (~{rows} rows)")
+        cursor.execute(f"ALTER TABLE {TABLE} DROP PARTITION {name}")
+        removed.append(name)
+    return removed
+
+
+def maintain(conn, months_ahead=MONTHS_AHEAD, retention_months=RETENTION_MONTHS, archive=ARCHIVE,
+             now=None, log=print):
+    """
+    Pre-create future partitions and expire old ones under the maintenance
+    lock. Returns (created, removed) partition names. Raises LockBusy when
+    another run is in progress.
+    """
+    cursor = conn.cursor()
+    try:
+        with maintenance_lock(cursor):
+            created = create_future(cursor, months_ahead, now=now)
+            if created:
+                log(f"Created partitions {', '.join(created)}")
+            removed = expire(cursor, retention_months, archive, now=now, log=log)
+            return created, removed
+    finally:
+        cursor.close()
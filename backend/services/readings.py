@@ -0,0 +1,434 @@
+"""
+Sensor reading helpers.
+Shared normalization for every path that writes to sensor_data.
+"""
+import logging
+import uuid
+from datetime import datetime
+from typing import List, Union
+
+import MySQLdb
+import msgspec
+
+from models.schemas import Reading, ReadingBatch
+from services import alerts, idempotency, locations, rollups
+
+logger = logging.getLogger('readings')
+
+DATE_FORMAT = '%Y-%m-%d'
+TIME_FORMATS = ('%H:%M:%S', '%H:%M', '%H:%M:%S.%f')
+
+REQUIRED_FIELDS = ('ph_value', 'temperature', 'turbidity', 'location', 'time', 'date')
+NUMERIC_FIELDS = ('ph_value', 'temperature', 'turbidity')
+INSERT_COLUMNS = REQUIRED_FIELDS + ('measured_at', 'reading_key', 'location_id')
+READ_COLUMNS = ('id',) + INSERT_COLUMNS + ('created_at', 'updated_at')
+
+# Rows per multi-row INSERT statement
+INSERT_CHUNK_SIZE = 1000
+
+# MySQL error code for a unique key violation
+ER_DUP_ENTRY = 1062
+
+_reading_decoder = msgspec.json.Decoder(Reading, strict=False)
+_batch_decoder = msgspec.json.Decoder(Union[List[Reading], ReadingBatch], strict=False)
+
+# Callables notified after every committed write, see add_listener
+_listeners = []
+
+# Whether multi-row INSERTs get consecutive ids, see consecutive_ids
+_consecutive_ids = None
+
+
+def add_listener(listener):
+    """
+    Register listener(event, before, after), called after each committed
+    write. event is 'insert', 'update' or 'delete'; before and after are
+    lists of row dicts keyed by READ_COLUMNS. Listener errors are logged
+    and never fail the write.
+    """
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def remove_listener(listener):
+    """Unregister a listener added with add_listener."""
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def _notify(event, before, after):
+    for listener in list(_listeners):
+        try:
+            listener(event, before, after)
+        except Exception:
+            logger.exception(f"Reading listener {listener!r} failed on {event}")
+
+
+def parse_measured_at(date, time):
+    """
+    Combine the VARCHAR date and time columns into a datetime.
+    Returns None when either part cannot be parsed.
+    """
+    if not date or not time:
+        return None
+
+    date = str(date).strip()
+    time = str(time).strip()
+
+    # Fast path for the canonical YYYY-MM-DD / HH:MM:SS form sent by gateways
+    if len(date) == 10 and len(time) == 8 and date[4] == date[7] == '-' and time[2] == time[5] == ':':
+        try:
+            return datetime(int(date[0:4]), int(date[5:7]), int(date[8:10]),
+                            int(time[0:2]), int(time[3:5]), int(time[6:8]))
+        except ValueError:
+            return None
+
+    try:
+        day = datetime.strptime(date, DATE_FORMAT)
+    except ValueError:
+        return None
+
+    for fmt in TIME_FORMATS:
+        try:
+            clock = datetime.strptime(time, fmt)
+        except ValueError:
+            continue
+        return day.replace(
+            hour=clock.hour,
+            minute=clock.minute,
+            second=clock.second,
+            microsecond=0
+        )
+    return None
+
+
+def _to_row(reading):
+    """(row, None) for a decoded Reading, or (None, error message)."""
+    measured_at = parse_measured_at(reading.date, reading.time)
+    if measured_at is None:
+        return None, 'Invalid date or time, expected YYYY-MM-DD and HH:MM[:SS]'
+    try:
+        reading_key = idempotency.make_key(reading.reading_key, reading.device_id, reading.seq)
+    except ValueError as e:
+        return None, str(e)
+    return (reading.ph_value, reading.temperature, reading.turbidity,
+            reading.location, reading.time, reading.date, measured_at, reading_key), None
+
+
+def validate_reading(data):
+    """
+    Validate and normalize one reading payload (a dict).
+    Returns (row, None) where row is a tuple in INSERT_COLUMNS order without
+    location_id, or (None, error message).
+    """
+    try:
+        reading = msgspec.convert(data, Reading, strict=False)
+    except msgspec.ValidationError as e:
+        return None, str(e)
+    return _to_row(reading)
+
+
+def decode_reading(body):
+    """Decode and validate one reading from a JSON body. Same result shape as validate_reading."""
+    try:
+        reading = _reading_decoder.decode(body)
+    except msgspec.ValidationError as e:
+        return None, str(e)
+    except msgspec.DecodeError as e:
+        return None, f'Invalid JSON: {e}'
+    return _to_row(reading)
+
+
+def decode_batch(body, content_type=''):
+    """
+    Decode and validate a batch ingest body into a list of (row, error)
+    entries. Accepts a JSON array of readings, an object with a "readings"
+    array, or NDJSON. A valid body is decoded in a single typed pass; when
+    any reading fails, readings are validated one by one so each gets its
+    own error. Raises ValueError when the body as a whole cannot be decoded.
+    """
+    if 'ndjson' in content_type or 'jsonlines' in content_type:
+        text = body if isinstance(body, bytes) else body.encode('utf-8')
+        return [decode_reading(line) for line in text.splitlines() if line.strip()]
+
+    try:
+        decoded = _batch_decoder.decode(body)
+        readings = decoded.readings if isinstance(decoded, ReadingBatch) else decoded
+        return [_to_row(reading) for reading in readings]
+    except msgspec.ValidationError:
+        pass
+    except msgspec.DecodeError as e:
+        raise ValueError(str(e))
+
+    payload = msgspec.json.decode(body)
+    if isinstance(payload, dict):
+        payload = payload.get('readings')
+    if not isinstance(payload, list):
+        raise ValueError('Body must be a JSON array of readings, an object with a "readings" array, or NDJSON')
+    return [validate_reading(item) for item in payload]
+
+
+def consecutive_ids(cursor):
+    """
+    True when InnoDB gives the rows of one multi-row INSERT consecutive ids:
+    innodb_autoinc_lock_mode 0 or 1 and auto_increment_increment 1. MySQL 8
+    defaults to lock mode 2, where concurrent inserts interleave their ids.
+    Checked once per process.
+    """
+    global _consecutive_ids
+    if _consecutive_ids is None:
+        cursor.execute("SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment")
+        row = cursor.fetchone()
+        if isinstance(row, dict):
+            row = list(row.values())
+        _consecutive_ids = int(row[0]) in (0, 1) and int(row[1]) == 1
+        if not _consecutive_ids:
+            logger.info(
+                f"innodb_autoinc_lock_mode={row[0]}, auto_increment_increment={row[1]}: "
+                "reading ids are read back by reading key"
+            )
+    return _consecutive_ids
+
+
+def _with_server_keys(chunk):
+    """
+    The chunk with a reading_key generated for each unkeyed row, unique to
+    this statement, so the row's id can be read back like a keyed row's.
+    """
+    prefix = f'srv-{uuid.uuid4().hex}-'
+    key_index = INSERT_COLUMNS.index('reading_key')
+    return [
+        row if row[key_index] else row[:key_index] + (f'{prefix}{position}',) + row[key_index + 1:]
+        for position, row in enumerate(chunk)
+    ]
+
+
+def insert_readings(cursor, rows, chunk_size=INSERT_CHUNK_SIZE, table='sensor_data'):
+    """
+    Insert validated rows with multi-row INSERT statements.
+    Does not commit. Returns the new ids in input order. Unless
+    consecutive_ids holds, ids are read back by (reading_key, measured_at);
+    unkeyed rows are then stored with a key generated here.
+    """
+    ids = []
+    columns = ', '.join(INSERT_COLUMNS)
+    row_placeholder = '(' + ', '.join(['%s'] * len(INSERT_COLUMNS)) + ')'
+    consecutive = consecutive_ids(cursor) if rows else True
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        # A single row's id is always lastrowid
+        sequential = consecutive or len(chunk) == 1
+        if not sequential:
+            chunk = _with_server_keys(chunk)
+
+        placeholders = ', '.join([row_placeholder] * len(chunk))
+        params = [value for row in chunk for value in row]
+        cursor.execute(f"INSERT INTO {table} ({columns}) VALUES {placeholders}", params)
+        if sequential:
+            first_id = cursor.lastrowid
+            ids.extend(range(first_id, first_id + len(chunk)))
+        else:
+            # idempotency.split leaves one row per key, so each key finds its own row
+            keys = [idempotency.key_of(row) for row in chunk]
+            found = idempotency.load(cursor, keys, table=table)
+            ids.extend(found[key] for key in keys)
+    return ids
+
+
+def _write_readings(conn, rows):
+    """
+    Insert the rows not already stored, update the rollups and alert state
+    for them and commit. Returns (ids, fresh, alert_events), see
+    idempotency.split for ids and fresh.
+    """
+    cursor = conn.cursor()
+    try:
+        ids, fresh = idempotency.split(cursor, rows)
+        fresh_rows = [rows[index] for index in fresh]
+        new_ids = insert_readings(cursor, fresh_rows)
+        alert_events = []
+        if fresh_rows:
+            rollups.apply_rows(cursor, fresh_rows)
+            alert_events = alerts.evaluate(cursor, fresh_rows, new_ids)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return idempotency.assign(rows, ids, fresh, new_ids), fresh, alert_events
+
+
+def save_readings(conn, rows):
+    """
+    Resolve the rows' locations, insert them, update the rollups and alert
+    state and commit, all in one transaction. Every write path to
+    sensor_data should go through here. Rows whose reading_key is already
+    stored are skipped. Returns the ids in input order, the existing id for
+    skipped rows.
+    """
+    validated = rows
+    rows = locations.resolve_rows(conn, validated)
+    try:
+        ids, fresh, alert_events = _write_readings(conn, rows)
+    except MySQLdb.IntegrityError as e:
+        if e.args[0] != ER_DUP_ENTRY:
+            raise
+        # A concurrent writer committed one of the keys after our lookup; this time it is found.
+        # The rollback also undid any location created for these rows, so resolve them again
+        rows = locations.resolve_rows(conn, validated)
+        ids, fresh, alert_events = _write_readings(conn, rows)
+    idempotency.remember(rows, ids)
+
+    alerts.log_events(alert_events)
+
+    if _listeners:
+        now = datetime.now().replace(microsecond=0)
+        inserted = []
+        for index in fresh:
+            reading = dict(zip(INSERT_COLUMNS, rows[index]), id=ids[index], created_at=now, updated_at=now)
+            inserted.append(reading)
+        _notify('insert', [], inserted)
+    return ids
+
+
+def fetch_reading(cursor, reading_id):
+    """Return one reading as a dict keyed by READ_COLUMNS, or None."""
+    cursor.execute(f"SELECT {', '.join(READ_COLUMNS)} FROM sensor_data WHERE id = %s", (reading_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    if isinstance(row, dict):
+        return row
+    return dict(zip(READ_COLUMNS, row))
+
+
+def _bucket_keys(readings):
+    return [(reading['location'], reading['measured_at']) for reading in readings if reading]
+
+
+def update_reading(conn, reading_id, changes):
+    """
+    Apply {column: value} changes to one reading, keeping measured_at, the
+    rollups and the alert state in step, and commit. Returns the number of
+    rows changed.
+    """
+    changes = {field: value for field, value in changes.items() if field in REQUIRED_FIELDS}
+    if not changes:
+        return 0
+    if 'location' in changes:
+        name = str(changes['location'] or '').strip()
+        if not name or len(name) > 255:
+            raise ValueError('Location must be between 1 and 255 characters')
+        changes['location_id'], changes['location'] = locations.resolve(conn, name)
+
+    alert_events = []
+    cursor = conn.cursor()
+    try:
+        before = fetch_reading(cursor, reading_id)
+        if before is None:
+            return 0
+
+        if 'date' in changes or 'time' in changes:
+            changes['measured_at'] = parse_measured_at(
+                changes.get('date', before['date']), changes.get('time', before['time'])
+            )
+
+        assignments = ', '.join(f"{field} = %s" for field in changes)
+        cursor.execute(
+            f"UPDATE sensor_data SET {assignments} WHERE id = %s",
+            list(changes.values()) + [reading_id]
+        )
+        affected_rows = cursor.rowcount
+        after = None
+        if affected_rows:
+            after = fetch_reading(cursor, reading_id)
+            rollups.refresh_buckets(cursor, _bucket_keys([before, after]))
+            alert_events = alerts.reevaluate(cursor, [before, after])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    alerts.log_events(alert_events)
+    if affected_rows:
+        _notify('update', [before], [after] if after else [])
+    return affected_rows
+
+
+def delete_reading(conn, reading_id):
+    """
+    Delete one reading, refresh its rollup buckets and alert state and commit.
+    Returns rows deleted.
+    """
+    alert_events = []
+    cursor = conn.cursor()
+    try:
+        before = fetch_reading(cursor, reading_id)
+        cursor.execute("DELETE FROM sensor_data WHERE id = %s", (reading_id,))
+        affected_rows = cursor.rowcount
+        if affected_rows:
+            rollups.refresh_buckets(cursor, _bucket_keys([before]))
+            alert_events = alerts.reevaluate(cursor, [before])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    alerts.log_events(alert_events)
+
+    if affected_rows and before:
+        idempotency.forget(before)
+        _notify('delete', [before], [])
+    return affected_rows
+
+
+def backfill_measured_at(conn, chunk_size=5000, log=print):
+    """
+    Fill measured_at for existing rows in primary-key chunks.
+    Each chunk is parsed with parse_measured_at and committed on its own so the
+    backfill can be interrupted and resumed. Returns (updated, unparseable).
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT COALESCE(MIN(id), 0), COALESCE(MAX(id), 0) FROM sensor_data WHERE measured_at IS NULL")
+    low, high = cursor.fetchone()
+
+    updated = 0
+    unparseable = 0
+    start = low
+    while start and start <= high:
+        end = start + chunk_size - 1
+        cursor.execute("""
+            SELECT id, date, time FROM sensor_data
+            WHERE id BETWEEN %s AND %s AND measured_at IS NULL
+        """, (start, end))
+        rows = cursor.fetchall()
+
+        pairs = []
+        for row_id, date, time in rows:
+            measured_at = parse_measured_at(date, time)
+            if measured_at is None:
+                unparseable += 1
+                continue
+            pairs.append((row_id, measured_at))
+
+        if pairs:
+            values = ' UNION ALL '.join(['SELECT %s AS id, %s AS measured_at'] * len(pairs))
+            params = [value for pair in pairs for value in pair]
+            cursor.execute(f"""
+                UPDATE sensor_data s
+                JOIN ({values}) v ON s.id = v.id
+                SET s.measured_at = v.measured_at, s.updated_at = s.updated_at
+            """, params)
+            conn.commit()
+            updated += len(pairs)
+
+        log(f"Backfilled ids {start}-{end}: {updated} updated, {unparseable} unparseable")
+        start = end + 1
+
+    cursor.close()
+    return updated, unparseable
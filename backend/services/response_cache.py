@@ -0,0 +1,293 @@
+"""
+Response cache for read endpoints.
+
+Successful responses are cached under the route and its normalized query
+arguments. Every entry also depends on a set of tags ('sensor_data',
+'loc:<location_id>', 'loc:<location_id>|date:<date>'). Locations in query
+arguments are resolved through services.locations, so aliases and other
+spellings share the tags a write to the location bumps. Each tag has a version
+number that is folded into the cache key, and the sensor_data write listener
+bumps the versions of the tags a write touches. Entries for other locations
+and dates stay valid; stale ones are never read again and age out by TTL/LRU.
+
+The store is pluggable:
+    memory  per-process core.cache.TTLCache (default for a single worker)
+    redis   cachelib RedisCache shared by every worker and replica (default
+            when gunicorn runs more than one worker)
+    none    caching disabled
+A per-process store only sees its own worker's writes, so it is never the
+default behind more than one worker.
+"""
+import functools
+import logging
+import os
+import threading
+
+from flask import Response, request
+
+from core.cache import get_cache
+from core.database import get_db
+from services import locations, readings
+
+logger = logging.getLogger('response_cache')
+
+GLOBAL_TAG = 'sensor_data'
+
+
+class MemoryStore:
+    """Entries and tag versions held in this process."""
+
+    name = 'memory'
+
+    def __init__(self, maxsize, ttl):
+        self._entries = get_cache('responses', maxsize=maxsize, ttl=ttl)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value, ttl):
+        self._entries.set(key, value, ttl=ttl)
+
+    def versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisStore:
+    """Entries and tag versions shared through Redis."""
+
+    name = 'redis'
+
+    def __init__(self, url, ttl, prefix='water360:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RESPONSE_CACHE_BACKEND=redis requires the redis package (pip install redis)')
+        from cachelib import RedisCache
+
+        self._client = redis.Redis.from_url(url)
+        self._cache = RedisCache(host=self._client, key_prefix=prefix, default_timeout=ttl)
+
+    def ping(self):
+        return self._client.ping()
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value, ttl):
+        self._cache.set(key, value, timeout=ttl)
+
+    def versions(self, tags):
+        values = self._cache.get_many(*[f'tag:{tag}' for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tags):
+        for tag in tags:
+            self._cache.inc(f'tag:{tag}')
+
+
+class ResponseCache:
+    """Versioned-tag response cache over a store, with per-route hit counters."""
+
+    def __init__(self, store, ttl):
+        self.store = store
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._errors = 0
+        self._invalidations = 0
+
+    def _count(self, route, outcome):
+        with self._lock:
+            counters = self._routes.setdefault(route, {'hits': 0, 'misses': 0})
+            counters[outcome] += 1
+
+    def _key(self, route, args, tags):
+        normalized = '&'.join(f'{name}={value}' for name, value in sorted(args.items(multi=True)))
+        versions = '.'.join(str(version) for version in self.store.versions(tags))
+        return f'resp:{route}?{normalized}#{versions}'
+
+    def lookup(self, route, args, tags):
+        """Return (key, cached entry or None); store errors count as misses."""
+        try:
+            key = self._key(route, args, tags)
+            entry = self.store.get(key)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            logger.warning(f"Response cache lookup failed: {e}")
+            return None, None
+        self._count(route, 'hits' if entry is not None else 'misses')
+        return key, entry
+
+    def store_response(self, key, response, ttl=None):
+        try:
+            self.store.set(key, (response.status_code, response.mimetype, response.get_data()), ttl or self.ttl)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            logger.warning(f"Response cache store failed: {e}")
+
+    def invalidate(self, tags):
+        try:
+            self.store.bump(tags)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            logger.warning(f"Response cache invalidation failed: {e}")
+            return
+        with self._lock:
+            self._invalidations += 1
+
+    def on_write(self, event, before, after):
+        """Listener for services.readings.add_listener."""
+        tags = {GLOBAL_TAG}
+        for row in list(before) + list(after):
+            # Reads of a name that did not resolve yet were tagged UNKNOWN_ID;
+            # the write may have just created that location
+            for location_id in (row.get('location_id'), locations.UNKNOWN_ID):
+                tags.add(f'loc:{location_id}')
+                tags.add(f'loc:{location_id}|date:{row.get("date")}')
+        self.invalidate(sorted(tags))
+
+    def stats(self):
+        with self._lock:
+            routes = {}
+            hits = misses = 0
+            for route, counters in self._routes.items():
+                lookups = counters['hits'] + counters['misses']
+                routes[route] = {**counters, 'hit_ratio': round(counters['hits'] / lookups, 4) if lookups else None}
+                hits += counters['hits']
+                misses += counters['misses']
+            return {
+                'backend': self.store.name,
+                'ttl': self.ttl,
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': round(hits / (hits + misses), 4) if hits + misses else None,
+                'invalidations': self._invalidations,
+                'errors': self._errors,
+                'routes': routes,
+            }
+
+
+_response_cache = None
+_init_lock = threading.Lock()
+
+
+def default_backend():
+    """redis behind more than one gunicorn worker (see gunicorn.conf.py), else memory."""
+    return 'redis' if int(os.getenv('GUNICORN_WORKERS', 1)) > 1 else 'memory'
+
+
+def get_response_cache():
+    """Return the process-wide ResponseCache, or None when disabled."""
+    global _response_cache
+    if _response_cache is None:
+        backend = os.getenv('RESPONSE_CACHE_BACKEND', default_backend()).lower()
+        if backend == 'none':
+            return None
+        with _init_lock:
+            if _response_cache is None:
+                ttl = int(os.getenv('RESPONSE_CACHE_TTL', 30))
+                if backend == 'redis':
+                    store = RedisStore(os.getenv('RESPONSE_CACHE_REDIS_URL', 'redis://localhost:6379/0'), ttl)
+                else:
+                    store = MemoryStore(int(os.getenv('RESPONSE_CACHE_SIZE', 2048)), ttl)
+                _response_cache = ResponseCache(store, ttl)
+                readings.add_listener(_response_cache.on_write)
+    return _response_cache
+
+
+def init_response_cache(app):
+    """Create the cache at startup so this process invalidates on its own writes."""
+    cache = get_response_cache()
+    if cache is None:
+        return
+    app.logger.info(f"Response cache enabled ({cache.store.name}, ttl {cache.ttl}s)")
+    if hasattr(cache.store, 'ping'):
+        try:
+            cache.store.ping()
+        except Exception as e:
+            # Lookups fail and count as misses until Redis is reachable
+            app.logger.warning(f"Response cache store is unreachable: {e}")
+
+
+def get_response_cache_stats():
+    cache = get_response_cache()
+    return cache.stats() if cache is not None else {'backend': 'none'}
+
+
+def invalidate_locations(location_ids, dates=()):
+    """
+    Invalidate every cached response for the locations on the given dates,
+    and those depending on all readings, e.g. after locations are merged.
+    """
+    cache = get_response_cache()
+    if cache is None:
+        return
+    tags = {GLOBAL_TAG}
+    for location_id in location_ids:
+        tags.add(f'loc:{location_id}')
+        tags.update(f'loc:{location_id}|date:{date}' for date in dates)
+    cache.invalidate(sorted(tags))
+
+
+def location_tags(param='location', date_param=None):
+    """Tag function for responses scoped to the location(s) in a query argument."""
+    def tags(args):
+        names = [value for value in (args.get(param) or '').split(',') if value.strip()]
+        cursor = get_db().cursor()
+        try:
+            location_ids = sorted({locations.location_id(cursor, name) for name in names})
+        finally:
+            cursor.close()
+        if date_param and args.get(date_param):
+            return [f'loc:{location_id}|date:{args.get(date_param)}' for location_id in location_ids]
+        return [f'loc:{location_id}' for location_id in location_ids]
+    return tags
+
+
+def global_tags(args):
+    """Tag function for responses that depend on every reading."""
+    return [GLOBAL_TAG]
+
+
+def cached_response(tags, ttl=None):
+    """
+    Cache successful GET responses of a view. tags(request.args) returns the
+    tags the response depends on. Apply below the auth decorator so
+    authentication still runs on every request.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_response_cache()
+            if cache is None:
+                return view(*args, **kwargs)
+
+            key, entry = cache.lookup(request.path, request.args, tags(request.args))
+            if entry is not None:
+                status, mimetype, body = entry
+                response = Response(body, status=status, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            result = view(*args, **kwargs)
+            response = result[0] if isinstance(result, tuple) else result
+            status = result[1] if isinstance(result, tuple) and len(result) > 1 else None
+            if status is not None:
+                response.status_code = status
+            if key is not None and response.status_code == 200 and not response.is_streamed:
+                cache.store_response(key, response, ttl)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
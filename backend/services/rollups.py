@@ -0,0 +1,192 @@
+"""
+Hourly and daily rollups of sensor_data.
+
+Rollup rows hold count, sum, min, max and sum of squares per metric for one
+location and bucket, so averages, extremes and standard deviations over any
+range can be read without scanning raw readings. Inserts update the rollups
+incrementally in the same transaction; updates and deletes recompute the
+affected buckets from sensor_data.
+"""
+import logging
+from datetime import timedelta
+
+logger = logging.getLogger('rollups')
+
+METRICS = ('ph_value', 'temperature', 'turbidity')
+
+HOURLY_TABLE = 'sensor_rollup_hourly'
+DAILY_TABLE = 'sensor_rollup_daily'
+
+# Position of each metric and of location/measured_at in INSERT_COLUMNS rows
+_METRIC_INDEX = {'ph_value': 0, 'temperature': 1, 'turbidity': 2}
+_LOCATION_INDEX = 3
+_MEASURED_AT_INDEX = 6
+
+_STAT_COLUMNS = ['reading_count'] + [
+    f'{metric}_{stat}' for metric in METRICS for stat in ('sum', 'min', 'max', 'sumsq')
+]
+
+
+def hour_start(moment):
+    """Truncate a datetime to the start of its hour."""
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(moment):
+    """Truncate a datetime to midnight."""
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _empty_bucket():
+    bucket = {'reading_count': 0}
+    for metric in METRICS:
+        bucket[f'{metric}_sum'] = 0.0
+        bucket[f'{metric}_min'] = None
+        bucket[f'{metric}_max'] = None
+        bucket[f'{metric}_sumsq'] = 0.0
+    return bucket
+
+
+def aggregate_rows(rows, truncate):
+    """Aggregate INSERT_COLUMNS rows into {(location, bucket_start): stats}."""
+    buckets = {}
+    for row in rows:
+        measured_at = row[_MEASURED_AT_INDEX]
+        if measured_at is None:
+            continue
+        key = (row[_LOCATION_INDEX], truncate(measured_at))
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _empty_bucket()
+        bucket['reading_count'] += 1
+        for metric, index in _METRIC_INDEX.items():
+            value = float(row[index])
+            bucket[f'{metric}_sum'] += value
+            bucket[f'{metric}_sumsq'] += value * value
+            low = bucket[f'{metric}_min']
+            high = bucket[f'{metric}_max']
+            bucket[f'{metric}_min'] = value if low is None or value < low else low
+            bucket[f'{metric}_max'] = value if high is None or value > high else high
+    return buckets
+
+
+def _merge_statement(table, bucket_count):
+    columns = ['location', 'bucket_start'] + _STAT_COLUMNS
+    row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    updates = ['reading_count = reading_count + VALUES(reading_count)']
+    for metric in METRICS:
+        updates.append(f'{metric}_sum = {metric}_sum + VALUES({metric}_sum)')
+        updates.append(f'{metric}_sumsq = {metric}_sumsq + VALUES({metric}_sumsq)')
+        updates.append(f'{metric}_min = LEAST(COALESCE({metric}_min, VALUES({metric}_min)), VALUES({metric}_min))')
+        updates.append(f'{metric}_max = GREATEST(COALESCE({metric}_max, VALUES({metric}_max)), VALUES({metric}_max))')
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"VALUES {', '.join([row_placeholder] * bucket_count)} "
+        f"ON DUPLICATE KEY UPDATE {', '.join(updates)}"
+    )
+
+
+def apply_rows(cursor, rows):
+    """
+    Merge newly inserted rows into the hourly and daily rollups.
+    Runs inside the caller's transaction and does not commit.
+    """
+    for table, truncate in ((HOURLY_TABLE, hour_start), (DAILY_TABLE, day_start)):
+        buckets = aggregate_rows(rows, truncate)
+        if not buckets:
+            continue
+        params = []
+        # Sorted so concurrent writers lock bucket rows in the same order
+        for (location, bucket_start), stats in sorted(buckets.items()):
+            params.extend([location, bucket_start] + [stats[column] for column in _STAT_COLUMNS])
+        cursor.execute(_merge_statement(table, len(buckets)), params)
+
+
+def _rebuild_select(truncate_sql):
+    aggregates = ['COUNT(*)']
+    for metric in METRICS:
+        aggregates.extend([
+            f'SUM({metric})', f'MIN({metric})', f'MAX({metric})', f'SUM({metric} * {metric})'
+        ])
+    return f"""
+        SELECT location, {truncate_sql} AS bucket, {', '.join(aggregates)}
+        FROM sensor_data
+        WHERE measured_at >= %s AND measured_at < %s {{location_filter}}
+        GROUP BY location, bucket
+    """
+
+
+_HOUR_SQL = "DATE_FORMAT(measured_at, '%%Y-%%m-%%d %%H:00:00')"
+_DAY_SQL = "DATE(measured_at)"
+
+
+def rebuild_range(cursor, start, end, location=None):
+    """
+    Recompute hourly and daily rollups for [start, end) from sensor_data.
+    start and end should fall on day boundaries so daily rows are complete.
+    """
+    location_filter = 'AND location = %s' if location else ''
+    columns = ', '.join(['location', 'bucket_start'] + _STAT_COLUMNS)
+    for table, truncate_sql in ((HOURLY_TABLE, _HOUR_SQL), (DAILY_TABLE, _DAY_SQL)):
+        params = [start, end] + ([location] if location else [])
+        cursor.execute(
+            f"DELETE FROM {table} WHERE bucket_start >= %s AND bucket_start < %s {location_filter}",
+            params
+        )
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) " +
+            _rebuild_select(truncate_sql).format(location_filter=location_filter),
+            params
+        )
+
+
+def refresh_buckets(cursor, keys):
+    """
+    Recompute the day (and its hours) for each (location, measured_at) key.
+    Used after updates and deletes, where sums can be adjusted but minima and
+    maxima cannot. Does not commit.
+    """
+    days = {(location, day_start(measured_at)) for location, measured_at in keys
+            if location and measured_at is not None}
+    for location, day in sorted(days):
+        rebuild_range(cursor, day, day + timedelta(days=1), location=location)
+
+
+def merge_location(cursor, old, new, start, end):
+    """
+    Drop old's rollups and rebuild new's for the days from start to end, after
+    old's readings were renamed to new. Does not commit.
+    """
+    for table in (HOURLY_TABLE, DAILY_TABLE):
+        cursor.execute(f"DELETE FROM {table} WHERE location = %s", (old,))
+    if start is not None and end is not None:
+        rebuild_range(cursor, day_start(start), day_start(end) + timedelta(days=1), location=new)
+
+
+def backfill(conn, since=None, until=None, log=print):
+    """Rebuild rollups one day at a time, committing after each day."""
+    cursor = conn.cursor()
+    if since is None or until is None:
+        cursor.execute("SELECT MIN(measured_at), MAX(measured_at) FROM sensor_data")
+        low, high = cursor.fetchone()
+        if low is None:
+            cursor.close()
+            log("No readings with measured_at; nothing to backfill")
+            return 0
+        since = since or day_start(low)
+        until = until or day_start(high) + timedelta(days=1)
+
+    day = day_start(since)
+    days = 0
+    while day < until:
+        rebuild_range(cursor, day, day + timedelta(days=1))
+        conn.commit()
+        days += 1
+        if days % 30 == 0:
+            log(f"Rebuilt rollups through {day:%Y-%m-%d}")
+        day += timedelta(days=1)
+
+    cursor.close()
+    log(f"Rebuilt rollups for {days} day(s)")
+    return days
+
@@ -0,0 +1,125 @@
+"""
+Dashboard statistics engine.
+
+Computes count, average, minimum and maximum (with the location and
+timestamp of the reading that produced them) for every metric over a time
+window in a single SQL statement, instead of one query per statistic.
+
+The window is measured_at >= now - ROLLING_WINDOW_HOURS, the same rows the
+in-process rolling window (services.window) holds.
+"""
+import os
+from datetime import datetime, timedelta
+
+from services.readings import READ_COLUMNS
+
+METRICS = ('ph_value', 'temperature', 'turbidity')
+
+WINDOW_HOURS = float(os.getenv('ROLLING_WINDOW_HOURS', 24))
+
+# How MySQL renders a DATETIME in CONCAT, used for the *_timestamp fields
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# GROUP_CONCAT sorted by the metric keeps the extreme reading first; the
+# result may be truncated at group_concat_max_len but the prefix survives.
+_ARG_EXPR = (
+    "SUBSTRING_INDEX(GROUP_CONCAT(CONCAT_WS('\\t', location, measured_at) "
+    "ORDER BY {metric} {direction}, id DESC SEPARATOR '\\n'), '\\n', 1)"
+)
+
+
+def _stats_query(window_sql):
+    columns = ['COUNT(*) AS reading_count']
+    for metric in METRICS:
+        columns.extend([
+            f'AVG({metric}) AS {metric}_avg',
+            f'MIN({metric}) AS {metric}_min',
+            f'MAX({metric}) AS {metric}_max',
+            _ARG_EXPR.format(metric=metric, direction='ASC') + f' AS {metric}_min_at',
+            _ARG_EXPR.format(metric=metric, direction='DESC') + f' AS {metric}_max_at',
+        ])
+    return f"SELECT {', '.join(columns)} FROM sensor_data WHERE {window_sql}"
+
+
+LAST_24_HOURS_QUERY = _stats_query('measured_at >= %s')
+
+
+def window_cutoff(now=None):
+    """Start of the trailing window."""
+    return (now or datetime.now()) - timedelta(hours=WINDOW_HOURS)
+
+
+def recent_readings(cursor):
+    """READ_COLUMNS rows in the trailing window, newest first."""
+    cursor.execute(f"""
+        SELECT {', '.join(READ_COLUMNS)}
+        FROM sensor_data
+        WHERE measured_at >= %s
+        ORDER BY measured_at DESC, id DESC
+    """, (window_cutoff(),))
+    return cursor.fetchall()
+
+
+def _split_at(value):
+    if not value:
+        return None, None
+    location, _, timestamp = value.partition('\t')
+    return location, timestamp
+
+
+def window_stats(conn, query=LAST_24_HOURS_QUERY, params=None):
+    """
+    Run the single-statement stats query and return
+    {'reading_count': n, 'metrics': {metric: {...}}}. params default to the
+    cutoff of the trailing window.
+    """
+    cursor = conn.cursor()
+    cursor.execute(query, params if params is not None else (window_cutoff(),))
+    columns = [desc[0] for desc in cursor.description]
+    row = dict(zip(columns, cursor.fetchone()))
+    cursor.close()
+
+    metrics = {}
+    for metric in METRICS:
+        min_location, min_timestamp = _split_at(row[f'{metric}_min_at'])
+        max_location, max_timestamp = _split_at(row[f'{metric}_max_at'])
+        metrics[metric] = {
+            'avg': float(row[f'{metric}_avg']) if row[f'{metric}_avg'] is not None else None,
+            'min': float(row[f'{metric}_min']) if row[f'{metric}_min'] is not None else None,
+            'max': float(row[f'{metric}_max']) if row[f'{metric}_max'] is not None else None,
+            'min_location': min_location,
+            'min_timestamp': min_timestamp,
+            'max_location': max_location,
+            'max_timestamp': max_timestamp,
+        }
+    return {'reading_count': int(row['reading_count'] or 0), 'metrics': metrics}
+
+
+def _highest(metric_stats):
+    if metric_stats['max'] is None:
+        return None
+    return {
+        'value': metric_stats['max'],
+        'location': metric_stats['max_location'] or '',
+        'timestamp': metric_stats['max_timestamp'] or ''
+    }
+
+
+def format_dashboard_stats(stats):
+    """Shape window_stats output as the /dashboard/stats response body."""
+    metrics = stats['metrics']
+    return {
+        'status': 'success',
+        'total_readings_24h': stats['reading_count'],
+        'highest_ph': _highest(metrics['ph_value']),
+        'highest_temp': _highest(metrics['temperature']),
+        'highest_turbidity': _highest(metrics['turbidity']),
+        'avg_ph': metrics['ph_value']['avg'] or 0,
+        'avg_temp': metrics['temperature']['avg'] or 0,
+        'avg_turbidity': metrics['turbidity']['avg'] or 0
+    }
+
+
+def dashboard_stats(conn):
+    """Return the /dashboard/stats response body for the last 24 hours."""
+    return format_dashboard_stats(window_stats(conn))
@@ -0,0 +1,316 @@
+"""
+Time-bucket aggregation of sensor readings.
+
+One query path for every aggregated series: bucket widths from one minute to
+one calendar month, any of the metrics, several locations, and the
+aggregates avg, min, max, count, stddev and percentiles (p50, p95, p99.9,
+...). A planner picks the cheapest source that answers exactly:
+
+    daily    sensor_rollup_daily, when buckets are whole days or months and
+             the range starts and ends at midnight
+    hourly   sensor_rollup_hourly, when buckets are whole hours and the range
+             starts and ends on the hour
+    raw      sensor_data otherwise, and whenever a percentile is requested,
+             since the rollups keep no distribution
+
+Rollups are updated in the insert transaction, so every source returns the
+same numbers. stddev is the population standard deviation (STDDEV_POP); from
+the rollups it is derived from the sum of squares. Fixed-width buckets are
+counted from Monday 1970-01-05, so day buckets start at midnight and week
+buckets on Monday. Buckets without readings are left out.
+"""
+import os
+import re
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from services import locations
+from services.rollups import DAILY_TABLE, HOURLY_TABLE, METRICS
+
+MAX_BUCKETS = int(os.getenv('TIMESERIES_MAX_BUCKETS', 10000))
+MAX_RAW_ROWS = int(os.getenv('TIMESERIES_MAX_RAW_ROWS', 1000000))
+
+SOURCES = ('auto', 'daily', 'hourly', 'raw')
+AGGREGATES = ('avg', 'min', 'max', 'count', 'stddev')
+
+# Calendar-month buckets; every other width is a number of seconds
+MONTH = 'month'
+
+_UNIT_SECONDS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+_BUCKET = re.compile(r'^(\d+)(m|h|d|w|mo)$')
+_PERCENTILE = re.compile(r'^p(\d{1,2}(?:\.\d+)?)$')
+
+_ORIGIN = datetime(1970, 1, 5)
+_ORIGIN_SQL = "'1970-01-05'"
+
+_GRAIN = {'hourly': 3600, 'daily': 86400}
+_TABLES = {'hourly': HOURLY_TABLE, 'daily': DAILY_TABLE}
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def parse_bucket(spec):
+    """
+    Width in seconds for '1m', '15m', '1h', '6h', '1d', '1w', or MONTH for
+    '1mo'. Raises ValueError outside one minute to one month.
+    """
+    match = _BUCKET.match((spec or '').strip())
+    if not match or int(match.group(1)) < 1:
+        raise ValueError('Invalid bucket, expected e.g. 1m, 15m, 1h, 1d, 1w or 1mo')
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == 'mo':
+        if count != 1:
+            raise ValueError('Bucket must be at most 1mo')
+        return MONTH
+    width = count * _UNIT_SECONDS[unit]
+    if width > 28 * 86400:
+        raise ValueError('Bucket must be at most 4w, or 1mo')
+    return width
+
+
+def parse_aggregates(spec):
+    """Aggregate names from a comma-separated list. Raises ValueError for unknown ones."""
+    names = [name.strip().lower() for name in (spec or 'avg').split(',') if name.strip()]
+    for name in names:
+        match = _PERCENTILE.match(name)
+        if name not in AGGREGATES and not (match and 0 < float(match.group(1)) < 100):
+            raise ValueError(f"Unknown aggregate {name!r}, expected {', '.join(AGGREGATES)} or p1-p99.9")
+    return list(dict.fromkeys(names))
+
+
+def parse_metrics(spec):
+    """Metric names from a comma-separated list, all of them by default."""
+    names = [name.strip() for name in (spec or ','.join(METRICS)).split(',') if name.strip()]
+    for name in names:
+        if name not in METRICS:
+            raise ValueError(f"Unknown metric {name!r}, expected {', '.join(METRICS)}")
+    return list(dict.fromkeys(names))
+
+
+def _is_percentile(name):
+    return name.startswith('p')
+
+
+def _aligned(moment, grain):
+    return (moment - _ORIGIN).total_seconds() % grain == 0
+
+
+def bucket_count(width, start, end):
+    """Buckets per location between start and end."""
+    if width == MONTH:
+        return (end.year - start.year) * 12 + end.month - start.month + 1
+    return int((end - start).total_seconds() // width) + 1
+
+
+def plan(width, aggregates, start, end, source='auto'):
+    """
+    The source answering this query: 'daily', 'hourly' or 'raw'. A rollup
+    qualifies when its buckets nest in the requested ones and the range
+    covers whole rollup buckets. Raises ValueError when a forced source
+    cannot answer exactly.
+    """
+    if source not in SOURCES:
+        raise ValueError(f"Unknown source {source!r}, expected {', '.join(SOURCES)}")
+
+    def exact(rollup):
+        grain = _GRAIN[rollup]
+        if any(_is_percentile(name) for name in aggregates):
+            return False
+        if width != MONTH and width % grain:
+            return False
+        return _aligned(start, grain) and _aligned(end, grain)
+
+    if source == 'auto':
+        return next((rollup for rollup in ('daily', 'hourly') if exact(rollup)), 'raw')
+    if source != 'raw' and not exact(source):
+        raise ValueError(
+            f'The {source} rollup cannot answer this query: it has no percentiles and '
+            f'needs buckets and a start/end aligned to whole {"days" if source == "daily" else "hours"}'
+        )
+    return source
+
+
+def _bucket_sql(width, column):
+    if width == MONTH:
+        return f"YEAR({column}) * 12 + MONTH({column}) - 1"
+    return f"TIMESTAMPDIFF(SECOND, {_ORIGIN_SQL}, {column}) DIV {int(width)}"
+
+
+def bucket_start(width, key):
+    """The start of bucket number key, as computed by the bucket SQL."""
+    key = int(key)
+    if width == MONTH:
+        return datetime(key // 12, key % 12 + 1, 1)
+    return _ORIGIN + timedelta(seconds=key * width)
+
+
+def _rollup_sql(metric, aggregate):
+    count = 'SUM(reading_count)'
+    if aggregate == 'avg':
+        return f'SUM({metric}_sum) / {count}'
+    if aggregate == 'min':
+        return f'MIN({metric}_min)'
+    if aggregate == 'max':
+        return f'MAX({metric}_max)'
+    if aggregate == 'count':
+        return count
+    return (f'SQRT(GREATEST(SUM({metric}_sumsq) / {count} - '
+            f'POW(SUM({metric}_sum) / {count}, 2), 0))')
+
+
+def _raw_sql(metric, aggregate):
+    if aggregate == 'stddev':
+        return f'STDDEV_POP({metric})'
+    if aggregate == 'count':
+        return f'COUNT({metric})'
+    return f'{aggregate.upper()}({metric})'
+
+
+def _grouped(cursor, source, width, names, ids, columns, start, end):
+    """Aggregate in SQL. Returns (group keys, {column: values})."""
+    if source == 'raw':
+        group, table, column = 'location_id', 'sensor_data', 'measured_at'
+        keys, to_sql = ids, _raw_sql
+    else:
+        group, table, column = 'location', _TABLES[source], 'bucket_start'
+        keys, to_sql = names, _rollup_sql
+    extra = '' if source == 'raw' else 'AND reading_count > 0'
+    cursor.execute(f"""
+        SELECT {group}, {_bucket_sql(width, column)} AS bucket,
+               {', '.join(f'{to_sql(metric, aggregate)} AS {metric}_{aggregate}' for metric, aggregate in columns)}
+        FROM {table}
+        WHERE {group} IN ({', '.join(['%s'] * len(keys))})
+          AND {column} >= %s AND {column} < %s {extra}
+        GROUP BY {group}, bucket
+        ORDER BY {group}, bucket
+    """, list(keys) + [start, end])
+
+    rows = [tuple(row.values()) if isinstance(row, dict) else row for row in cursor.fetchall()]
+    values = {}
+    for offset, (metric, aggregate) in enumerate(columns, start=2):
+        convert = int if aggregate == 'count' else float
+        values[(metric, aggregate)] = [None if row[offset] is None else convert(row[offset]) for row in rows]
+    return [(row[0], row[1]) for row in rows], values
+
+
+def _percentiles(sorted_values, starts, counts, pct):
+    """Linearly interpolated percentile of each group, as numpy's default method."""
+    position = starts + (counts - 1) * (pct / 100.0)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, starts + counts - 1)
+    fraction = position - low
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * fraction
+
+
+def _from_readings(cursor, width, ids, metrics, aggregates, start, end):
+    """
+    Aggregate raw readings in NumPy, for percentiles. Returns the same shape
+    as _grouped. Raises ValueError above MAX_RAW_ROWS readings.
+    """
+    cursor.execute(f"""
+        SELECT location_id, {_bucket_sql(width, 'measured_at')} AS bucket, {', '.join(metrics)}
+        FROM sensor_data
+        WHERE location_id IN ({', '.join(['%s'] * len(ids))})
+          AND measured_at >= %s AND measured_at < %s
+        LIMIT {MAX_RAW_ROWS + 1}
+    """, list(ids) + [start, end])
+    rows = [tuple(row.values()) if isinstance(row, dict) else row for row in cursor.fetchall()]
+    if len(rows) > MAX_RAW_ROWS:
+        raise ValueError(f'More than {MAX_RAW_ROWS} readings for percentiles; narrow the range or locations')
+    if not rows:
+        return [], {(metric, aggregate): [] for metric in metrics for aggregate in aggregates}
+
+    table = np.array(rows, dtype=np.float64)
+    order = np.lexsort((table[:, 1], table[:, 0]))
+    table = table[order]
+    boundary = np.flatnonzero((np.diff(table[:, 0]) != 0) | (np.diff(table[:, 1]) != 0)) + 1
+    starts = np.concatenate(([0], boundary))
+    counts = np.diff(np.append(starts, len(table)))
+    group_ids = np.repeat(np.arange(len(starts)), counts)
+
+    values = {}
+    for offset, metric in enumerate(metrics, start=2):
+        column = table[:, offset]
+        mean = np.add.reduceat(column, starts) / counts
+        for aggregate in aggregates:
+            if aggregate == 'avg':
+                result = mean
+            elif aggregate == 'min':
+                result = np.minimum.reduceat(column, starts)
+            elif aggregate == 'max':
+                result = np.maximum.reduceat(column, starts)
+            elif aggregate == 'count':
+                result = counts
+            elif aggregate == 'stddev':
+                result = np.sqrt(np.add.reduceat((column - mean[group_ids]) ** 2, starts) / counts)
+            else:
+                # Sorted by group, then by value
+                ranked = column[np.lexsort((column, group_ids))]
+                result = _percentiles(ranked, starts, counts, float(aggregate[1:]))
+            values[(metric, aggregate)] = result.tolist()
+    keys = [(int(table[index, 0]), int(table[index, 1])) for index in starts]
+    return keys, values
+
+
+def query(cursor, location_names, metrics, aggregates, width, start, end, source='auto'):
+    """
+    Aggregate the readings of location_names in [start, end) into buckets.
+    Returns {'source': ..., 'series': {location: {'time': [...],
+    '<metric>_<aggregate>': [...]}}} with one column per metric and
+    aggregate, in the columnar layout of the series endpoint. Unknown
+    locations are left out. Raises ValueError for queries that are too large
+    or that a forced source cannot answer.
+    """
+    if end <= start:
+        raise ValueError('end must be after start')
+    if bucket_count(width, start, end) > MAX_BUCKETS:
+        raise ValueError(f'More than {MAX_BUCKETS} buckets per location; use a wider bucket or a shorter range')
+    source = plan(width, aggregates, start, end, source)
+
+    found = {}
+    for name in location_names:
+        resolved = locations.lookup(cursor, name)
+        if resolved is not None:
+            found[resolved[0]] = resolved[1]
+    result = {'source': source, 'series': {}}
+    if not found:
+        return result
+
+    columns = [(metric, aggregate) for metric in metrics for aggregate in aggregates]
+    if source == 'raw' and any(_is_percentile(name) for name in aggregates):
+        keys, values = _from_readings(cursor, width, list(found), metrics, aggregates, start, end)
+    else:
+        keys, values = _grouped(cursor, source, width, list(found.values()), list(found), columns, start, end)
+
+    # Raw groups are keyed by location_id, rollups by name (compared case-insensitively)
+    if source == 'raw':
+        names = found
+    else:
+        names = {locations.normalize(name): name for name in found.values()}
+    series = result['series']
+    for index, (group, key) in enumerate(keys):
+        name = names[group if source == 'raw' else locations.normalize(group)]
+        if name not in series:
+            series[name] = {'time': [], **{f'{metric}_{aggregate}': [] for metric, aggregate in columns}}
+        entry = series[name]
+        entry['time'].append(bucket_start(width, key).strftime(TIME_FORMAT))
+        for metric, aggregate in columns:
+            entry[f'{metric}_{aggregate}'].append(values[(metric, aggregate)][index])
+    return result
+
+
+def daily_averages(cursor, metric, location_names, start_date, end_date):
+    """
+    [(location, 'YYYY-MM-DD', average)] of metric for each day in
+    [start_date, end_date] (inclusive date strings), ordered by day.
+    """
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+    series = query(cursor, location_names, [metric], ['avg'], 86400, start, end)['series']
+    rows = [
+        (location, moment[:10], value)
+        for location, columns in series.items()
+        for moment, value in zip(columns['time'], columns[f'{metric}_avg'])
+    ]
+    return sorted(rows, key=lambda row: row[1])
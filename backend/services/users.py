@@ -0,0 +1,58 @@
+"""
+Cached user lookups.
+Authenticated requests resolve their user through here, so steady-state
+traffic reads users from a per-process TTL/LRU cache instead of MySQL. Writes
+to a user must call invalidate_user; other workers see the change once their
+entry expires (USER_CACHE_TTL seconds).
+"""
+import os
+
+import MySQLdb
+
+from core.cache import get_cache
+from core.database import get_db
+
+_cache = get_cache(
+    'users',
+    maxsize=int(os.getenv('USER_CACHE_SIZE', 10000)),
+    ttl=float(os.getenv('USER_CACHE_TTL', 60))
+)
+
+
+def _key(user_id):
+    """The integer user id for a JWT identity, or None when it has none."""
+    # Tokens issued by /register carry a dict identity rather than the bare id
+    if isinstance(user_id, dict):
+        user_id = user_id.get('id')
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def _load(user_id):
+    cursor = get_db().cursor(MySQLdb.cursors.DictCursor)
+    try:
+        cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
+        return cursor.fetchone()
+    finally:
+        cursor.close()
+
+
+def get_user(user_id):
+    """
+    Return the users row for user_id as a dict (a copy the caller may modify),
+    or None when there is no such user.
+    """
+    key = _key(user_id)
+    if key is None:
+        return None
+    user = _cache.get_or_load(key, lambda: _load(key))
+    return dict(user) if user is not None else None
+
+
+def invalidate_user(user_id):
+    """Drop a user from this process's cache after it changes."""
+    key = _key(user_id)
+    if key is not None:
+        _cache.invalidate(key)
@@ -0,0 +1,383 @@
+"""
+In-process rolling window over recent sensor readings.
+
+Holds the readings whose measured_at falls in the trailing window
+(ROLLING_WINDOW_HOURS, 24 by default) so /dashboard/stats, /summary-insights
+and /correlation-data can be answered without a query. Readings are kept as
+compact tuples grouped into one-minute buckets; each bucket caches its count,
+sums and extreme readings, so a query combines at most one entry per minute
+and expiry drops whole buckets. A write only invalidates its own bucket.
+
+The window answers over the same rows and columns as the SQL fallback in
+services.stats (measured_at >= now - ROLLING_WINDOW_HOURS), so toggling
+ROLLING_WINDOW_ENABLED does not change any response.
+
+Each worker has its own copy, kept by a background thread: it seeds the
+window when the worker starts, tails rows created by other workers every
+ROLLING_WINDOW_SYNC_INTERVAL and reloads it every
+ROLLING_WINDOW_RESEED_INTERVAL to pick up their updates and deletes.
+Requests never wait for it; until the seed finishes, or while the window
+holds more than ROLLING_WINDOW_MAX_ROWS readings, they use SQL.
+"""
+import logging
+import math
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from services import readings, stats
+
+logger = logging.getLogger('window')
+
+METRICS = stats.METRICS
+
+MAX_ROWS = int(os.getenv('ROLLING_WINDOW_MAX_ROWS', 100000))
+SYNC_INTERVAL = float(os.getenv('ROLLING_WINDOW_SYNC_INTERVAL', 5))
+RESEED_INTERVAL = float(os.getenv('ROLLING_WINDOW_RESEED_INTERVAL', 300))
+
+# Seconds between attempts while the seed keeps failing
+RETRY_INTERVAL = 5
+
+# Compact reading: (id, measured_at, location_id, location, ph_value, temperature, turbidity)
+_COLUMNS = ('id', 'measured_at', 'location_id', 'location') + METRICS
+_ID, _AT, _LOCATION_ID, _LOCATION = 0, 1, 2, 3
+_METRIC_INDEX = {metric: 4 + position for position, metric in enumerate(METRICS)}
+
+
+def _enabled():
+    return os.getenv('ROLLING_WINDOW_ENABLED', 'false').lower() == 'true'
+
+
+def _compact(row):
+    """A compact reading from a READ_COLUMNS dict or a _COLUMNS tuple."""
+    if isinstance(row, dict):
+        row = tuple(row.get(column) for column in _COLUMNS)
+    return (row[_ID], row[_AT], row[_LOCATION_ID], sys.intern(row[_LOCATION])) + tuple(
+        float(row[index]) for index in _METRIC_INDEX.values()
+    )
+
+
+def _minute(moment):
+    return moment.replace(second=0, microsecond=0)
+
+
+class _Bucket:
+    """The readings of one minute and their aggregates, recomputed after a change."""
+
+    __slots__ = ('readings', '_summary')
+
+    def __init__(self):
+        self.readings = {}
+        self._summary = None
+
+    def changed(self):
+        self._summary = None
+
+    def summary(self):
+        """{metric: (sum, lowest reading, highest reading)}, ties going to the newest id."""
+        if self._summary is None:
+            rows = list(self.readings.values())
+            self._summary = {
+                metric: (
+                    math.fsum(row[index] for row in rows),
+                    min(rows, key=lambda row: (row[index], -row[_ID])),
+                    max(rows, key=lambda row: (row[index], row[_ID])),
+                )
+                for metric, index in _METRIC_INDEX.items()
+            }
+        return self._summary
+
+
+class RollingWindow:
+    """Readings in the trailing span, bucketed by minute for stats queries."""
+
+    def __init__(self, span=timedelta(hours=stats.WINDOW_HOURS), max_rows=MAX_ROWS, clock=datetime.now):
+        self.span = span
+        self.max_rows = max_rows
+        self.clock = clock
+        self._lock = threading.RLock()
+        self._clear()
+        self.seeded_at = None
+        self.synced_at = None
+
+    def _clear(self):
+        self._buckets = {}
+        # id -> bucket start, to find a reading on update or delete
+        self._index = {}
+        self.overflow = False
+
+    @property
+    def ready(self):
+        """True when the window can answer for the SQL fallback."""
+        return self.seeded_at is not None and not self.overflow
+
+    # -- maintenance -----------------------------------------------------
+
+    def cutoff(self, now=None):
+        return (now or self.clock()) - self.span
+
+    def _add(self, reading):
+        if reading[_AT] is None or reading[_ID] is None:
+            return False
+        self._remove(reading[_ID])
+        if len(self._index) >= self.max_rows:
+            if not self.overflow:
+                logger.warning(f"Rolling window is over {self.max_rows} readings; serving from SQL until the next reseed")
+            self.overflow = True
+            return False
+        start = _minute(reading[_AT])
+        bucket = self._buckets.get(start)
+        if bucket is None:
+            bucket = self._buckets[start] = _Bucket()
+        bucket.readings[reading[_ID]] = reading
+        bucket.changed()
+        self._index[reading[_ID]] = start
+        return True
+
+    def _remove(self, reading_id):
+        start = self._index.pop(reading_id, None)
+        if start is None:
+            return False
+        bucket = self._buckets[start]
+        del bucket.readings[reading_id]
+        if bucket.readings:
+            bucket.changed()
+        else:
+            del self._buckets[start]
+        return True
+
+    def _expire(self, now=None):
+        cutoff = self.cutoff(now)
+        first = _minute(cutoff)
+        for start in [start for start in self._buckets if start <= first]:
+            bucket = self._buckets[start]
+            if start < first:
+                expired = list(bucket.readings)
+            else:
+                # The minute the cutoff falls in is partly still in the window
+                expired = [reading_id for reading_id, reading in bucket.readings.items() if reading[_AT] < cutoff]
+            for reading_id in expired:
+                self._remove(reading_id)
+
+    def add(self, rows):
+        """Add or replace readings (READ_COLUMNS dicts); rows outside the window are ignored."""
+        with self._lock:
+            cutoff = self.cutoff()
+            added = 0
+            for row in rows:
+                if row.get('measured_at') is not None and row['measured_at'] >= cutoff:
+                    added += self._add(_compact(row))
+            self._expire()
+            return added
+
+    def remove(self, reading_ids):
+        """Drop readings by id."""
+        with self._lock:
+            return sum(self._remove(reading_id) for reading_id in reading_ids)
+
+    def on_write(self, event, before, after):
+        """Listener for services.readings.add_listener."""
+        if before:
+            self.remove([row['id'] for row in before])
+        if after:
+            self.add(after)
+
+    # -- queries ---------------------------------------------------------
+
+    def _stats(self):
+        count = len(self._index)
+        summaries = [bucket.summary() for bucket in self._buckets.values()]
+        metrics = {}
+        for metric, index in _METRIC_INDEX.items():
+            low = min((summary[metric][1] for summary in summaries),
+                      key=lambda row: (row[index], -row[_ID]), default=None)
+            high = max((summary[metric][2] for summary in summaries),
+                       key=lambda row: (row[index], row[_ID]), default=None)
+            metrics[metric] = {
+                'avg': math.fsum(summary[metric][0] for summary in summaries) / count if count else None,
+                'min': low[index] if low else None,
+                'max': high[index] if high else None,
+                'min_location': low[_LOCATION] if low else None,
+                'min_timestamp': low[_AT].strftime(stats.TIMESTAMP_FORMAT) if low else None,
+                'max_location': high[_LOCATION] if high else None,
+                'max_timestamp': high[_AT].strftime(stats.TIMESTAMP_FORMAT) if high else None,
+            }
+        return {'reading_count': count, 'metrics': metrics}
+
+    def window_stats(self):
+        """Same shape and rows as services.stats.window_stats."""
+        with self._lock:
+            self._expire()
+            return self._stats()
+
+    def extremes(self, metric, kind='max'):
+        """[(value, location)] of every reading tied for the highest or lowest value of metric."""
+        index = _METRIC_INDEX[metric]
+        position = 2 if kind == 'max' else 1
+        with self._lock:
+            self._expire()
+            candidates = [(bucket, bucket.summary()[metric][position][index]) for bucket in self._buckets.values()]
+            if not candidates:
+                return []
+            pick = max if kind == 'max' else min
+            target = pick(value for _, value in candidates)
+            tied = [reading for bucket, value in candidates if value == target
+                    for reading in bucket.readings.values() if reading[index] == target]
+        tied.sort(key=lambda reading: reading[_ID], reverse=True)
+        return [(reading[index], reading[_LOCATION]) for reading in tied]
+
+    def metric_values(self, location_id):
+        """[(temperature, turbidity, ph_value)] for one location, oldest first."""
+        with self._lock:
+            self._expire()
+            selected = [reading for bucket in self._buckets.values()
+                        for reading in bucket.readings.values() if reading[_LOCATION_ID] == location_id]
+        selected.sort(key=lambda reading: (reading[_AT], reading[_ID]))
+        return [(reading[_METRIC_INDEX['temperature']], reading[_METRIC_INDEX['turbidity']],
+                 reading[_METRIC_INDEX['ph_value']]) for reading in selected]
+
+    # -- database --------------------------------------------------------
+
+    def _fetch(self, conn, where, params):
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM sensor_data WHERE {where} LIMIT %s",
+            tuple(params) + (self.max_rows + 1,)
+        )
+        fetched = [_compact(list(row.values()) if isinstance(row, dict) else row) for row in cursor.fetchall()]
+        cursor.close()
+        return fetched
+
+    def seed(self, conn):
+        """Replace the contents with the readings currently in the window."""
+        now = self.clock()
+        fetched = self._fetch(conn, 'measured_at >= %s', (self.cutoff(now),))
+
+        with self._lock:
+            self._clear()
+            for reading in fetched:
+                self._add(reading)
+            self._expire(now)
+            self.seeded_at = self.synced_at = now
+        logger.info(f"Rolling window seeded with {len(self._index)} readings")
+        return len(fetched)
+
+    def sync(self, conn, overlap=timedelta(seconds=60)):
+        """
+        Add readings created by other processes since the last sync.
+        The overlap re-reads recent rows so transactions that committed out of
+        id order are not missed; rows already held are skipped.
+        """
+        now = self.clock()
+        since = (self.synced_at or now) - overlap
+        fetched = self._fetch(conn, 'created_at >= %s AND measured_at >= %s', (since, self.cutoff(now)))
+
+        with self._lock:
+            added = sum(self._add(reading) for reading in fetched if reading[_ID] not in self._index)
+            self._expire()
+            self.synced_at = now
+        return added
+
+    def verify(self, conn, tolerance=1e-4):
+        """
+        Compare the window with the SQL fallback (services.stats.window_stats)
+        over the same cutoff.
+        Returns {'consistent': bool, 'window': ..., 'database': ..., 'differences': [...]}.
+        """
+        with self._lock:
+            now = self.clock()
+            self._expire(now)
+            cutoff = self.cutoff(now)
+            mine = self._stats()
+        database = stats.window_stats(conn, params=(cutoff,))
+
+        differences = []
+        if mine['reading_count'] != database['reading_count']:
+            differences.append(f"reading_count: window {mine['reading_count']} != database {database['reading_count']}")
+        for metric in METRICS:
+            for stat, ours in mine['metrics'][metric].items():
+                theirs = database['metrics'][metric][stat]
+                if isinstance(ours, float) and isinstance(theirs, float):
+                    same = math.isclose(ours, theirs, rel_tol=tolerance, abs_tol=tolerance)
+                else:
+                    same = ours == theirs
+                if not same:
+                    differences.append(f"{metric}.{stat}: window {ours} != database {theirs}")
+
+        return {
+            'consistent': not differences,
+            'cutoff': cutoff.strftime(stats.TIMESTAMP_FORMAT),
+            'window': mine,
+            'database': database,
+            'differences': differences
+        }
+
+
+_window = None
+_window_lock = threading.Lock()
+
+
+def _maintain(window, connect):
+    """Seed the window, then keep it in step with other workers' writes."""
+    next_reseed = 0.0
+    while True:
+        now = time.monotonic()
+        try:
+            conn = connect()
+            try:
+                if window.seeded_at is None or now >= next_reseed:
+                    window.seed(conn)
+                    next_reseed = now + RESEED_INTERVAL if RESEED_INTERVAL > 0 else float('inf')
+                else:
+                    window.sync(conn)
+            finally:
+                conn.close()
+        except Exception:
+            logger.exception("Rolling window refresh failed")
+
+        if window.seeded_at is None:
+            delay = RETRY_INTERVAL
+        elif SYNC_INTERVAL > 0:
+            delay = SYNC_INTERVAL
+        elif RESEED_INTERVAL > 0:
+            delay = max(next_reseed - time.monotonic(), 0)
+        else:
+            return
+        time.sleep(delay)
+
+
+def get_window():
+    """
+    The process-wide RollingWindow, or None when disabled. The first call
+    starts the thread that seeds and refreshes it.
+    """
+    global _window
+    if not _enabled():
+        return None
+    if _window is None:
+        with _window_lock:
+            if _window is None:
+                from core.database import get_db_connection
+
+                window = RollingWindow()
+                readings.add_listener(window.on_write)
+                threading.Thread(target=_maintain, args=(window, get_db_connection),
+                                 name='rolling-window', daemon=True).start()
+                _window = window
+    return _window
+
+
+def current_window():
+    """The window when it can answer queries, or None to fall back to SQL."""
+    window = get_window()
+    if window is None or not window.ready:
+        return None
+    return window
+
+
+def init_window(app):
+    """Start seeding this worker's window in the background."""
+    if get_window() is not None:
+        app.logger.info(f"Rolling window on: {stats.WINDOW_HOURS}h, at most {MAX_ROWS} readings, seeding in the background")
@@ -8,7 +8,16 @@ set -e  # Exit on error
 # Configuration
 APP_DIR="$(dirname "$0")"
 LOG_DIR="$APP_DIR/logs"
+# With more than one worker the response cache defaults to Redis so a write
+# invalidates every worker's entries (RESPONSE_CACHE_REDIS_URL, default
+# redis://localhost:6379/0), and the live feed polls sensor_data every second
+# (SSE_DB_TAIL_INTERVAL) so each worker's streams see every worker's inserts
 WORKERS=4
+# Live feed (SSE) clients each hold a thread for the life of the connection;
+# services/live_feed.py lets them take at most a quarter of THREADS by default.
+# Each worker's MySQL pool defaults to the other three quarters plus 4
+# (core/database.py, 28 here); keep WORKERS x that below max_connections
+THREADS=32
 PORT=5000
 
 # Create log directory if it doesn't exist
@@ -28,8 +37,11 @@ echo "Starting application with Gunicorn..."
 cd "$APP_DIR"
 
 # Run with Gunicorn
-gunicorn --bind 0.0.0.0:$PORT \
+gunicorn --config gunicorn.conf.py \
+         --bind 0.0.0.0:$PORT \
          --workers $WORKERS \
+         --worker-class gthread \
+         --threads $THREADS \
          --log-file "$LOG_DIR/gunicorn.log" \
          --access-logfile "$LOG_DIR/access.log" \
          --error-logfile "$LOG_DIR/error.log" \
@@ -61,24 +61,22 @@ def token_required(f):
         if not payload:
             return jsonify({'error': 'Token is invalid or expired', 'message': 'Authentication required'}), 401
         
-        # Get user from database
-        from core.database import fetch_one
+        # Get user from the per-process user cache
+        from services.users import get_user
         
-        user_id = payload.get('user_id')
-        query = "SELECT id, firstname, lastname, username, email, user_type FROM users WHERE id = %s"
-        user_data = fetch_one(query, (user_id,))
+        user_data = get_user(payload.get('user_id'))
         
         if not user_data:
             return jsonify({'error': 'User not found', 'message': 'Authentication failed'}), 401
         
         # Create user object
         current_user = {
-            'id': user_data[0],
-            'firstname': user_data[1],
-            'lastname': user_data[2],
-            'username': user_data[3],
-            'email': user_data[4],
-            'user_type': user_data[5]
+            'id': user_data['id'],
+            'firstname': user_data['firstname'],
+            'lastname': user_data['lastname'],
+            'username': user_data['username'],
+            'email': user_data['email'],
+            'user_type': user_data['user_type']
         }
         
         return f(current_user, *args, **kwargs)
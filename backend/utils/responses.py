@@ -0,0 +1,13 @@
+"""
+Response helpers.
+Encodes payloads with msgspec instead of jsonify for large result sets.
+"""
+import msgspec
+from flask import Response
+
+_encoder = msgspec.json.Encoder()
+
+
+def msgspec_response(payload, status=200, headers=None):
+    """JSON response for a Struct or plain data, encoded straight to bytes."""
+    return Response(_encoder.encode(payload), status=status, headers=headers, mimetype='application/json')
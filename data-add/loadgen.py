@@ -0,0 +1,319 @@
+"""
+Load generator for the sensor ingestion API.
+
+Sends synthetic readings at a target rate for a fixed duration using asyncio and
+a pooled keep-alive aiohttp session. Arrivals follow an open model: requests
+are scheduled as a Poisson process at --rate regardless of how fast the server
+answers. Latency is measured from each request's scheduled time, so a slow
+server cannot hide its queueing (coordinated omission). When the in-flight
+limit (--concurrency) is reached the arrival is counted as dropped instead of
+delaying the schedule.
+
+Readings go to /api/data/sensor-data/batch in groups of --batch-size when the
+server has that endpoint, and one per request to /api/data/sensor-data
+otherwise.
+
+Requires aiohttp (pip install aiohttp).
+
+Examples:
+    # Against a local stand-in server, no backend or database needed
+    python loadgen.py --stand-in --rate 500 --duration 30 --batch-size 50
+
+    # Against a running backend
+    python loadgen.py --base-url http://localhost:5000 --username admin --password admin123 \\
+        --rate 200 --duration 60 --concurrency 64 --locations nuwara_wewa:5,thisa_wewa:3,kala_wewa:1
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:
+    sys.exit("loadgen.py requires aiohttp: pip install aiohttp")
+
+DEFAULT_LOCATIONS = 'nuwara_wewa,thisa_wewa,kala_wewa'
+
+# (mean, standard deviation, safe min, safe max) per parameter
+PARAMETERS = {
+    'ph_value': (7.5, 0.4, 6.5, 8.5),
+    'temperature': (25.0, 3.0, 0.0, 33.0),
+    'turbidity': (3.0, 0.8, 1.0, 5.0),
+}
+
+
+def parse_locations(spec):
+    """'a:5,b:1,c' -> (['a', 'b', 'c'], [5.0, 1.0, 1.0])"""
+    names, weights = [], []
+    for item in spec.split(','):
+        if not item.strip():
+            continue
+        name, _, weight = item.strip().partition(':')
+        names.append(name)
+        weights.append(float(weight) if weight else 1.0)
+    if not names:
+        raise argparse.ArgumentTypeError('at least one location is required')
+    return names, weights
+
+
+class ReadingFactory:
+    """Synthetic readings with weighted locations and normal or uniform values."""
+
+    def __init__(self, locations, distribution='normal', breach_rate=0.0, seed=None):
+        self.names, self.weights = locations
+        self.distribution = distribution
+        self.breach_rate = breach_rate
+        self.rng = random.Random(seed)
+
+    def _value(self, mean, stddev, low, high):
+        if self.rng.random() < self.breach_rate:
+            # Out-of-range on either side, to exercise the alert path
+            return round(self.rng.choice([low - self.rng.uniform(0.1, 2), high + self.rng.uniform(0.1, 2)]), 2)
+        if self.distribution == 'uniform':
+            return round(self.rng.uniform(low, high), 2)
+        return round(min(high, max(low, self.rng.gauss(mean, stddev))), 2)
+
+    def reading(self):
+        now = datetime.datetime.now()
+        reading = {name: self._value(*spec) for name, spec in PARAMETERS.items()}
+        reading['location'] = self.rng.choices(self.names, self.weights)[0]
+        reading['date'] = now.strftime('%Y-%m-%d')
+        reading['time'] = now.strftime('%H:%M:%S')
+        return reading
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a sorted list."""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, math.ceil(pct / 100.0 * len(samples)) - 1))
+    return samples[index]
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.sent = 0
+        self.dropped = 0
+        self.readings_ok = 0
+
+    def report(self, elapsed, batch_size):
+        latencies = sorted(self.latencies)
+        completed = len(latencies)
+        ok = sum(count for status, count in self.statuses.items() if 200 <= status < 300)
+        return {
+            'duration_s': round(elapsed, 2),
+            'scheduled': self.sent + self.dropped,
+            'sent': self.sent,
+            'dropped': self.dropped,
+            'completed': completed,
+            'ok': ok,
+            'achieved_rps': round(completed / elapsed, 1) if elapsed else 0.0,
+            'readings_per_s': round(self.readings_ok / elapsed, 1) if elapsed else 0.0,
+            'batch_size': batch_size,
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 2),
+                'p90': round(percentile(latencies, 90), 2),
+                'p95': round(percentile(latencies, 95), 2),
+                'p99': round(percentile(latencies, 99), 2),
+                'max': round(latencies[-1], 2) if latencies else 0.0,
+            },
+            'status_codes': {str(status): count for status, count in sorted(self.statuses.items())},
+            'errors': dict(self.errors),
+        }
+
+
+async def login(session, base_url, login_path, username, password):
+    async with session.post(base_url + login_path, json={'username': username, 'password': password}) as response:
+        body = await response.json(content_type=None)
+        token = (body or {}).get('token') or (body or {}).get('access_token')
+        if response.status != 200 or not token:
+            raise SystemExit(f"Login failed with status {response.status}: {body}")
+        return token
+
+
+async def has_batch_endpoint(session, base_url, headers):
+    """The batch endpoint answers an empty body with 400; older servers return 404/405."""
+    async with session.post(f'{base_url}/api/data/sensor-data/batch', json=[], headers=headers) as response:
+        await response.read()
+        return response.status not in (404, 405)
+
+
+async def send(session, url, payload, headers, scheduled, readings, stats):
+    try:
+        async with session.post(url, json=payload, headers=headers) as response:
+            await response.read()
+            stats.statuses[response.status] += 1
+            if 200 <= response.status < 300:
+                stats.readings_ok += readings
+    except asyncio.TimeoutError:
+        stats.errors['timeout'] += 1
+        return
+    except aiohttp.ClientError as e:
+        stats.errors[type(e).__name__] += 1
+        return
+    stats.latencies.append((time.perf_counter() - scheduled) * 1000)
+
+
+async def generate(args, base_url):
+    connector = aiohttp.TCPConnector(limit=args.concurrency, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(total=args.timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        token = args.token or await login(session, base_url, args.login_path, args.username, args.password)
+        headers = {'Authorization': f'Bearer {token}'}
+
+        batch_size = args.batch_size
+        if batch_size > 1 and not await has_batch_endpoint(session, base_url, headers):
+            print("No batch endpoint on this server; sending one reading per request")
+            batch_size = 1
+        url = f'{base_url}/api/data/sensor-data/batch' if batch_size > 1 else f'{base_url}/api/data/sensor-data'
+
+        factory = ReadingFactory(args.locations, args.distribution, args.breach_rate, args.seed)
+        arrivals = random.Random(args.seed)
+        stats = Stats()
+        in_flight = set()
+
+        print(f"Sending {args.rate} req/s ({args.rate * batch_size} readings/s) to {url} for {args.duration}s")
+        started = time.perf_counter()
+        next_at = started
+        while next_at - started < args.duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(in_flight) >= args.concurrency:
+                stats.dropped += 1
+            else:
+                if batch_size > 1:
+                    payload = [factory.reading() for _ in range(batch_size)]
+                else:
+                    payload = factory.reading()
+                task = asyncio.create_task(send(session, url, payload, headers, next_at, batch_size, stats))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                stats.sent += 1
+            next_at += arrivals.expovariate(args.rate)
+
+        if in_flight:
+            await asyncio.wait(in_flight)
+        return stats.report(time.perf_counter() - started, batch_size)
+
+
+def stand_in_app(latency_ms=0.0):
+    """
+    Minimal stand-in for the backend: login, single and batch ingest. Validates
+    the reading fields and answers like the real endpoints, without a database.
+    """
+    state = {'next_id': 1}
+    required = ('ph_value', 'temperature', 'turbidity', 'location', 'time', 'date')
+
+    def store(readings):
+        results = []
+        for index, reading in enumerate(readings):
+            if not isinstance(reading, dict) or any(reading.get(field) in (None, '') for field in required):
+                results.append({'index': index, 'error': 'Missing required field'})
+                continue
+            results.append({'index': index, 'id': state['next_id']})
+            state['next_id'] += 1
+        return results
+
+    async def pause():
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+
+    async def login_view(request):
+        return web.json_response({'status': 'success', 'token': 'stand-in-token'})
+
+    async def single_view(request):
+        await pause()
+        results = store([await request.json()])
+        if 'error' in results[0]:
+            return web.json_response({'status': 'error', 'message': results[0]['error']}, status=400)
+        return web.json_response({'status': 'success', 'id': results[0]['id']}, status=201)
+
+    async def batch_view(request):
+        await pause()
+        readings = await request.json()
+        if isinstance(readings, dict):
+            readings = readings.get('readings')
+        if not readings:
+            return web.json_response({'status': 'error', 'message': 'No readings provided'}, status=400)
+        results = store(readings)
+        failed = sum(1 for result in results if 'error' in result)
+        return web.json_response({
+            'status': 'success' if not failed else 'partial',
+            'inserted': len(results) - failed,
+            'failed': failed,
+            'results': results,
+        }, status=201 if not failed else 207)
+
+    app = web.Application()
+    app.router.add_post('/login', login_view)
+    app.router.add_post('/api/auth/login', login_view)
+    app.router.add_post('/api/data/sensor-data', single_view)
+    app.router.add_post('/api/data/sensor-data/batch', batch_view)
+    return app
+
+
+async def main_async(args):
+    runner = None
+    base_url = args.base_url.rstrip('/')
+    if args.stand_in:
+        runner = web.AppRunner(stand_in_app(args.stand_in_latency))
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', args.stand_in_port)
+        await site.start()
+        base_url = f'http://127.0.0.1:{args.stand_in_port}'
+        print(f"Stand-in server listening on {base_url}")
+    try:
+        return await generate(args, base_url)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Open-model load generator for sensor ingestion')
+    parser.add_argument('--base-url', default=os.getenv('LOADGEN_BASE_URL', 'http://localhost:5000'))
+    parser.add_argument('--login-path', default='/login')
+    parser.add_argument('--username', default=os.getenv('LOADGEN_USERNAME', 'admin'))
+    parser.add_argument('--password', default=os.getenv('LOADGEN_PASSWORD', ''))
+    parser.add_argument('--token', default=os.getenv('LOADGEN_TOKEN'), help='Skip login and use this JWT')
+    parser.add_argument('--rate', type=float, default=50.0, help='Target requests per second')
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds to generate load for')
+    parser.add_argument('--concurrency', type=int, default=32, help='Max in-flight requests and pooled connections')
+    parser.add_argument('--batch-size', type=int, default=1, help='Readings per request; >1 uses the batch endpoint')
+    parser.add_argument('--locations', type=parse_locations, default=parse_locations(DEFAULT_LOCATIONS),
+                        help='Comma-separated locations with optional weights, e.g. a:5,b:1')
+    parser.add_argument('--distribution', choices=['normal', 'uniform'], default='normal',
+                        help='How values are drawn within the safe range')
+    parser.add_argument('--breach-rate', type=float, default=0.0, help='Fraction of values outside the safe range')
+    parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, help='Seed for reproducible arrivals and readings')
+    parser.add_argument('--stand-in', action='store_true', help='Start a local stand-in server and target it')
+    parser.add_argument('--stand-in-port', type=int, default=5098)
+    parser.add_argument('--stand-in-latency', type=float, default=0.0, help='Artificial stand-in latency in ms')
+    parser.add_argument('--out', help='Also write the report as JSON to this file')
+    args = parser.parse_args()
+
+    if args.rate <= 0 or args.duration <= 0 or args.concurrency < 1 or args.batch_size < 1:
+        parser.error('--rate and --duration must be positive, --concurrency and --batch-size at least 1')
+
+    report = asyncio.run(main_async(args))
+    print(json.dumps(report, indent=2))
+    if args.out:
+        with open(args.out, 'w') as handle:
+            json.dump(report, handle, indent=2)
+
+
+if __name__ == '__main__':
+    main()